@@ -1,10 +1,9 @@
 # app/__init__.py
 
 import logging
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from flask_cors import CORS # type: ignore
 from flasgger import Swagger # type: ignore
-import mediapipe as mp
 
 from app.config import Config
 from app.database import connect_db_simple # Use simple connection for initial test
@@ -131,6 +130,22 @@ def create_app(config_class=Config):
 
     # =============================================================
 
+    @app.route("/metrics", methods=["GET"])
+    def prometheus_metrics():
+        """
+        Pipeline metrics (Prometheus text format)
+        ---
+        tags:
+          - Detection
+        responses:
+          200:
+            description: Per-stage latency histograms, frame counters, queue depths and reload counts
+        """
+        from app.routes.application import engine
+        from scripts.pipeline_metrics import render_prometheus
+        return Response(render_prometheus(engine.get_metrics_snapshot()),
+                        mimetype="text/plain; version=0.0.4")
+
     # Register simple health check route (can be done here or in a blueprint)
     @app.route("/", methods=["GET"])
     def health():
@@ -16,6 +16,8 @@ class Config:
     BASE_DIR = Path(__file__).resolve().parent.parent
     FACE_DATA_DIR = BASE_DIR / "face_data"
     PKL_TIMESTAMP_FILE = BASE_DIR / "pkltimestamp"
+    # touched after worker/certificate writes; monitoring reloads its directory caches
+    DIRECTORY_STAMP_FILE = BASE_DIR / "directory_stamp"
 
     # JWT Config
     ALGORITHM = "HS256"
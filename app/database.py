@@ -2,21 +2,41 @@ import pymysql # type: ignore
 # We need current_app context to access app.config when running within Flask
 from flask import current_app
 import logging
+import sys
+import threading
+from pathlib import Path
 
-# This function establishes the connection using configuration defined in config.py
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.db_pool import ConnectionPool
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool(config):
+    """One pool per API process, built from the app config on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(lambda: pymysql.connect(
+                host=config["DB_HOST"],
+                user=config["DB_USER"],
+                password=config["DB_PASSWORD"],
+                database=config["DB_NAME"],
+                cursorclass=pymysql.cursors.DictCursor,
+                autocommit=False,
+                connect_timeout=5
+            ), name="api")
+        return _pool
+
+# This function hands out a pooled connection using configuration defined in config.py
 def get_db_connection():
-    """Establishes and returns a PyMySQL connection with DictCursor."""
+    """Checks out a pooled PyMySQL connection with DictCursor; close() returns it to the pool."""
     # We retrieve configuration from the Flask app context
     try:
-        return pymysql.connect(
-            host=current_app.config["DB_HOST"],
-            user=current_app.config["DB_USER"],
-            password=current_app.config["DB_PASSWORD"],
-            database=current_app.config["DB_NAME"],
-            cursorclass=pymysql.cursors.DictCursor,
-            autocommit=False,
-            connect_timeout=5
-        )
+        return _get_pool(current_app.config).get()
     except Exception as e:
         # Log the error if connection fails
         logging.error(f"Database connection error: {e}")
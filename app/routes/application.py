@@ -21,8 +21,18 @@ from flask_cors import CORS
 import cv2
 
 import scripts.monitoring as monitoring
+from scripts.pipeline_metrics import metrics
 from celery import Celery
 
+# "threads": every camera runs inside this process (default)
+# "processes": cameras run in supervised worker processes, see scripts/camera_supervisor.py
+MONITORING_ENGINE = os.getenv("MONITORING_ENGINE", "threads")
+if MONITORING_ENGINE == "processes":
+    from scripts.camera_supervisor import CameraSupervisor
+    engine = CameraSupervisor()
+else:
+    engine = monitoring
+
 # --------------------------------------------------
 # Blueprint Setup
 # --------------------------------------------------
@@ -33,6 +43,10 @@ application_bp = Blueprint(
 )
 
 CORS(application_bp)
+
+# Models load in the background once the blueprint is registered; requests
+# that need one before then wait for it, everything else answers immediately.
+application_bp.record_once(lambda state: engine.warm_up())
 #swagger = Swagger(application_bp)
 
 # --------------------------------------------------
@@ -58,7 +72,7 @@ def list_cameras():
       200:
         description: List of camera IDs
     """
-    return jsonify({"cameras": monitoring.list_cameras()})
+    return jsonify({"cameras": engine.list_cameras()})
 
 
 @application_bp.route("/cameras", methods=["POST"])
@@ -90,7 +104,7 @@ def add_camera():
     if not camera_id or source is None:
         return jsonify({"error": "camera_id and source are required"}), 400
 
-    monitoring.add_camera(camera_id, source)
+    engine.add_camera(camera_id, source)
     return jsonify({"status": "ok", "camera_id": camera_id})
 
 
@@ -106,7 +120,7 @@ def start_camera(camera_id):
         in: path
         required: true
     """
-    monitoring.start_camera(camera_id)
+    engine.start_camera(camera_id)
     return jsonify({"status": "started", "camera_id": camera_id})
 
 
@@ -122,7 +136,7 @@ def stop_camera(camera_id):
         in: path
         required: true
     """
-    monitoring.stop_camera(camera_id)
+    engine.stop_camera(camera_id)
     return jsonify({"status": "stopped", "camera_id": camera_id})
 
 
@@ -138,19 +152,97 @@ def delete_camera(camera_id):
         in: path
         required: true
     """
-    monitoring.remove_camera(camera_id)
+    engine.remove_camera(camera_id)
     return jsonify({"status": "deleted", "camera_id": camera_id})
 
 @application_bp.route("/cameras/<camera_id>/faces")
 def camera_faces(camera_id):
-    data = monitoring.get_latest_faces(camera_id)
+    data = engine.get_latest_faces(camera_id)
     return jsonify(data if data else {})
 
 @application_bp.route("/cameras/<camera_id>/anomalies")
 def camera_anomalies(camera_id):
-    data = monitoring.get_latest_anomalies(camera_id)
+    data = engine.get_latest_anomalies(camera_id)
     return jsonify(data if data else {})
 
+@application_bp.route("/inference/stats")
+def inference_stats():
+    """
+    Batched inference scheduler statistics
+    ---
+    tags:
+      - Detection
+    responses:
+      200:
+        description: Per-model batch counts, average batch size and queue depth
+    """
+    return jsonify(engine.get_inference_stats())
+
+@application_bp.route("/inference/motion")
+def motion_stats():
+    """
+    Motion gating per camera
+    ---
+    tags:
+      - Detection
+    responses:
+      200:
+        description: Whether each camera is active, its motion score and how many frames skipped the detectors
+    """
+    return jsonify(engine.get_motion_stats())
+
+@application_bp.route("/inference/recognition")
+def recognition_stats():
+    """
+    Recognition cache per camera
+    ---
+    tags:
+      - Detection
+    responses:
+      200:
+        description: Cache hits/misses, re-checks, in-flight skips and faces submitted to FaceNet
+    """
+    return jsonify(engine.get_recognition_stats())
+
+@application_bp.route("/directory/stats")
+def directory_stats():
+    """
+    In-memory worker directory
+    ---
+    tags:
+      - Detection
+    responses:
+      200:
+        description: Entries, snapshot age, hits, negative lookups and refresh failures per directory cache
+    """
+    return jsonify(engine.get_directory_stats())
+
+@application_bp.route("/events/stats")
+def event_stats():
+    """
+    Event spool and forwarder
+    ---
+    tags:
+      - Detection
+    responses:
+      200:
+        description: Events queued, written and forwarded, spool backlog in bytes, send failures and drops
+    """
+    return jsonify(engine.get_event_stats())
+
+@application_bp.route("/embeddings/generation")
+def embedding_generation():
+    """
+    Live face embedding generation
+    ---
+    tags:
+      - Detection
+    responses:
+      200:
+        description: Version, source and size of the embeddings used for recognition
+    """
+    return jsonify(engine.get_embedding_generation())
+
 # --------------------------------------------------
 # Camera Connection Test
 # --------------------------------------------------
@@ -192,14 +284,15 @@ def test_camera_connection():
 def mjpeg_generator(camera_id, fps=5):
     interval = 1.0 / max(1, fps)
     while True:
-        frame = monitoring.get_latest_frame(camera_id)
+        frame = engine.get_latest_frame(camera_id)
         if frame is None:
             # Instead of just continuing, send a "Loading" or "Black" frame
             # to keep the HTTP connection alive
             time.sleep(0.2)
             continue
 
-        ok, jpg = cv2.imencode(".jpg", frame)
+        with metrics.span("jpeg_encode", camera_id):
+            ok, jpg = cv2.imencode(".jpg", frame)
         if not ok: continue
 
         yield (b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + jpg.tobytes() + b"\r\n")
@@ -234,8 +327,8 @@ def stream_events():
         last_face_ts = {}
 
         while True:
-            for cid in monitoring.list_cameras():
-                face_data = monitoring.get_latest_faces(cid)
+            for cid in engine.list_cameras():
+                face_data = engine.get_latest_faces(cid)
 
                 if not face_data:
                     continue
@@ -253,6 +346,7 @@ def stream_events():
                     "name": face_data.get("name"),
                     "auth": face_data.get("auth"),
                     "similarity": round(face_data.get("similarity", 0), 2),
+                    "generation": face_data.get("generation"),
                     "details": details or {},
 
                     # THESE ARE CRITICAL FOR BOUNDING BOX
@@ -283,9 +377,12 @@ def health():
       - Detection
     responses:
       200:
-        description: Service is running
+        description: Service is running; "ready" is false while models are still loading
     """
+    readiness = engine.model_status()
     return jsonify({
-        "status": "ok",
-        "service": "Flask Monitoring API"
+        "status": "ok" if readiness["ready"] else "warming_up",
+        "service": "Flask Monitoring API",
+        "ready": readiness["ready"],
+        "models": readiness["models"]
     })
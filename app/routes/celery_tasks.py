@@ -1,9 +1,17 @@
 # celery_tasks.py
+import sys
 import json
 import datetime
 import mysql.connector
 from celery import Celery
-#from pathlib import Path
+from pathlib import Path
+
+# the worker runs this file as a top-level module; make `scripts` importable
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.db_pool import ConnectionPool
 
 # -----------------------------------------------------------
 # Celery configuration
@@ -24,8 +32,11 @@ DB_CONFIG = {
 }
 
 
+# one pool per worker process (rebuilt after fork), shared by concurrent tasks
+db_pool = ConnectionPool(lambda: mysql.connector.connect(**DB_CONFIG), name="celery")
+
 def get_db():
-    return mysql.connector.connect(**DB_CONFIG)
+    return db_pool.get()
 
 def ensure_tables():
     conn = get_db()
@@ -58,30 +69,127 @@ def ensure_tables():
 
 ensure_tables()
 
-@celery_app.task(name="celery_tasks.process_face_event")
-def process_face_event(event):
+# -----------------------------------------------------------
+# Row builders (one event -> one INSERT row)
+# -----------------------------------------------------------
+FACE_INSERT = """
+    INSERT INTO FaceEvents (camera_id, person_name, auth, similarity, timestamp, raw_event)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+ANOMALY_INSERT = """
+    INSERT INTO AnomalyEvents (camera_id, anomaly_type, confidence, timestamp, video_path, json_path, raw_event)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+def _event_time(value):
+    """DATETIME value for an event timestamp (epoch seconds, string or datetime)."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.datetime.fromtimestamp(value)
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.strptime(value[:19], "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return datetime.datetime.now()
+    if isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.now()
+
+def face_event_row(event):
+    cam = event.get("camera_id")
+    data = event.get("data", {})
+    name = data.get("name")
+    auth = bool(data.get("auth"))
+    sim = float(data.get("similarity", 0.0))
+    ts = _event_time(event.get("ts") or data.get("timestamp"))
+    return (cam, name, auth, sim, ts, json.dumps(event))
+
+def anomaly_event_row(event):
+    """
+    Handles multiple payload shapes and ensures type safety.
+    """
+    # Camera ID
+    cam = event.get("camera_id") or event.get("camera") or "unknown_camera"
+
+    # Data extraction
+    data = event.get("data", {}) if isinstance(event, dict) else {}
+    if not data and isinstance(event, dict) and ("video_path" in event or "json_path" in event):
+        data = event
+
+    # Anomaly type and confidence
+    anomaly_type = None
+    confidence = 0.0
+    objects = data.get("objects", [])
+    if isinstance(objects, list) and len(objects) > 0:
+        anomaly_type = str(objects[0].get("label", "unknown"))
+        confidence = float(objects[0].get("conf", 0.0))
+    else:
+        anomaly_type = str(data.get("type", "unknown"))
+        try:
+            confidence = float(data.get("confidence", 0.0))
+        except (TypeError, ValueError):
+            confidence = 0.0
+
+    # Video and JSON paths
+    video_path = str(data.get("video_path") or data.get("video") or "")
+    json_path = str(data.get("json_path") or data.get("json") or "")
+
+    # Timestamp
+    ts = _event_time(event.get("ts") or data.get("timestamp"))
+
+    return (cam, anomaly_type, confidence, ts, video_path, json_path, json.dumps(event))
+
+# -----------------------------------------------------------
+# Batched inserts
+# -----------------------------------------------------------
+def insert_events(sql, row_builder, events):
+    """
+    Insert many events in one transaction with a multi-row executemany.
+    A row the server rejects (bad data) is skipped after a row-by-row retry
+    instead of failing the whole batch; connection problems are raised so
+    the caller can retry. Returns (saved, skipped).
+    """
+    rows = []
+    skipped = 0
+    for event in events:
+        try:
+            rows.append(row_builder(event))
+        except Exception as e:
+            print("Skipping malformed event:", e, event)
+            skipped += 1
+    if not rows:
+        return 0, skipped
+
+    conn = get_db()
     try:
-        cam = event.get("camera_id")
-        data = event.get("data", {})
-        name = data.get("name")
-        auth = bool(data.get("auth"))
-        sim = float(data.get("similarity", 0.0))
-        ts = event.get("ts") or data.get("timestamp") or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        conn = get_db()
         cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO FaceEvents (camera_id, person_name, auth, similarity, timestamp, raw_event)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (
-            cam,
-            name,
-            auth,
-            sim,
-            ts,
-            json.dumps(event)
-        ))
+        try:
+            cur.executemany(sql, rows)
+            conn.commit()
+            return len(rows), skipped
+        except (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError):
+            raise
+        except mysql.connector.Error as e:
+            conn.rollback()
+            print(f"Batch insert rejected ({e}); retrying {len(rows)} rows one by one")
+        saved = 0
+        for row in rows:
+            try:
+                cur.execute(sql, row)
+                saved += 1
+            except (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError):
+                raise
+            except mysql.connector.Error as e:
+                print("Skipping rejected event row:", e)
+                skipped += 1
         conn.commit()
+        return saved, skipped
+    finally:
         conn.close()
+
+@celery_app.task(name="celery_tasks.process_face_event")
+def process_face_event(event):
+    try:
+        insert_events(FACE_INSERT, face_event_row, [event])
         return {"status": "ok", "saved": True}
     except Exception as e:
         return {"status": "error", "error": str(e)}
@@ -91,68 +199,30 @@ def process_anomaly_event(event):
     print("Celery task called with event:", event)
     """
     Safely insert an anomaly event into MySQL.
-    Handles multiple payload shapes and ensures type safety.
     """
     try:
-        # Camera ID
-        cam = event.get("camera_id") or event.get("camera") or "unknown_camera"
-
-        # Data extraction
-        data = event.get("data", {}) if isinstance(event, dict) else {}
-        if not data and isinstance(event, dict) and ("video_path" in event or "json_path" in event):
-            data = event
-
-        # Anomaly type and confidence
-        anomaly_type = None
-        confidence = 0.0
-        objects = data.get("objects", [])
-        if isinstance(objects, list) and len(objects) > 0:
-            anomaly_type = str(objects[0].get("label", "unknown"))
-            confidence = float(objects[0].get("conf", 0.0))
-        else:
-            anomaly_type = str(data.get("type", "unknown"))
-            try:
-                confidence = float(data.get("confidence", 0.0))
-            except (TypeError, ValueError):
-                confidence = 0.0
-
-        # Video and JSON paths
-        video_path = str(data.get("video_path") or data.get("video") or "")
-        json_path = str(data.get("json_path") or data.get("json") or "")
-
-        # Timestamp
-        ts = event.get("ts") or data.get("timestamp") or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        if isinstance(ts, str):
-            try:
-                ts = datetime.datetime.strptime(ts[:19], "%Y-%m-%d %H:%M:%S")
-            except:
-                ts = datetime.datetime.now()
-        elif not isinstance(ts, datetime.datetime):
-            ts = datetime.datetime.now()
-
-        # Debug log
-        print("Inserting anomaly event:", cam, anomaly_type, confidence, video_path, json_path, ts)
-
-        # Insert into MySQL
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO AnomalyEvents (camera_id, anomaly_type, confidence, timestamp, video_path, json_path, raw_event)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (
-            cam,
-            anomaly_type,
-            confidence,
-            ts,
-            video_path,
-            json_path,
-            json.dumps(event)
-        ))
-        conn.commit()
-        conn.close()
+        insert_events(ANOMALY_INSERT, anomaly_event_row, [event])
         return {"status": "ok", "saved": True}
 
     except Exception as e:
         print("Error inserting anomaly event:", e)
         return {"status": "error", "error": str(e)}
 
+# Batches are acknowledged only after the commit, and a failed write is
+# retried, so every event is stored at least once (a redelivered batch may
+# insert some rows twice).
+@celery_app.task(name="celery_tasks.process_face_events_batch", bind=True, acks_late=True, max_retries=None)
+def process_face_events_batch(self, events):
+    try:
+        saved, skipped = insert_events(FACE_INSERT, face_event_row, events)
+    except Exception as e:
+        raise self.retry(exc=e, countdown=min(60, 2 ** self.request.retries))
+    return {"status": "ok", "saved": saved, "skipped": skipped}
+
+@celery_app.task(name="celery_tasks.process_anomaly_events_batch", bind=True, acks_late=True, max_retries=None)
+def process_anomaly_events_batch(self, events):
+    try:
+        saved, skipped = insert_events(ANOMALY_INSERT, anomaly_event_row, events)
+    except Exception as e:
+        raise self.retry(exc=e, countdown=min(60, 2 ** self.request.retries))
+    return {"status": "ok", "saved": saved, "skipped": skipped}
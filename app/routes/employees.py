@@ -9,7 +9,7 @@ import pandas as pd
 # Assuming these utilities are available in your Flask app structure
 from app.decorators import require_admin, require_super_admin
 from app.database import get_db_connection
-from app.utils import delete_face_data, resolve_person_folder, touch_pkltimestamp_debounced
+from app.utils import delete_face_data, resolve_person_folder, touch_pkltimestamp_debounced, touch_directory_stamp
 from app.enums import AccessLevel, StatusEnum, CERTBOOL_VALUES # Assuming enums like AccessLevel are defined
 
 # Define the Blueprint
@@ -248,6 +248,7 @@ def create_employee():
         logging.info(f"Auto-created face folder for new employee {person_name}")
 
         db.commit()
+        touch_directory_stamp()
 
 
         return jsonify({
@@ -365,6 +366,7 @@ def update_employee(employee_id):
             cur.execute(f"UPDATE identitymanagement SET {', '.join(cert_updates)} WHERE employee_id = %s", tuple(cert_params))
 
         db.commit()
+        touch_directory_stamp()
 
         # 3. Return updated employee details
         return jsonify(fetch_employee_details(cur, employee_id))
@@ -407,6 +409,7 @@ def delete_employee(employee_id):
         touch_pkltimestamp_debounced()
 
         db.commit()
+        touch_directory_stamp()
         return "", 204
     except pymysql.MySQLError as e:
         db.rollback()
@@ -730,6 +733,9 @@ def bulk_import_employees():
         cur.close()
         db.close()
 
+    if success_count:
+        touch_directory_stamp()
+
     return jsonify({
         "message": "Bulk import finished",
         "total_processed": len(df),
@@ -6,7 +6,7 @@ import logging
 # Import helpers and decorators
 from app.decorators import require_admin, require_super_admin
 from app.database import get_db_connection
-from app.utils import delete_face_data, resolve_person_folder
+from app.utils import delete_face_data, resolve_person_folder, touch_directory_stamp
 from app.enums import (
     AccessLevel,
     StatusEnum,
@@ -105,6 +105,7 @@ def delete_worker(employee_id):
         delete_face_data(person_name)
 
         db.commit()
+        touch_directory_stamp()
 
         return jsonify({"msg": f"Worker {person_name} ({employee_id}) and associated data deleted."})
 
@@ -169,6 +170,7 @@ def update_workeridentity():
             logging.info(f"Auto-created face folder: {folder_path}")
 
         db.commit()
+        touch_directory_stamp()
     except pymysql.MySQLError as e:
         db.rollback()
         return jsonify({"detail": str(e)}), 500
@@ -224,6 +226,7 @@ def update_identitymanagement():
             """, (pname, badge, cert1, certificate2, cert3, certificate4))
 
         db.commit()
+        touch_directory_stamp()
     except pymysql.MySQLError as e:
         db.rollback()
         return jsonify({"detail": str(e)}), 500
@@ -348,6 +351,7 @@ def register_employee():
         touch_pkltimestamp_debounced() # Notify face recognition service to reload data
 
         db.commit()
+        touch_directory_stamp()
     except pymysql.MySQLError as e:
         db.rollback()
         logging.error(f"Employee registration failed: {e}")
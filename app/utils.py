@@ -97,6 +97,16 @@ def touch_pkltimestamp_debounced():
         f.flush()
     logging.info("pkltimestamp updated")
 
+def touch_directory_stamp():
+    """Tell every monitoring process to reload WorkerIdentity / IdentityManagement now."""
+    stamp = current_app.config["DIRECTORY_STAMP_FILE"]
+    try:
+        stamp.parent.mkdir(parents=True, exist_ok=True)
+        with open(stamp, "w") as f:
+            f.write(datetime.utcnow().isoformat())
+    except Exception as e:
+        logging.error(f"Failed to touch directory stamp: {e}")
+
 def _normalize_for_compare(name: str) -> str:
     return name.strip().lower().replace(" ", "_")
 
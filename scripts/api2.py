@@ -1,4 +1,5 @@
 import os
+import sys
 import base64
 import pickle
 import time
@@ -7,8 +8,6 @@ import threading
 import cv2
 import numpy as np
 from scipy.spatial.distance import cdist
-from ultralytics import YOLO
-from keras_facenet import FaceNet
 import mysql.connector
 
 from fastapi import FastAPI, HTTPException, File, UploadFile
@@ -26,6 +25,12 @@ DB_CONFIG = {
 
 # --- Base Directory (scripts/) ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))   
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from scripts.embedding_store import open_store
+from scripts.inference_backend import load_detector, load_embedder
 
 # --- Models & Embeddings Paths ---
 YOLO_FACE_PATH     = os.path.join(BASE_DIR, "..", "model", "yolov11n-face.pt")              
@@ -34,17 +39,23 @@ EMBEDDINGS_FILE    = os.path.join(BASE_DIR, "face_encodings.pkl")
 TIMESTAMP_FILE     = os.path.join(BASE_DIR, "pkltimestamp")                                 
 SIMILARITY_THRESHOLD        = 0.5
 OBJECT_CONFIDENCE_THRESHOLD = 0.5
+INFERENCE_BACKEND           = os.getenv("INFERENCE_BACKEND", "torch")
 
 # --- Initialize Models & Embedder ---
-face_model     = YOLO(YOLO_FACE_PATH)
-behavior_model = YOLO(YOLO_BEHAVIOR_PATH)
-embedder       = FaceNet()
+face_model     = load_detector(YOLO_FACE_PATH, INFERENCE_BACKEND)
+behavior_model = load_detector(YOLO_BEHAVIOR_PATH, INFERENCE_BACKEND)
+embedder       = load_embedder(INFERENCE_BACKEND)
 
 enbeddings_dict: Dict[str, Dict[str, np.ndarray]] = {}
 
 # --- Load Embeddings ---
 def load_embeddings():
     global enbeddings_dict
+    store = open_store()
+    if store is not None:
+        enbeddings_dict = store.to_dict()
+        print(f"[API] Mapped embeddings for {len(enbeddings_dict)} identities from {store.generation}")
+        return
     try:
         with open(EMBEDDINGS_FILE, 'rb') as f:
             enbeddings_dict = pickle.load(f)
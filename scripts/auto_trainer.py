@@ -44,10 +44,13 @@ class DebouncedHandler(FileSystemEventHandler):
             self._schedule()
 
 
-def main(face_data_dir, train_script_path):
+def main(face_data_dir, train_script_path, incremental=True):
     # Use the same Python interpreter that's running this script
     python_executable = sys.executable
     train_command = [python_executable, train_script_path]
+    if incremental:
+        # only re-embed the images that changed; falls back to a full pass without a manifest
+        train_command.append("--incremental")
     event_handler = DebouncedHandler(face_data_dir, train_command)
 
     observer = Observer()
@@ -67,6 +70,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Watch a face_data folder and retrain embeddings on changes.")
     parser.add_argument("--face_data", help="Path to the face_data directory to monitor")
     parser.add_argument("--train_script", help="Path to train_face2.py script")
+    parser.add_argument("--full", action="store_true", help="Retrain every image on each change instead of incrementally")
     args = parser.parse_args()
 
    
@@ -77,4 +81,4 @@ if __name__ == "__main__":
     face_data = args.face_data or str(DEFAULT_FACE_DATA)
     train_script = args.train_script or str(DEFAULT_TRAIN_SCRIPT)
 
-    main(face_data, train_script)
+    main(face_data, train_script, incremental=not args.full)
@@ -0,0 +1,119 @@
+# scripts/bench_face_index.py
+"""Compare the approximate (IVF) identity index against exact search.
+
+Uses the enrolled centroids from face_encodings.pkl when --embeddings is
+given, otherwise a synthetic clustered enrolment of --identities people.
+Reports recall@1 against exact search, identification accuracy and
+per-query latency for each n_probe setting.
+
+    python scripts/bench_face_index.py --identities 20000 --nprobe 1 4 8 16 32
+"""
+import argparse
+import json
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.face_index import ExactIndex, IVFIndex, _normalize_rows
+
+
+def synthetic_centroids(n, dim, groups, seed):
+    """Unit vectors with some shared structure, closer to real face embeddings than pure noise."""
+    rng = np.random.default_rng(seed)
+    group_dirs = _normalize_rows(rng.normal(size=(groups, dim)))
+    members = rng.integers(0, groups, n)
+    return _normalize_rows(0.6 * group_dirs[members] + 0.8 * _normalize_rows(rng.normal(size=(n, dim))))
+
+
+def load_centroids(path):
+    with open(path, 'rb') as f:
+        raw = pickle.load(f)
+    cents = []
+    for v in raw.values():
+        if isinstance(v, dict) and v.get('centroid') is not None:
+            cents.append(np.asarray(v['centroid'], dtype=np.float32))
+        else:
+            embs = np.asarray(v, dtype=np.float32).reshape(-1, np.asarray(v).shape[-1])
+            if embs.size:
+                cents.append(embs.mean(axis=0))
+    return _normalize_rows(np.vstack(cents))
+
+
+def make_queries(cents, n_queries, noise, seed):
+    rng = np.random.default_rng(seed + 1)
+    truth = rng.integers(0, cents.shape[0], n_queries)
+    q = cents[truth] + noise * rng.normal(size=(n_queries, cents.shape[1])) / np.sqrt(cents.shape[1])
+    return _normalize_rows(q), truth
+
+
+def time_queries(index, queries, **kw):
+    lat = []
+    ids = np.empty(queries.shape[0], dtype=np.int64)
+    for i in range(queries.shape[0]):
+        t0 = time.perf_counter()
+        _, top = index.search(queries[i:i + 1], k=1, **kw)
+        lat.append((time.perf_counter() - t0) * 1000.0)
+        ids[i] = top[0, 0]
+    lat = np.asarray(lat)
+    return ids, {"p50_ms": float(np.percentile(lat, 50)), "p95_ms": float(np.percentile(lat, 95)),
+                 "mean_ms": float(lat.mean())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--embeddings', help="face_encodings.pkl to take centroids from")
+    parser.add_argument('--identities', type=int, default=20000, help="synthetic enrolment size")
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--groups', type=int, default=64, help="synthetic latent clusters")
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--noise', type=float, default=0.6, help="query noise relative to a unit vector")
+    parser.add_argument('--lists', type=int, default=None, help="IVF cells (default 4*sqrt(N))")
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help="write results as JSON")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        cents = load_centroids(args.embeddings)
+    else:
+        cents = synthetic_centroids(args.identities, args.dim, args.groups, args.seed)
+    queries, truth = make_queries(cents, args.queries, args.noise, args.seed)
+    print(f"[bench] {cents.shape[0]} identities x {cents.shape[1]} dims, {queries.shape[0]} queries")
+
+    exact = ExactIndex(cents)
+    exact_ids, exact_lat = time_queries(exact, queries)
+    rows = [{"backend": "exact", "n_probe": None, "recall_at_1": 1.0,
+             "accuracy": float(np.mean(exact_ids == truth)), **exact_lat}]
+
+    t0 = time.perf_counter()
+    ivf = IVFIndex(cents, n_lists=args.lists, seed=args.seed)
+    build_s = time.perf_counter() - t0
+    print(f"[bench] IVF built with {ivf.n_lists} cells in {build_s:.2f}s")
+
+    for n_probe in args.nprobe:
+        ids, lat = time_queries(ivf, queries, n_probe=n_probe)
+        rows.append({"backend": "ivf", "n_probe": n_probe,
+                     "recall_at_1": float(np.mean(ids == exact_ids)),
+                     "accuracy": float(np.mean(ids == truth)), **lat})
+
+    print(f"{'backend':<8}{'n_probe':>8}{'recall@1':>10}{'accuracy':>10}{'p50 ms':>9}{'p95 ms':>9}{'speedup':>9}")
+    for r in rows:
+        speedup = exact_lat["mean_ms"] / r["mean_ms"] if r["mean_ms"] else 0.0
+        print(f"{r['backend']:<8}{str(r['n_probe'] or '-'):>8}{r['recall_at_1']:>10.4f}{r['accuracy']:>10.4f}"
+              f"{r['p50_ms']:>9.3f}{r['p95_ms']:>9.3f}{speedup:>8.1f}x")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({"identities": int(cents.shape[0]), "dim": int(cents.shape[1]),
+                       "ivf_lists": ivf.n_lists, "ivf_build_s": build_s, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+# scripts/bench_pipeline.py
+"""Replay recorded video through the full monitoring pipeline, unthrottled.
+
+Each simulated camera is a real monitoring.Camera whose capture thread reads
+a clip as fast as the pipeline takes frames (no FRAME_INTERVAL pacing, no
+queue-full drops), so every frame of the clip goes through motion gating,
+the detectors, DeepSort, landmarks and recognition exactly as in production.
+N cameras share the process, the models and the inference scheduler the
+same way they do on a site box.
+
+Reports end-to-end FPS, per-stage p50/p95/p99 latency, peak RSS and the
+recognition decisions the cameras made, and writes them as JSON together
+with the git commit so runs can be compared across commits.
+
+    python scripts/bench_pipeline.py --cameras 4 --loops 2 --out bench.json
+    python scripts/bench_pipeline.py --videos clip1.mp4 clip2.mp4 --no-db --no-motion-gate
+
+Timing-based behaviour (motion-gate hold, recognition re-check intervals)
+still runs on wall-clock time, so a clip replayed faster than real time
+sees fewer re-checks per frame than it would live.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts import monitoring
+from scripts.pipeline_metrics import STAGE_METRIC, metrics
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov")
+PERCENTILES = (50, 95, 99)
+
+
+class ReplayCamera(monitoring.Camera):
+    """A Camera fed from a video file at whatever rate the pipeline consumes it."""
+
+    def __init__(self, camera_id, path, loops=1, max_frames=None):
+        super().__init__(camera_id, str(path))
+        self.path = str(path)
+        self.loops = loops
+        self.max_frames = max_frames
+        self.frames_read = 0
+        self.frames_out = 0
+        self.capture_done = threading.Event()
+        self.first_out = None
+        self.last_out = None
+
+    def _capture_thread(self):
+        try:
+            for _ in range(self.loops):
+                cap = cv2.VideoCapture(self.path)
+                if not cap.isOpened():
+                    logging.error(f"[Camera {self.camera_id}] Cannot open source {self.path}")
+                    return
+                try:
+                    while not self.stop_event.is_set():
+                        if self.max_frames and self.frames_read >= self.max_frames:
+                            return
+                        with metrics.span("capture_read", self.camera_id):
+                            ret, fr = cap.read()
+                        if not ret:
+                            break
+                        item = self._ingest(fr)
+                        self.frames_read += 1
+                        # block instead of dropping: every frame of the clip is processed
+                        while not self.stop_event.is_set():
+                            try:
+                                self.frame_queue.put(item, timeout=0.1)
+                                break
+                            except Exception:
+                                continue
+                finally:
+                    cap.release()
+        finally:
+            self.capture_done.set()
+
+    def _publish(self, frame):
+        super()._publish(frame)
+        now = time.perf_counter()
+        if self.first_out is None:
+            self.first_out = now
+        self.last_out = now
+        self.frames_out += 1
+
+    @property
+    def drained(self):
+        return self.capture_done.is_set() and self.frame_queue.empty() and self.frames_out >= self.frames_read
+
+
+def find_videos(paths):
+    found = []
+    for p in map(Path, paths):
+        if p.is_dir():
+            found.extend(sorted(f for f in p.rglob("*") if f.suffix.lower() in VIDEO_EXTENSIONS))
+        elif p.is_file():
+            found.append(p)
+    return found
+
+
+def percentiles_ms(values):
+    if not values:
+        return None
+    arr = np.asarray(values, dtype=np.float64) * 1000.0
+    out = {f"p{q}_ms": round(float(np.percentile(arr, q)), 3) for q in PERCENTILES}
+    out["mean_ms"] = round(float(arr.mean()), 3)
+    out["count"] = int(arr.size)
+    return out
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+    except ImportError:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+
+
+def current_rss_mb():
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().rss / (1024 * 1024), 1)
+    except ImportError:
+        return None
+
+
+def git_revision():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, capture_output=True,
+                             text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=PROJECT_ROOT,
+                               capture_output=True, text=True, timeout=10).stdout.strip()
+        return {"commit": rev or None, "dirty": bool(dirty)}
+    except Exception:
+        return {"commit": None, "dirty": None}
+
+
+def stage_names(snapshot):
+    return sorted({h["labels"].get("stage") for h in snapshot["histograms"]
+                   if h["name"] == STAGE_METRIC and h["labels"].get("stage")})
+
+
+def counter_total(snapshot, name, camera=None):
+    return sum(c["value"] for c in snapshot["counters"]
+               if c["name"] == name and (camera is None or c["labels"].get("camera") == str(camera)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--videos', nargs='+', default=[str(PROJECT_ROOT / "Anomalies_video")],
+                        help="video files or directories searched recursively (default: Anomalies_video/)")
+    parser.add_argument('--cameras', type=int, default=1, help="simulated cameras; clips are assigned round-robin")
+    parser.add_argument('--loops', type=int, default=1, help="times each camera replays its clip")
+    parser.add_argument('--max-frames', type=int, default=None, help="stop each camera after this many frames")
+    parser.add_argument('--no-motion-gate', action='store_true', help="run the detectors on every frame")
+    parser.add_argument('--behavior-mode', choices=('crops', 'frame', 'roi'), default=monitoring.BEHAVIOR_MODE)
+    parser.add_argument('--no-db', action='store_true',
+                        help="skip authorization/worker lookups (every identity is reported unauthorised)")
+    parser.add_argument('--dispatch', action='store_true', help="also send recognition events to Celery")
+    parser.add_argument('--save-anomalies', action='store_true', help="write anomaly clips as in production")
+    parser.add_argument('--samples', type=int, default=100000, help="latency samples kept per stage and camera")
+    parser.add_argument('--drain-timeout', type=float, default=10.0,
+                        help="seconds to wait for queued recognitions after the last frame")
+    parser.add_argument('--out', help="write results as JSON")
+    args = parser.parse_args()
+
+    videos = find_videos(args.videos)
+    if not videos:
+        parser.error(f"no video files found in {args.videos}")
+
+    # monitoring configures INFO logging on import; per-frame info lines would skew the timings
+    logging.getLogger().setLevel(logging.WARNING)
+    monitoring.MOTION_GATING = not args.no_motion_gate
+    monitoring.BEHAVIOR_MODE = args.behavior_mode
+    # keep the replay side-effect free unless asked otherwise
+    monitoring.LOG_FILE = os.devnull
+    if not args.save_anomalies:
+        monitoring.ANOMALY_COOLDOWN_SECONDS = float("inf")
+    if args.no_db:
+        monitoring.check_authorization = lambda name: False
+        monitoring.fetch_worker_details = lambda name: None
+
+    decisions = []
+    dispatch = monitoring.on_face_recognized
+    t_start = None
+
+    def record_decision(camera_id, data):
+        decisions.append({"camera": camera_id, "at_s": round(time.perf_counter() - t_start, 3),
+                          "name": data.get("name"), "auth": bool(data.get("auth")),
+                          "similarity": round(float(data.get("similarity") or 0.0), 4),
+                          "generation": data.get("generation")})
+        if args.dispatch:
+            dispatch(camera_id, data)
+
+    monitoring.on_face_recognized = record_decision
+
+    print(f"[bench] loading models ({monitoring.INFERENCE_BACKEND}, precision={monitoring.MODEL_PRECISION})")
+    t0 = time.perf_counter()
+    monitoring.models.warm_up(background=False)
+    load_s = time.perf_counter() - t0
+    rss_loaded = current_rss_mb()
+
+    cams = []
+    for i in range(args.cameras):
+        cid = f"bench-{i}"
+        cam = ReplayCamera(cid, videos[i % len(videos)], loops=args.loops, max_frames=args.max_frames)
+        monitoring.camera_registry[cid] = cam
+        cams.append(cam)
+    print(f"[bench] {len(cams)} camera(s) over {len(videos)} clip(s), models ready in {load_s:.1f}s")
+
+    # histograms are created on first use, so the reset makes them keep raw samples
+    metrics.keep_samples = args.samples
+    metrics.reset()
+
+    t_start = time.perf_counter()
+    for cam in cams:
+        cam.start()
+    try:
+        while not all(cam.drained for cam in cams):
+            time.sleep(0.05)
+    except KeyboardInterrupt:
+        print("[bench] interrupted, reporting partial results")
+    wall_s = time.perf_counter() - t_start
+
+    deadline = time.time() + args.drain_timeout
+    while time.time() < deadline and any(not cam.recognition_queue.empty() for cam in cams):
+        time.sleep(0.05)
+
+    snapshot = monitoring.get_metrics_snapshot()
+    recognition_stats = monitoring.get_recognition_stats()
+    motion_stats = monitoring.get_motion_stats()
+    for cam in cams:
+        cam.stop()
+        # results that arrived after the last frame are decisions too
+        while not cam.results_queue.empty():
+            tid, name, sim, _, gen = cam.results_queue.get_nowait()
+            record_decision(cam.camera_id, {"name": name, "auth": monitoring.track_authorized(name),
+                                            "similarity": sim, "generation": gen})
+        monitoring.camera_registry.pop(cam.camera_id, None)
+
+    total_frames = sum(cam.frames_out for cam in cams)
+    per_camera = {}
+    for cam in cams:
+        span = (cam.last_out - cam.first_out) if cam.first_out is not None else 0.0
+        per_camera[cam.camera_id] = {
+            "video": cam.path,
+            "frames": cam.frames_out,
+            "frames_inferred": int(counter_total(snapshot, "frames_processed_total", cam.camera_id)),
+            "frames_gated": int(counter_total(snapshot, "frames_gated_total", cam.camera_id)),
+            "frames_dropped": int(counter_total(snapshot, "frames_dropped_total", cam.camera_id)),
+            "fps": round(cam.frames_out / span, 2) if span > 0 else None,
+            "frame_total": percentiles_ms(metrics.samples("frame_total", cam.camera_id)),
+            "recognition_cache": recognition_stats.get(cam.camera_id),
+            "motion_gate": motion_stats.get(cam.camera_id),
+        }
+
+    stages = {stage: percentiles_ms(metrics.samples(stage)) for stage in stage_names(snapshot)}
+    names = {}
+    for d in decisions:
+        names[d["name"]] = names.get(d["name"], 0) + 1
+
+    result = {
+        "git": git_revision(),
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "config": {
+            "args": vars(args),
+            "inference_backend": monitoring.INFERENCE_BACKEND,
+            "model_precision": monitoring.MODEL_PRECISION,
+            "inference_batching": monitoring.INFERENCE_BATCHING,
+            "frame_bus": monitoring.FRAME_BUS,
+            "detector_input_size": monitoring.DETECTOR_INPUT_SIZE,
+        },
+        "model_load_s": round(load_s, 2),
+        "wall_s": round(wall_s, 3),
+        "frames": total_frames,
+        "fps": round(total_frames / wall_s, 2) if wall_s > 0 else None,
+        "fps_per_camera": round(total_frames / wall_s / len(cams), 2) if wall_s > 0 else None,
+        "rss_after_load_mb": rss_loaded,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stages,
+        "cameras": per_camera,
+        "inference": monitoring.get_inference_stats(),
+        "recognition": {"decisions": len(decisions), "by_name": names, "events": decisions},
+    }
+
+    print(f"[bench] {total_frames} frames in {wall_s:.1f}s -> {result['fps']} fps total, "
+          f"{result['fps_per_camera']} fps/camera, peak RSS {result['peak_rss_mb']} MB")
+    print(f"{'stage':<20}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, st in stages.items():
+        if st:
+            print(f"{stage:<20}{st['count']:>8}{st['p50_ms']:>10.2f}{st['p95_ms']:>10.2f}{st['p99_ms']:>10.2f}")
+    print(f"[bench] {len(decisions)} recognition decisions: "
+          + (", ".join(f"{n}={c}" for n, c in sorted(names.items())) or "none"))
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(result, f, indent=2, default=str)
+        print(f"[bench] results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+# scripts/camera_supervisor.py
+"""Run cameras in worker processes instead of threads of the API process.
+
+Each worker process imports scripts.monitoring on its own (own interpreter,
+own GIL, own models) and hosts one camera or a group of CAMERAS_PER_WORKER
+cameras. The supervisor in the API process exposes the same camera API as
+scripts.monitoring (add_camera, start_camera, stop_camera, remove_camera,
+list_cameras, get_latest_frame, get_latest_faces, get_latest_anomalies)
+over a pipe per worker; annotated frames are read straight from the
+camera's shared-memory output ring (see frame_bus.py), not sent over IPC.
+
+Workers that die are restarted and their cameras re-added (and restarted
+if they were running). Optional CPU pinning per worker:
+
+    CAMERA_WORKER_CPUS="0-1;2-3;4-5"   explicit CPU set per worker (round robin)
+    CAMERA_WORKER_CPUS="auto"          CPUS_PER_WORKER consecutive cores per worker
+"""
+import logging
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.frame_bus import FrameRing, ring_name, unlink_ring
+from scripts.pipeline_metrics import merge_snapshots, metrics
+
+CAMERAS_PER_WORKER = int(os.getenv("CAMERAS_PER_WORKER", "1"))
+CAMERA_WORKER_CPUS = os.getenv("CAMERA_WORKER_CPUS", "")
+CPUS_PER_WORKER = int(os.getenv("CPUS_PER_WORKER", "1"))
+WORKER_REPLY_TIMEOUT = 30.0
+RESTART_BACKOFF = (1.0, 30.0)   # first and longest delay between restarts of one worker
+RING_REFRESH_INTERVAL = 1.0     # how often to ask a worker for a camera's ring before it exists
+
+_ERRORS = {"KeyError": KeyError, "ValueError": ValueError}
+
+
+def parse_cpu_sets(spec, n_cpus=None, per_worker=CPUS_PER_WORKER):
+    """"0-1;2,3" -> [[0, 1], [2, 3]]; "auto" -> consecutive groups of per_worker cores."""
+    spec = (spec or "").strip()
+    if not spec:
+        return []
+    if spec == "auto":
+        n_cpus = n_cpus or os.cpu_count() or 1
+        per_worker = max(1, per_worker)
+        return [list(range(i, min(i + per_worker, n_cpus))) for i in range(0, n_cpus, per_worker)]
+    sets = []
+    for group in spec.split(";"):
+        cpus = []
+        for part in group.split(","):
+            part = part.strip()
+            if "-" in part:
+                lo, hi = part.split("-")
+                cpus.extend(range(int(lo), int(hi) + 1))
+            elif part:
+                cpus.append(int(part))
+        if cpus:
+            sets.append(cpus)
+    return sets
+
+
+def _pin_to(cpus):
+    if not cpus:
+        return
+    try:
+        import psutil
+        psutil.Process().cpu_affinity(list(cpus))
+        return
+    except ImportError:
+        pass
+    except Exception as e:
+        logging.warning(f"[Supervisor] psutil could not set affinity {cpus}: {e}")
+        return
+    if hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, set(cpus))
+        except OSError as e:
+            logging.warning(f"[Supervisor] Could not set affinity {cpus}: {e}")
+    else:
+        logging.warning("[Supervisor] CPU affinity needs psutil on this platform")
+
+
+# ------------------------- worker process -------------------------
+def _worker_main(worker_id, conn, cpus, ring_token):
+    _pin_to(cpus)
+    # ring names the supervisor can rebuild to clean up after this process (see _restart)
+    os.environ["FRAME_RING_TOKEN"] = ring_token
+    if cpus:
+        # keep each worker's math libraries inside its own cores
+        for var in ("OMP_NUM_THREADS", "ONNX_INTRA_OP_THREADS"):
+            os.environ.setdefault(var, str(len(cpus)))
+
+    import scripts.monitoring as monitoring
+    monitoring.warm_up()
+    logging.info(f"[Supervisor] Worker {worker_id} ready (pid {os.getpid()}, cpus {cpus or 'any'})")
+
+    handlers = {
+        "add": monitoring.add_camera,
+        "start": monitoring.start_camera,
+        "stop": monitoring.stop_camera,
+        "remove": monitoring.remove_camera,
+        "list": monitoring.list_cameras,
+        "faces": monitoring.get_latest_faces,
+        "anomalies": monitoring.get_latest_anomalies,
+        "frame_bus": monitoring.frame_bus_names,
+        "inference_stats": monitoring.get_inference_stats,
+        "motion_stats": monitoring.get_motion_stats,
+        "recognition_stats": monitoring.get_recognition_stats,
+        "directory_stats": monitoring.get_directory_stats,
+        "event_stats": monitoring.get_event_stats,
+        "metrics": monitoring.get_metrics_snapshot,
+        "generation": monitoring.get_embedding_generation,
+        "model_status": monitoring.model_status,
+        "ping": lambda: os.getpid(),
+    }
+    while True:
+        try:
+            seq, op, args = conn.recv()
+        except (EOFError, OSError):
+            break  # supervisor went away
+        if op == "shutdown":
+            break
+        try:
+            result = handlers[op](*args)
+            # handlers return live objects; only plain data crosses the pipe
+            conn.send((seq, "ok", None if op == "add" else result))
+        except Exception as e:
+            conn.send((seq, "error", type(e).__name__, str(e)))
+
+    for cid in list(monitoring.list_cameras()):
+        try:
+            monitoring.remove_camera(cid)
+        except Exception:
+            pass
+
+
+# ------------------------- supervisor side -------------------------
+class _Worker:
+    def __init__(self, worker_id, cpus):
+        self.worker_id = worker_id
+        self.cpus = cpus
+        self.process = None
+        self.conn = None
+        self.ring_token = None
+        self.lock = threading.Lock()
+        self.cameras = {}          # camera_id -> {"source": ..., "running": bool}
+        self.restarts = 0
+        self.next_restart = 0.0
+        self.seq = 0               # request id; replies to requests that timed out are discarded
+
+    def spawn(self, ctx):
+        parent, child = ctx.Pipe()
+        # fresh per spawn, so a restarted worker never collides with its predecessor's rings
+        self.ring_token = f"w{self.worker_id}{uuid.uuid4().hex[:6]}"
+        self.process = ctx.Process(target=_worker_main, args=(self.worker_id, child, self.cpus, self.ring_token),
+                                   name=f"camera-worker-{self.worker_id}", daemon=True)
+        self.process.start()
+        child.close()
+        self.conn = parent
+
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def call(self, op, *args):
+        with self.lock:
+            if not self.alive():
+                raise RuntimeError(f"camera worker {self.worker_id} is not running")
+            self.seq += 1
+            self.conn.send((self.seq, op, args))
+            deadline = time.time() + WORKER_REPLY_TIMEOUT
+            while True:
+                if not self.conn.poll(max(0.0, deadline - time.time())):
+                    raise TimeoutError(f"camera worker {self.worker_id} did not answer {op}")
+                reply = self.conn.recv()
+                if reply[0] == self.seq:
+                    break
+                logging.debug(f"[Supervisor] Discarding late reply {reply[0]} from worker {self.worker_id}")
+        if reply[1] == "ok":
+            return reply[2]
+        raise _ERRORS.get(reply[2], RuntimeError)(reply[3])
+
+
+class CameraSupervisor:
+    """Drop-in for the camera functions of scripts.monitoring, one process per camera group."""
+
+    def __init__(self, cameras_per_worker=CAMERAS_PER_WORKER, cpu_sets=None, check_interval=1.0):
+        self.cameras_per_worker = max(1, cameras_per_worker)
+        self.cpu_sets = parse_cpu_sets(CAMERA_WORKER_CPUS) if cpu_sets is None else cpu_sets
+        self.check_interval = check_interval
+        self._ctx = mp.get_context("spawn")
+        self._workers = []
+        self._placement = {}       # camera_id -> _Worker
+        self._rings = {}           # camera_id -> (FrameRing or None, last lookup time)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._monitor = threading.Thread(target=self._watch, daemon=True, name="camera-supervisor")
+        self._monitor.start()
+
+    # ---------------- placement ----------------
+    def _worker_for_new_camera(self):
+        for w in self._workers:
+            if len(w.cameras) < self.cameras_per_worker:
+                return w
+        wid = len(self._workers)
+        cpus = self.cpu_sets[wid % len(self.cpu_sets)] if self.cpu_sets else None
+        w = _Worker(wid, cpus)
+        w.spawn(self._ctx)
+        self._workers.append(w)
+        logging.info(f"[Supervisor] Started camera worker {wid} (pid {w.process.pid}, cpus {cpus or 'any'})")
+        return w
+
+    def _worker(self, camera_id):
+        w = self._placement.get(camera_id)
+        if w is None:
+            raise KeyError(f"Camera id {camera_id} not found")
+        return w
+
+    # ---------------- monitoring API ----------------
+    def add_camera(self, camera_id, source):
+        with self._lock:
+            if camera_id in self._placement:
+                raise ValueError(f"Camera id {camera_id} already exists")
+            w = self._worker_for_new_camera()
+            w.cameras[camera_id] = {"source": source, "running": False}
+            self._placement[camera_id] = w
+        try:
+            w.call("add", camera_id, source)
+        except Exception:
+            with self._lock:
+                w.cameras.pop(camera_id, None)
+                self._placement.pop(camera_id, None)
+            raise
+        logging.info(f"[Supervisor] Camera {camera_id} -> worker {w.worker_id}")
+
+    def start_camera(self, camera_id):
+        w = self._worker(camera_id)
+        w.call("start", camera_id)
+        w.cameras[camera_id]["running"] = True
+
+    def stop_camera(self, camera_id):
+        w = self._worker(camera_id)
+        w.call("stop", camera_id)
+        w.cameras[camera_id]["running"] = False
+        self._drop_ring(camera_id)
+
+    def remove_camera(self, camera_id):
+        w = self._worker(camera_id)
+        try:
+            w.call("remove", camera_id)
+        finally:
+            with self._lock:
+                w.cameras.pop(camera_id, None)
+                self._placement.pop(camera_id, None)
+            self._drop_ring(camera_id)
+
+    def list_cameras(self):
+        return list(self._placement.keys())
+
+    def get_latest_faces(self, camera_id):
+        w = self._placement.get(camera_id)
+        return self._quiet_call(w, "faces", camera_id)
+
+    def get_latest_anomalies(self, camera_id):
+        w = self._placement.get(camera_id)
+        return self._quiet_call(w, "anomalies", camera_id)
+
+    def get_latest_frame(self, camera_id):
+        ring = self._ring(camera_id)
+        if ring is None:
+            return None
+        try:
+            return ring.latest()[1]
+        except Exception:
+            self._drop_ring(camera_id)
+            return None
+
+    def get_inference_stats(self):
+        return {f"worker-{w.worker_id}": self._quiet_call(w, "inference_stats") for w in self._workers}
+
+    def get_motion_stats(self):
+        stats = {}
+        for w in self._workers:
+            stats.update(self._quiet_call(w, "motion_stats") or {})
+        return stats
+
+    def get_recognition_stats(self):
+        stats = {}
+        for w in self._workers:
+            stats.update(self._quiet_call(w, "recognition_stats") or {})
+        return stats
+
+    def get_directory_stats(self):
+        return {f"worker-{w.worker_id}": self._quiet_call(w, "directory_stats") for w in self._workers}
+
+    def get_event_stats(self):
+        return {f"worker-{w.worker_id}": self._quiet_call(w, "event_stats") for w in self._workers}
+
+    def get_metrics_snapshot(self):
+        """This process' metrics (stream encoding) plus every worker's, labelled by worker."""
+        snaps = [metrics.snapshot(worker="api")]
+        snaps += [self._quiet_call(w, "metrics", {"worker": str(w.worker_id)}) for w in self._workers]
+        return merge_snapshots(snaps)
+
+    def get_embedding_generation(self):
+        gens = {f"worker-{w.worker_id}": self._quiet_call(w, "generation") for w in self._workers}
+        return {"workers": gens}
+
+    def model_status(self):
+        workers = {f"worker-{w.worker_id}": self._quiet_call(w, "model_status") for w in self._workers}
+        ready = all(s and s.get("ready") for s in workers.values())
+        return {"ready": ready, "models": workers}
+
+    def warm_up(self, background=True):
+        return None  # each worker warms its own models when it starts
+
+    def workers(self):
+        return [{"worker": w.worker_id, "pid": w.process.pid if w.process else None, "alive": w.alive(),
+                 "cpus": w.cpus, "restarts": w.restarts, "cameras": list(w.cameras)} for w in self._workers]
+
+    def shutdown(self, timeout=5.0):
+        self._stop_event.set()
+        for w in self._workers:
+            try:
+                with w.lock:
+                    w.conn.send((0, "shutdown", ()))
+            except Exception:
+                pass
+        for w in self._workers:
+            if w.process is not None:
+                w.process.join(timeout)
+                if w.process.is_alive():
+                    w.process.terminate()
+        for cid in list(self._rings):
+            self._drop_ring(cid)
+
+    # ---------------- internals ----------------
+    def _quiet_call(self, w, op, *args):
+        if w is None:
+            return None
+        try:
+            return w.call(op, *args)
+        except Exception as e:
+            logging.debug(f"[Supervisor] {op} on worker {w.worker_id} failed: {e}")
+            return None
+
+    def _ring(self, camera_id):
+        ring, looked_up = self._rings.get(camera_id, (None, 0.0))
+        if ring is not None:
+            return ring
+        now = time.time()
+        if now - looked_up < RING_REFRESH_INTERVAL:
+            return None
+        names = self._quiet_call(self._placement.get(camera_id), "frame_bus", camera_id)
+        ring = None
+        if names:
+            try:
+                ring = FrameRing.attach(names["output"])
+            except Exception as e:
+                logging.debug(f"[Supervisor] Cannot attach to {names['output']}: {e}")
+        self._rings[camera_id] = (ring, now)
+        return ring
+
+    def _drop_ring(self, camera_id):
+        ring, _ = self._rings.pop(camera_id, (None, 0.0))
+        if ring is not None:
+            ring.close()
+
+    def _restart(self, w):
+        logging.error(f"[Supervisor] Camera worker {w.worker_id} died "
+                      f"(exit code {w.process.exitcode}); restarting with cameras {list(w.cameras)}")
+        for cid in w.cameras:
+            self._drop_ring(cid)
+            # the dead worker owned its rings and nobody else will unlink them
+            for kind in ("raw", "out"):
+                try:
+                    unlink_ring(ring_name(cid, kind, token=w.ring_token))
+                except Exception as e:
+                    logging.warning(f"[Supervisor] Could not remove ring {kind} of camera {cid}: {e}")
+        try:
+            w.conn.close()
+        except Exception:
+            pass
+        w.restarts += 1
+        w.spawn(self._ctx)
+        for cid, cfg in list(w.cameras.items()):
+            try:
+                w.call("add", cid, cfg["source"])
+                if cfg["running"]:
+                    w.call("start", cid)
+            except Exception as e:
+                logging.error(f"[Supervisor] Could not restore camera {cid} on worker {w.worker_id}: {e}")
+
+    def _watch(self):
+        while not self._stop_event.wait(self.check_interval):
+            for w in list(self._workers):
+                if w.alive() or w.process is None:
+                    continue
+                now = time.time()
+                if now < w.next_restart:
+                    continue
+                # back off exponentially for workers that keep crashing
+                delay = min(RESTART_BACKOFF[0] * (2 ** min(w.restarts, 10)), RESTART_BACKOFF[1])
+                w.next_restart = now + delay
+                try:
+                    self._restart(w)
+                except Exception as e:
+                    logging.error(f"[Supervisor] Restarting worker {w.worker_id} failed: {e}")
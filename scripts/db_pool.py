@@ -0,0 +1,207 @@
+# scripts/db_pool.py
+"""Bounded MySQL connection pools shared by the API, monitoring and Celery.
+
+    pool = ConnectionPool(lambda: mysql.connector.connect(**DB_CONFIG), name="monitoring")
+    conn = pool.get()        # blocks up to `timeout` when all `size` connections are out
+    try:
+        ...
+    finally:
+        conn.close()         # back to the pool, not to the server
+
+A checked-out connection belongs to the calling thread until it is closed;
+it is never handed to anyone else meanwhile. Idle connections are reused
+most-recently-used first, pinged before reuse once they have sat idle for
+`ping_after` seconds, and replaced after `recycle` seconds so server-side
+timeouts never surface as errors. Uncommitted work is rolled back on
+release. Checkout wait time and pool utilisation are exported through
+pipeline_metrics.
+"""
+import logging
+import os
+import threading
+import time
+
+from scripts.pipeline_metrics import metrics
+
+# Per process and pool; MySQL sees at most DB_POOL_SIZE connections from each
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))          # seconds a checkout may wait
+DB_POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", "1800"))       # seconds before a connection is replaced
+DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "30"))   # idle seconds before a reuse is pinged
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    """Proxy for a DB-API connection whose close() returns it to its pool."""
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise AttributeError(f"connection already returned to pool {self._pool.name!r}")
+        return getattr(raw, name)
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool._release(raw, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __del__(self):
+        # a caller that forgot close() must not leak the slot
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, name="db", size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 recycle=DB_POOL_RECYCLE, ping_after=DB_POOL_PING_AFTER):
+        self.connect = connect
+        self.name = name
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self._cond = threading.Condition()
+        self._idle = []        # (raw, created_at, last_used), most recent last
+        self._open = 0
+        self._in_use = 0
+        self._pid = os.getpid()
+        self.counters = {"checkouts": 0, "created": 0, "discarded": 0, "timeouts": 0}
+        _pools[name] = self
+
+    def _after_fork(self):
+        # connections inherited from the parent process share its sockets; forget them
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._idle = []
+            self._open = self._in_use = 0
+
+    def get(self):
+        t0 = time.perf_counter()
+        deadline = time.time() + self.timeout
+        entry = None
+        with self._cond:
+            self._after_fork()
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.counters["timeouts"] += 1
+                    metrics.inc("db_pool_timeouts_total", pool=self.name)
+                    raise PoolTimeout(f"no connection free in pool {self.name!r} after {self.timeout}s "
+                                      f"({self.size} in use)")
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self.counters["checkouts"] += 1
+        metrics.observe("db_pool_wait", time.perf_counter() - t0, pool=self.name)
+
+        if entry is not None:
+            raw, created_at, last_used = entry
+            if self._usable(raw, created_at, last_used):
+                return PooledConnection(self, raw, created_at)
+            self._close_raw(raw)
+        try:
+            raw = self.connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.counters["created"] += 1
+        metrics.inc("db_pool_connections_created_total", pool=self.name)
+        return PooledConnection(self, raw, time.time())
+
+    def _usable(self, raw, created_at, last_used):
+        now = time.time()
+        if now - created_at >= self.recycle:
+            return False
+        if now - last_used < self.ping_after:
+            return True
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception as e:
+            logging.info(f"[DBPool] {self.name}: dropping dead idle connection: {e}")
+            return False
+
+    def _close_raw(self, raw):
+        with self._cond:
+            self.counters["discarded"] += 1
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _release(self, raw, created_at):
+        keep = time.time() - created_at < self.recycle
+        if keep:
+            try:
+                # mysql.connector knows whether a transaction is open; PyMySQL always gets the rollback
+                if getattr(raw, "in_transaction", True):
+                    raw.rollback()
+            except Exception:
+                keep = False
+        with self._cond:
+            if os.getpid() != self._pid:
+                return
+            self._in_use -= 1
+            if keep:
+                self._idle.append((raw, created_at, time.time()))
+            else:
+                self._open -= 1
+            self._cond.notify()
+        if not keep:
+            self._close_raw(raw)
+
+    def close_idle(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for raw, _, _ in idle:
+            self._close_raw(raw)
+
+    def stats(self):
+        with self._cond:
+            return dict(self.counters, size=self.size, open=self._open, in_use=self._in_use,
+                        idle=len(self._idle), utilisation=round(self._in_use / self.size, 3))
+
+
+_pools = {}
+
+
+def _pool_gauges():
+    for name, pool in list(_pools.items()):
+        st = pool.stats()
+        yield "db_pool_size", {"pool": name}, st["size"]
+        yield "db_pool_connections", {"pool": name, "state": "in_use"}, st["in_use"]
+        yield "db_pool_connections", {"pool": name, "state": "idle"}, st["idle"]
+        yield "db_pool_utilisation", {"pool": name}, st["utilisation"]
+
+metrics.add_collector(_pool_gauges)
+
+
+def pool_stats():
+    return {name: pool.stats() for name, pool in list(_pools.items())}
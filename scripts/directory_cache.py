@@ -0,0 +1,215 @@
+# scripts/directory_cache.py
+import datetime
+import logging
+import threading
+import time
+from pathlib import Path
+
+from scripts.file_utils import file_signature
+from scripts.pipeline_metrics import metrics
+
+# Touched by the API after any write to the worker/certificate tables (see app/utils.py),
+# so every process holding a cache reloads within one poll interval.
+DIRECTORY_STAMP_FILE = Path(__file__).resolve().parents[1] / "directory_stamp"
+
+
+def name_key(name):
+    """Person names compare like MySQL's collation and app.utils.resolve_person_folder:
+    ignoring case, surrounding blanks and space vs underscore."""
+    return name.strip().casefold().replace(" ", "_")
+
+
+class BulkRefreshCache:
+    """A whole table held in memory and replaced in one reference swap.
+
+    `loader()` returns the complete {key: value} mapping in one query.
+    Lookups are plain dict reads on the current snapshot: no lock and never
+    a database call, so the frame loop cannot block on MySQL. A background
+    thread reloads the snapshot every `ttl` seconds, right after
+    `invalidate()`, and whenever `stamp_path` changes. A key missing from a
+    loaded snapshot is a cached negative until the next reload. A failed
+    load keeps the previous snapshot and is retried after `retry` seconds;
+    before the first load succeeds every lookup returns the default.
+    """
+
+    kind = "table"
+
+    def __init__(self, loader, ttl=300.0, stamp_path=DIRECTORY_STAMP_FILE, poll_interval=1.0, retry=10.0):
+        self.loader = loader
+        self.ttl = ttl
+        self.stamp_path = stamp_path
+        self.poll_interval = poll_interval
+        self.retry = retry
+        self._data = {}
+        self.loaded_at = None
+        self._next_load = 0.0
+        self._stamp = None
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.counters = {"hits": 0, "negative": 0, "cold": 0, "refreshes": 0, "failures": 0}
+
+    def start(self):
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name=f"{self.kind}-cache")
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def invalidate(self):
+        """Reload as soon as possible (this process only; other processes follow the stamp file)."""
+        self._next_load = 0.0
+        self._wake.set()
+
+    def _stamp_changed(self):
+        if self.stamp_path is None:
+            return False
+        sig = file_signature(self.stamp_path)
+        changed = sig is not None and sig != self._stamp
+        self._stamp = sig
+        return changed
+
+    def _run(self):
+        self._stamp = file_signature(self.stamp_path) if self.stamp_path is not None else None
+        while not self._stop_event.is_set():
+            if self._stamp_changed():
+                self._next_load = 0.0
+            if time.time() >= self._next_load:
+                self.refresh()
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def refresh(self):
+        """Load a new snapshot now; True on success."""
+        try:
+            data = self.loader()
+        except Exception as e:
+            self.counters["failures"] += 1
+            self._next_load = time.time() + self.retry
+            logging.error(f"[Directory] {self.kind} refresh failed, keeping previous snapshot: {e}")
+            return False
+        self._data = data
+        self.loaded_at = time.time()
+        self._next_load = self.loaded_at + self.ttl
+        self.counters["refreshes"] += 1
+        return True
+
+    def _key(self, key):
+        return key
+
+    def get(self, key, default=None):
+        data = self._data
+        if self.loaded_at is None:
+            if self._thread is None:
+                self.start()
+            self.counters["cold"] += 1
+            return default
+        value = data.get(self._key(key)) if key is not None else None
+        if value is None:
+            self.counters["negative"] += 1
+            return default
+        self.counters["hits"] += 1
+        return value
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return dict(self.counters, entries=len(self._data),
+                    age=round(time.time() - self.loaded_at, 1) if self.loaded_at else None)
+
+
+class WorkerDirectory(BulkRefreshCache):
+    """Badge, position, company and access level per person, from WorkerIdentity."""
+
+    kind = "worker_directory"
+    FIELDS = ("BadgeID", "Position", "Company", "AccessLevel")
+
+    def __init__(self, connect, **kwargs):
+        self.connect = connect
+        super().__init__(self._load, **kwargs)
+
+    def _key(self, key):
+        return name_key(key)
+
+    def _load(self):
+        with metrics.span("db_lookup", query="worker_directory"):
+            conn = self.connect()
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT PersonName, BadgeID, Position, Company, AccessLevel FROM WorkerIdentity")
+                rows = cur.fetchall()
+            finally:
+                conn.close()
+        directory = {}
+        for row in rows:
+            if not row[0]:
+                continue
+            # first row wins for duplicate names, like the old fetchone()
+            key = name_key(row[0])
+            if key not in directory:
+                directory[key] = dict(zip(self.FIELDS, row[1:]))
+        return directory
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+class AuthorizationSnapshot(BulkRefreshCache):
+    """Certificate validity per person, from IdentityManagement.
+
+    Each row is reduced to the last day the person is authorised: the
+    earlier of Certificate1 and Certificate3 when both the Certificate2 and
+    Certificate4 flags are set, `date.min` otherwise (or when a date can't
+    be parsed). Names are matched with name_key(), like WorkerDirectory.
+    The check against today happens at lookup, so a certificate
+    expiring at midnight stops authorising without waiting for a reload.
+    """
+
+    kind = "authorization"
+
+    def __init__(self, connect, **kwargs):
+        self.connect = connect
+        super().__init__(self._load, **kwargs)
+
+    def _key(self, key):
+        return name_key(key)
+
+    def _load(self):
+        with metrics.span("db_lookup", query="authorization_snapshot"):
+            conn = self.connect()
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT PersonName, Certificate1, Certificate2, Certificate3, Certificate4 "
+                            "FROM IdentityManagement")
+                rows = cur.fetchall()
+            finally:
+                conn.close()
+        valid_until = {}
+        for name, cert1, flag2, cert3, flag4 in rows:
+            if not name:
+                continue
+            key = name_key(name)
+            if key in valid_until:
+                continue
+            try:
+                until = min(_as_date(cert1), _as_date(cert3)) if flag2 and flag4 else datetime.date.min
+            except Exception:
+                until = datetime.date.min
+            valid_until[key] = until
+        return valid_until
+
+    def is_authorized(self, name, today=None):
+        until = self.get(name)
+        return until is not None and until >= (today or datetime.date.today())
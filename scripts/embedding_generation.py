@@ -0,0 +1,151 @@
+# scripts/embedding_generation.py
+import itertools
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # polling still works without watchdog
+    Observer = None
+    FileSystemEventHandler = object
+
+from scripts.file_utils import file_signature
+
+_versions = itertools.count(1)
+
+
+class EmbeddingGeneration:
+    """Everything identity matching needs, frozen together.
+
+    A generation is built completely off the hot path and published by
+    swapping one module-level reference, so a recognition call that grabbed
+    a generation always sees names, centroids, per-image embeddings and
+    index from the same load. `version` increases with every publish.
+    """
+
+    __slots__ = ("version", "source", "loaded_at", "embeddings_dict", "centroid_names",
+                 "centroid_matrix", "person_emb_matrix", "person_emb_offsets", "centroid_index")
+
+    def __init__(self, embeddings_dict, centroid_names, centroid_matrix,
+                 person_emb_matrix, person_emb_offsets, centroid_index, source=""):
+        self.version = next(_versions)
+        self.source = source
+        self.loaded_at = time.time()
+        self.embeddings_dict = embeddings_dict
+        self.centroid_names = tuple(centroid_names)
+        self.centroid_matrix = centroid_matrix
+        self.person_emb_matrix = person_emb_matrix
+        self.person_emb_offsets = person_emb_offsets
+        self.centroid_index = centroid_index
+
+    @classmethod
+    def empty(cls):
+        return cls({}, [], None, None, None, None, source="empty")
+
+    def __len__(self):
+        return len(self.centroid_names)
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "source": self.source,
+            "identities": len(self.centroid_names),
+            "loaded_at": self.loaded_at,
+            "index": getattr(self.centroid_index, "kind", None),
+        }
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    def __init__(self, watched, wake):
+        self.watched = watched
+        self.wake = wake
+
+    def on_any_event(self, event):
+        for p in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+            if p and os.path.normcase(os.path.abspath(p)) in self.watched:
+                self.wake.set()
+                return
+
+
+class GenerationWatcher:
+    """Calls `reload()` when any watched file changes.
+
+    Filesystem notifications (watchdog) wake the reload thread immediately;
+    a slow periodic stat check is kept as a safety net for filesystems that
+    don't deliver events. Bursts of events are coalesced by `debounce`.
+    """
+
+    def __init__(self, paths, reload, debounce=0.5, poll_interval=30.0):
+        self.paths = [str(p) for p in paths]
+        self.reload = reload
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.reload_count = 0
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._observer = None
+        self._thread = None
+        self._signatures = {}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._signatures = {p: file_signature(p) for p in self.paths}
+        if Observer is not None:
+            try:
+                watched = {os.path.normcase(os.path.abspath(p)) for p in self.paths}
+                handler = _ChangeHandler(watched, self._wake)
+                self._observer = Observer()
+                for d in {str(Path(p).resolve().parent) for p in self.paths}:
+                    if os.path.isdir(d):
+                        self._observer.schedule(handler, d, recursive=False)
+                self._observer.daemon = True
+                self._observer.start()
+            except Exception as e:
+                logging.warning(f"[Monitor] File notifications unavailable, polling instead: {e}")
+                self._observer = None
+        self._thread = threading.Thread(target=self._run, daemon=True, name="embedding-watcher")
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+        if self._observer is not None:
+            try:
+                self._observer.stop()
+            except Exception:
+                pass
+            self._observer = None
+
+    def _changed(self):
+        changed = False
+        for p in self.paths:
+            sig = file_signature(p)
+            if sig is not None and sig != self._signatures.get(p):
+                changed = True
+            self._signatures[p] = sig
+        return changed
+
+    def _run(self):
+        interval = self.poll_interval if self._observer is not None else min(self.poll_interval, 5.0)
+        while not self._stop_event.is_set():
+            self._wake.wait(interval)
+            if self._stop_event.is_set():
+                break
+            if self._wake.is_set():
+                # let the writer finish its burst of renames before reading
+                time.sleep(self.debounce)
+                self._wake.clear()
+            if not self._changed():
+                continue
+            try:
+                logging.info("[Monitor] Embeddings changed on disk, building new generation...")
+                self.reload()
+                self.reload_count += 1
+            except Exception as e:
+                logging.error(f"[Monitor] Embedding reload failed: {e}")
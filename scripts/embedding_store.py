@@ -0,0 +1,188 @@
+# scripts/embedding_store.py
+"""Columnar on-disk face embedding store.
+
+Layout under STORE_DIR:
+
+    CURRENT                 name of the live generation directory
+    gen-<ms>-<id>/
+        embeddings.npy      float32 (M, D)  every per-image embedding, unit length
+        centroids.npy       float32 (P, D)  one unit-length centroid per identity
+        offsets.npy         int64   (P+1,)  rows offsets[i]:offsets[i+1] belong to names[i]
+        names.json          identity names in row order
+        meta.json           dim, counts, creation time
+
+Arrays are opened with np.load(mmap_mode='r'), so every process that reads
+the store shares the same OS page cache instead of holding its own copy.
+A new generation is written next to the old one and published by
+atomically replacing CURRENT; readers never see a half-written store.
+"""
+import datetime
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+STORE_DIR = Path(__file__).resolve().parent / "face_store"
+CURRENT_FILE = "CURRENT"
+KEEP_GENERATIONS = 3
+_EPS = 1e-10
+
+
+def _normalize_rows(x):
+    n = np.linalg.norm(x, axis=1, keepdims=True)
+    return np.where(n < _EPS, x, x / np.maximum(n, _EPS)).astype(np.float32)
+
+
+def _fsync_save(path, arr):
+    with open(path, 'wb') as f:
+        np.save(f, arr)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _fsync_json(path, obj):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class EmbeddingStore:
+    """Read-only view of one store generation."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.generation = self.path.name
+        self.embeddings = np.load(self.path / "embeddings.npy", mmap_mode='r')
+        self.centroids = np.load(self.path / "centroids.npy", mmap_mode='r')
+        self.offsets = np.load(self.path / "offsets.npy")
+        with open(self.path / "names.json", encoding='utf-8') as f:
+            self.names = json.load(f)
+        with open(self.path / "meta.json", encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if len(self.names) != self.centroids.shape[0] or len(self.offsets) != len(self.names) + 1:
+            raise ValueError(f"inconsistent embedding store at {self.path}")
+
+    def __len__(self):
+        return len(self.names)
+
+    def person_embeddings(self, i):
+        return self.embeddings[self.offsets[i]:self.offsets[i + 1]]
+
+    def to_dict(self):
+        """{name: {"embeddings", "centroid"}} made of views into the mapped arrays."""
+        return {
+            name: {"embeddings": self.person_embeddings(i), "centroid": self.centroids[i]}
+            for i, name in enumerate(self.names)
+        }
+
+
+def write_store(embeddings_dict, store_dir=STORE_DIR):
+    """Write a new generation from {name: {"embeddings", "centroid"}} and publish it.
+
+    Also accepts the older {name: embeddings_array} pickle format.
+    Returns the generation directory.
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    names, blocks, cents = [], [], []
+    dim = None
+    for name, v in embeddings_dict.items():
+        if isinstance(v, dict):
+            embs = np.asarray(v.get('embeddings', []), dtype=np.float32)
+            cent = v.get('centroid')
+        else:
+            embs, cent = np.asarray(v, dtype=np.float32), None
+        if embs.ndim == 1 and embs.size:
+            embs = embs[None, :]
+        if embs.size == 0 and cent is None:
+            continue
+        if embs.size:
+            embs = _normalize_rows(embs)
+            dim = embs.shape[1]
+        if cent is None:
+            cent = embs.mean(axis=0)
+        cent = _normalize_rows(np.asarray(cent, dtype=np.float32).reshape(1, -1))[0]
+        dim = dim or cent.shape[0]
+        names.append(name)
+        blocks.append(embs.reshape(-1, dim))
+        cents.append(cent)
+
+    dim = dim or 512
+    embeddings = np.vstack(blocks) if blocks else np.zeros((0, dim), np.float32)
+    centroids = np.vstack(cents) if cents else np.zeros((0, dim), np.float32)
+    offsets = np.concatenate(([0], np.cumsum([b.shape[0] for b in blocks]))).astype(np.int64)
+
+    gen = f"gen-{int(time.time() * 1000)}-{uuid.uuid4().hex[:6]}"
+    tmp = store_dir / (gen + ".tmp")
+    tmp.mkdir()
+    _fsync_save(tmp / "embeddings.npy", np.ascontiguousarray(embeddings, dtype=np.float32))
+    _fsync_save(tmp / "centroids.npy", np.ascontiguousarray(centroids, dtype=np.float32))
+    _fsync_save(tmp / "offsets.npy", offsets)
+    _fsync_json(tmp / "names.json", names)
+    _fsync_json(tmp / "meta.json", {
+        "dim": int(dim),
+        "identities": len(names),
+        "embeddings": int(embeddings.shape[0]),
+        "created": datetime.datetime.now().isoformat(),
+    })
+    os.replace(tmp, store_dir / gen)
+
+    pointer_tmp = store_dir / (CURRENT_FILE + ".tmp")
+    with open(pointer_tmp, 'w') as f:
+        f.write(gen)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, store_dir / CURRENT_FILE)
+
+    _prune_generations(store_dir, keep=gen)
+    logging.info(f"[Store] Published {gen}: {len(names)} identities, {embeddings.shape[0]} embeddings")
+    return store_dir / gen
+
+
+def _prune_generations(store_dir, keep):
+    gens = sorted(p for p in store_dir.iterdir() if p.is_dir() and p.name.startswith("gen-"))
+    for p in gens[:-KEEP_GENERATIONS]:
+        if p.name == keep:
+            continue
+        # a reader may still have the old files mapped (Windows refuses to delete them); retry next time
+        shutil.rmtree(p, ignore_errors=True)
+
+
+def current_generation(store_dir=STORE_DIR):
+    try:
+        return (Path(store_dir) / CURRENT_FILE).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def open_store(store_dir=STORE_DIR):
+    """Open the live generation read-only, or return None if there is no usable store."""
+    gen = current_generation(store_dir)
+    if not gen:
+        return None
+    try:
+        return EmbeddingStore(Path(store_dir) / gen)
+    except Exception as e:
+        logging.error(f"[Store] Failed to open embedding store {gen}: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+    import pickle
+
+    parser = argparse.ArgumentParser(description="Convert face_encodings.pkl into the memory-mapped store.")
+    parser.add_argument("--pkl", default=str(Path(__file__).resolve().parent / "face_encodings.pkl"))
+    parser.add_argument("--store", default=str(STORE_DIR))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    with open(args.pkl, 'rb') as f:
+        write_store(pickle.load(f), args.store)
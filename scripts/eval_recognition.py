@@ -0,0 +1,315 @@
+# scripts/eval_recognition.py
+"""Accuracy versus speed of the identity matchers, measured on face_data.
+
+Per-image embeddings come from the training manifest (face_manifest.pkl,
+written by train_face2.py), from re-embedding face_data/<person>/ images,
+or from face_encodings.pkl. The samples are split into K folds:
+
+  * genuine probes: in fold f, every person's fold-f images are probed
+    against an enrolment built from their remaining images;
+  * impostor probes: in fold f, one group of people is left out of the
+    enrolment entirely and all of their images are probed, which is the
+    unenrolled-visitor case a restricted area has to reject.
+
+Three matchers are scored, each on exactly the decisions it would make live:
+
+  centroid          best centroid, accepted at similarity >= t
+  centroid+verify   recognize_many(): best centroid, then that person's best
+                    per-image similarity must clear t and stay within
+                    FALLBACK_MARGIN of the centroid score
+  full              best similarity over every enrolled image
+
+For each, a threshold sweep gives the ROC (FAR, FRR and misidentification
+rate), the equal error rate and the operating point at the production
+SIMILARITY_THRESHOLD. Per-query latency is timed one query at a time
+against the complete enrolment; centroid and centroid+verify go through
+monitoring.recognize_many itself. The cheapest matcher whose FAR and
+misidentification rate stay within --far-budget at an FRR of at most
+--max-frr is reported as the recommendation.
+
+    python scripts/eval_recognition.py --far-budget 0.001 --out eval.json
+    python scripts/eval_recognition.py --source images --workers 4 --margins 0.0 0.02 0.05
+"""
+import argparse
+import json
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts import monitoring
+from scripts.embedding_generation import EmbeddingGeneration
+from scripts.face_index import _normalize_rows, build_face_index
+
+
+# ------------------------- Samples -------------------------
+def samples_from_manifest():
+    from scripts import train_face2
+    images = train_face2.load_manifest()
+    return [(rec["person"], np.asarray(rec["embeddings"], dtype=np.float32)[0])
+            for _, rec in sorted(images.items()) if len(rec["embeddings"])]
+
+
+def samples_from_images(workers):
+    from scripts import train_face2
+    jobs = [((person, str(p)), p) for person, paths in train_face2.list_person_images().items() for p in paths]
+    embedded = train_face2.embed_image_files(jobs, workers=workers)
+    return [(person, embs[0]) for (person, _), embs in sorted(embedded.items()) if embs.shape[0]]
+
+
+def samples_from_pickle(path):
+    with open(path, 'rb') as f:
+        raw = pickle.load(f)
+    out = []
+    for person, v in sorted(raw.items()):
+        embs = v.get('embeddings') if isinstance(v, dict) else v
+        embs = np.asarray(embs, dtype=np.float32)
+        out.extend((person, e) for e in embs.reshape(-1, embs.shape[-1]))
+    return out
+
+
+def load_samples(source, workers, pickle_path):
+    if source == "auto":
+        from scripts import train_face2
+        source = "manifest" if train_face2.MANIFEST_FILE.exists() else "images"
+    if source == "manifest":
+        samples = samples_from_manifest()
+    elif source == "images":
+        samples = samples_from_images(workers)
+    else:
+        samples = samples_from_pickle(pickle_path)
+    if not samples:
+        raise SystemExit(f"[eval] no embeddings found (source={source})")
+    people = sorted({p for p, _ in samples})
+    labels = np.array([people.index(p) for p, _ in samples], dtype=np.int64)
+    return source, people, _normalize_rows(np.vstack([e for _, e in samples])), labels
+
+
+# ------------------------- Enrolment -------------------------
+class Gallery:
+    """Centroids and per-image embeddings for a subset of samples, laid out like an EmbeddingGeneration."""
+
+    def __init__(self, embs, labels):
+        self.person_ids = np.unique(labels)
+        blocks = [embs[labels == pid] for pid in self.person_ids]
+        counts = np.array([b.shape[0] for b in blocks], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.pmat = np.vstack(blocks) if blocks else np.zeros((0, embs.shape[1]), np.float32)
+        self.owners = np.repeat(np.arange(len(blocks)), counts)
+        self.cmat = _normalize_rows(np.vstack([b.mean(axis=0) for b in blocks])) if blocks else None
+
+    def generation(self, people):
+        names = [people[pid] for pid in self.person_ids]
+        emb_map = {n: {"embeddings": self.pmat[self.offsets[i]:self.offsets[i + 1]], "centroid": self.cmat[i]}
+                   for i, n in enumerate(names)}
+        index = build_face_index(self.cmat, backend=monitoring.FACE_INDEX_BACKEND,
+                                 ivf_min_size=monitoring.FACE_INDEX_IVF_MIN_SIZE,
+                                 n_probe=monitoring.FACE_INDEX_NPROBE)
+        return EmbeddingGeneration(emb_map, names, self.cmat, self.pmat, self.offsets, index, source="eval")
+
+
+def score_probes(gallery, q, margins):
+    """Per matcher: (predicted person id, score); the matcher accepts when score >= threshold.
+
+    centroid+verify accepts iff min(centroid, per-image) >= t and
+    per-image >= centroid - margin, so its score is min(centroid, per-image),
+    or -inf when the margin test fails.
+    """
+    csims = q @ gallery.cmat.T
+    cand = np.argmax(csims, axis=1)
+    c = csims[np.arange(q.shape[0]), cand]
+
+    isims = q @ gallery.pmat.T
+    best_img = np.argmax(isims, axis=1)
+    full = isims[np.arange(q.shape[0]), best_img]
+
+    # best per-image similarity of the centroid candidate
+    own = gallery.owners[None, :] == cand[:, None]
+    p = np.where(own, isims, -np.inf).max(axis=1)
+
+    out = {"centroid": (gallery.person_ids[cand], c)}
+    for m in margins:
+        out[verify_name(m)] = (gallery.person_ids[cand], np.where(p >= c - m, np.minimum(c, p), -np.inf))
+    out["full"] = (gallery.person_ids[gallery.owners[best_img]], full)
+    return out
+
+
+def verify_name(margin):
+    return f"centroid+verify(margin={margin:g})"
+
+
+def run_folds(embs, labels, folds, seed, margins):
+    """Score every genuine and impostor probe once; returns {matcher: dict of arrays}."""
+    rng = np.random.default_rng(seed)
+    n_people = int(labels.max()) + 1
+    sample_fold = np.empty(labels.shape[0], dtype=np.int64)
+    for pid in range(n_people):
+        idx = np.nonzero(labels == pid)[0]
+        sample_fold[rng.permutation(idx)] = np.arange(idx.size) % folds
+    person_fold = rng.permutation(n_people) % folds
+
+    acc = {}
+    for f in range(folds):
+        left_out = person_fold[labels] == f
+        enrol = ~left_out & (sample_fold != f)
+        if not enrol.any():
+            continue
+        gallery = Gallery(embs[enrol], labels[enrol])
+        enrolled = np.isin(labels, gallery.person_ids)
+        genuine = ~left_out & (sample_fold == f) & enrolled
+        probes = genuine | left_out
+        if not probes.any():
+            continue
+        for name, (pred, score) in score_probes(gallery, embs[probes], margins).items():
+            a = acc.setdefault(name, {"pred": [], "score": [], "truth": [], "genuine": []})
+            a["pred"].append(pred)
+            a["score"].append(score)
+            a["truth"].append(labels[probes])
+            a["genuine"].append(genuine[probes])
+    return {name: {k: np.concatenate(v) for k, v in a.items()} for name, a in acc.items()}
+
+
+# ------------------------- Metrics -------------------------
+def rates_at(r, t):
+    accepted = r["score"] >= t
+    gen, imp = r["genuine"], ~r["genuine"]
+    correct = accepted & gen & (r["pred"] == r["truth"])
+    misid = accepted & gen & (r["pred"] != r["truth"])
+    return {
+        "threshold": round(float(t), 4),
+        "far": float((accepted & imp).sum() / imp.sum()) if imp.any() else None,
+        "frr": float(1.0 - correct.sum() / gen.sum()) if gen.any() else None,
+        "misid": float(misid.sum() / gen.sum()) if gen.any() else None,
+    }
+
+
+def false_accept(pt):
+    return max(pt["far"] or 0.0, pt["misid"] or 0.0)
+
+
+def summarize(r, thresholds, production_threshold, far_budget, max_frr):
+    roc = [rates_at(r, t) for t in thresholds]
+    eer = min(roc, key=lambda pt: abs(false_accept(pt) - (pt["frr"] or 0.0)))
+    # lowest threshold (fewest rejections) that keeps false accepts within budget
+    in_budget = [pt for pt in roc if false_accept(pt) <= far_budget]
+    operating = in_budget[0] if in_budget else None
+    return {
+        "genuine_probes": int(r["genuine"].sum()),
+        "impostor_probes": int((~r["genuine"]).sum()),
+        "at_production_threshold": rates_at(r, production_threshold),
+        "eer": {"threshold": eer["threshold"], "rate": round((false_accept(eer) + (eer["frr"] or 0.0)) / 2, 4)},
+        "budget_threshold": operating,
+        "meets_budget": operating is not None and (operating["frr"] or 0.0) <= max_frr,
+        "roc": roc,
+    }
+
+
+# ------------------------- Latency -------------------------
+def latency_ms(fn, queries):
+    lat = []
+    for i in range(queries.shape[0]):
+        t0 = time.perf_counter()
+        fn(queries[i:i + 1])
+        lat.append((time.perf_counter() - t0) * 1000.0)
+    lat = np.asarray(lat)
+    return {"p50_ms": float(np.percentile(lat, 50)), "p95_ms": float(np.percentile(lat, 95)),
+            "mean_ms": float(lat.mean())}
+
+
+def time_matchers(embs, labels, people, margins, n_queries, seed):
+    gallery = Gallery(embs, labels)
+    gen = gallery.generation(people)
+    rng = np.random.default_rng(seed + 1)
+    queries = embs[rng.integers(0, embs.shape[0], n_queries)]
+
+    saved = monitoring.FALLBACK_VERIFY, monitoring.FALLBACK_MARGIN
+    out = {}
+    try:
+        monitoring.FALLBACK_VERIFY = False
+        out["centroid"] = latency_ms(lambda q: monitoring.recognize_many(q, gen), queries)
+        monitoring.FALLBACK_VERIFY = True
+        for m in margins:
+            monitoring.FALLBACK_MARGIN = m
+            out[verify_name(m)] = latency_ms(lambda q: monitoring.recognize_many(q, gen), queries)
+    finally:
+        monitoring.FALLBACK_VERIFY, monitoring.FALLBACK_MARGIN = saved
+
+    def full_search(q):
+        sims = _normalize_rows(q) @ gallery.pmat.T
+        best = np.argmax(sims, axis=1)
+        return [(gen.centroid_names[int(gallery.owners[b])], float(sims[i, b])) for i, b in enumerate(best)]
+
+    out["full"] = latency_ms(full_search, queries)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', choices=('auto', 'manifest', 'images', 'pickle'), default='auto',
+                        help="where per-image embeddings come from (auto: manifest if present, else images)")
+    parser.add_argument('--pickle', default=str(monitoring.EMBEDDINGS_FILE), help="face_encodings.pkl for --source pickle")
+    parser.add_argument('--workers', type=int, default=1, help="detection processes for --source images")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--margins', type=float, nargs='+', default=[monitoring.FALLBACK_MARGIN],
+                        help="FALLBACK_MARGIN values to evaluate for centroid+verify")
+    parser.add_argument('--threshold', type=float, default=monitoring.SIMILARITY_THRESHOLD,
+                        help="production threshold to report an operating point for")
+    parser.add_argument('--far-budget', type=float, default=0.001,
+                        help="largest acceptable false-accept (and misidentification) rate")
+    parser.add_argument('--max-frr', type=float, default=0.05,
+                        help="largest false-reject rate a recommended matcher may have at its budget threshold")
+    parser.add_argument('--step', type=float, default=0.005, help="threshold sweep step")
+    parser.add_argument('--latency-queries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help="write results (including ROC curves) as JSON")
+    args = parser.parse_args()
+
+    source, people, embs, labels = load_samples(args.source, args.workers, args.pickle)
+    print(f"[eval] {embs.shape[0]} embeddings of {len(people)} people from {source}")
+    if len(people) < 2:
+        print("[eval] fewer than two people: no impostor probes, FAR cannot be measured")
+
+    folds = max(2, args.folds)
+    scored = run_folds(embs, labels, folds, args.seed, args.margins)
+    thresholds = np.round(np.arange(-1.0, 1.0 + args.step, args.step), 4)
+    results = {name: summarize(r, thresholds, args.threshold, args.far_budget, args.max_frr)
+               for name, r in scored.items()}
+    for name, lat in time_matchers(embs, labels, people, args.margins, args.latency_queries, args.seed).items():
+        if name in results:
+            results[name]["latency"] = lat
+
+    print(f"{'matcher':<30}{'FAR@t':>8}{'FRR@t':>8}{'EER':>8}{'t@budget':>10}{'FRR@b':>8}{'p50 ms':>9}{'mean ms':>9}")
+    for name, s in results.items():
+        prod, op, lat = s["at_production_threshold"], s["budget_threshold"], s.get("latency", {})
+        fmt = lambda v, w, p=4: f"{v:>{w}.{p}f}" if v is not None else f"{'-':>{w}}"
+        print(f"{name:<30}{fmt(prod['far'], 8)}{fmt(prod['frr'], 8)}{fmt(s['eer']['rate'], 8)}"
+              f"{fmt(op and op['threshold'], 10, 3)}{fmt(op and op['frr'], 8)}"
+              f"{fmt(lat.get('p50_ms'), 9, 3)}{fmt(lat.get('mean_ms'), 9, 3)}")
+
+    eligible = [(s["latency"]["mean_ms"], name) for name, s in results.items() if s["meets_budget"] and "latency" in s]
+    recommended = min(eligible)[1] if eligible else None
+    if recommended:
+        op = results[recommended]["budget_threshold"]
+        print(f"[eval] cheapest matcher within FAR {args.far_budget:g} and FRR {args.max_frr:g}: {recommended} "
+              f"at threshold {op['threshold']:.3f}")
+    else:
+        print(f"[eval] no matcher meets FAR {args.far_budget:g} with FRR <= {args.max_frr:g}")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({"source": source, "people": len(people), "embeddings": int(embs.shape[0]),
+                       "folds": folds, "far_budget": args.far_budget, "max_frr": args.max_frr,
+                       "production": {"similarity_threshold": monitoring.SIMILARITY_THRESHOLD,
+                                      "fallback_verify": monitoring.FALLBACK_VERIFY,
+                                      "fallback_margin": monitoring.FALLBACK_MARGIN},
+                       "recommended": recommended, "matchers": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# scripts/event_sink.py
+import atexit
+import collections
+import logging
+import threading
+import time
+
+from scripts.pipeline_metrics import metrics
+
+
+class BatchingEventSink:
+    """Collects events per kind and hands them on in batches.
+
+    `put()` only appends to an in-memory queue, so callers on the frame loop
+    never wait on the broker or the database. A background thread calls
+    `send(kind, events)` with up to `max_batch` events once that many are
+    waiting or the oldest has waited `max_delay` seconds. Events leave the
+    queue only after `send` returns; a failed batch goes back to the front
+    and is retried after `retry` seconds, so delivery is at-least-once for
+    as long as the process lives. Beyond `max_pending` events per kind the
+    oldest are dropped (and counted) to bound memory.
+    """
+
+    def __init__(self, send, max_batch=200, max_delay=1.0, max_pending=20000, retry=2.0):
+        self.send = send
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.retry = retry
+        self._pending = {}               # kind -> deque of (queued_at, event)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._retry_at = 0.0
+        self.counters = {"queued": 0, "sent": 0, "batches": 0, "failures": 0, "dropped": 0}
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="event-sink")
+            self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, kind, event):
+        with self._lock:
+            q = self._pending.get(kind)
+            if q is None:
+                q = self._pending[kind] = collections.deque()
+            if len(q) >= self.max_pending:
+                q.popleft()
+                self.counters["dropped"] += 1
+                metrics.inc("events_dropped_total", kind=kind)
+            q.append((time.time(), event))
+            self.counters["queued"] += 1
+            full = len(q) >= self.max_batch
+        if self._thread is None:
+            self.start()
+        if full:
+            self._wake.set()
+
+    def _take(self, kind, force):
+        """Pop the next due batch for `kind`, or None."""
+        with self._lock:
+            q = self._pending.get(kind)
+            if not q:
+                return None
+            if not force and len(q) < self.max_batch and time.time() - q[0][0] < self.max_delay:
+                return None
+            return [q.popleft() for _ in range(min(self.max_batch, len(q)))]
+
+    def _requeue(self, kind, batch):
+        with self._lock:
+            self._pending[kind].extendleft(reversed(batch))
+
+    def _flush_once(self, force=False):
+        """Send every due batch; False when a send failed."""
+        for kind in list(self._pending):
+            while True:
+                batch = self._take(kind, force)
+                if not batch:
+                    break
+                t0 = time.perf_counter()
+                try:
+                    self.send(kind, [event for _, event in batch])
+                except Exception as e:
+                    self._requeue(kind, batch)
+                    self.counters["failures"] += 1
+                    metrics.inc("event_batch_failures_total", kind=kind)
+                    logging.warning(f"[Events] Sending {len(batch)} {kind} events failed, will retry: {e}")
+                    return False
+                metrics.observe("event_flush", time.perf_counter() - t0, kind=kind)
+                metrics.inc("events_sent_total", kind=kind, value=len(batch))
+                self.counters["sent"] += len(batch)
+                self.counters["batches"] += 1
+        return True
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake.wait(min(self.max_delay, 0.25))
+            self._wake.clear()
+            if time.time() < self._retry_at:
+                continue
+            if not self._flush_once():
+                self._retry_at = time.time() + self.retry
+
+    def flush(self, timeout=5.0):
+        """Send everything pending now, retrying until `timeout`; True when nothing is left."""
+        deadline = time.time() + timeout
+        while True:
+            if self._flush_once(force=True) and not self.pending():
+                return True
+            if time.time() >= deadline:
+                return False
+            time.sleep(min(self.retry, max(0.0, deadline - time.time())))
+
+    def close(self, timeout=5.0):
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.pending() and not self.flush(timeout):
+            logging.error(f"[Events] {self.pending()} events could not be sent before shutdown")
+
+    def pending(self, kind=None):
+        with self._lock:
+            if kind is not None:
+                return len(self._pending.get(kind, ()))
+            return sum(len(q) for q in self._pending.values())
+
+    def stats(self):
+        with self._lock:
+            pending = {kind: len(q) for kind, q in self._pending.items()}
+        return dict(self.counters, pending=pending)
@@ -0,0 +1,392 @@
+# scripts/event_spool.py
+"""Append-only on-disk event log between the camera loop and the broker.
+
+    spool = EventSpool(root, send)       # send(kind, events) -> raises on failure
+    spool.put("face", {...})             # never touches the disk on the caller's thread
+
+Events are JSON lines in numbered segment files inside a slot directory
+that this process holds an exclusive lock on. A writer thread appends
+whatever `put()` queued and fsyncs once per `fsync_interval`, so a crash
+loses at most that window; a failed write (a full disk, say) keeps its
+events queued and cuts the segment back to the last fsynced record. A
+forwarder thread reads records the writer has fsynced and calls `send`
+with up to `max_batch` consecutive events of one kind once that many are
+waiting or the oldest has waited `max_delay` seconds. Its read position is persisted only after `send` succeeds, so
+delivery is at-least-once, and a restarted process that claims the slot
+replays whatever was not yet forwarded. Fully forwarded segments are
+deleted; past `max_bytes` the oldest segments are dropped, forwarded or not.
+"""
+import atexit
+import collections
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from scripts.pipeline_metrics import metrics
+
+SEGMENT_SUFFIX = ".seg"
+READ_CHUNK = 256 * 1024
+
+
+def _lock(fh):
+    """Exclusive, non-blocking lock on an open file; OSError when someone else holds it."""
+    try:
+        import fcntl
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except ImportError:
+        import msvcrt
+        msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+class EventSpool:
+    def __init__(self, root, send, segment_bytes=8 << 20, max_bytes=1 << 30, fsync_interval=0.2,
+                 max_batch=200, max_delay=1.0, retry=2.0, max_queued=20000):
+        self.root = Path(root)
+        self.send = send
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync_interval = fsync_interval
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.retry = retry
+        self.max_queued = max_queued
+        self.dir = None
+        self._lock_fh = None
+        self._incoming = collections.deque()
+        self._incoming_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._wake_writer = threading.Event()
+        self._stop_event = threading.Event()
+        self._fh = None
+        self._needs_rewind = False
+        self._active = 0           # segment number being written
+        self._durable = (0, 0)     # (segment, bytes fsynced) the forwarder may read up to
+        self._cursor = (0, 0)      # (segment, offset) of the first record not yet forwarded
+        self._threads = []
+        self._atexit_registered = False
+        self.counters = {"queued": 0, "written": 0, "forwarded": 0, "batches": 0, "failures": 0,
+                         "dropped_queued": 0, "dropped_segments": 0, "corrupt": 0}
+
+    # ------------------------- setup -------------------------
+    def _claim_slot(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        for i in range(1024):
+            slot = self.root / f"slot-{i}"
+            slot.mkdir(exist_ok=True)
+            fh = open(slot / "LOCK", "a+b")
+            try:
+                _lock(fh)
+            except OSError:
+                fh.close()
+                continue
+            self._lock_fh = fh
+            return slot
+        raise RuntimeError(f"no free event spool slot under {self.root}")
+
+    def _segments(self):
+        return sorted(int(p.stem) for p in self.dir.glob(f"*{SEGMENT_SUFFIX}") if p.stem.isdigit())
+
+    def _segment_path(self, number):
+        return self.dir / f"{number:08d}{SEGMENT_SUFFIX}"
+
+    def _load_cursor(self, segments):
+        try:
+            with open(self.dir / "cursor.json") as f:
+                c = json.load(f)
+            cursor = (int(c["segment"]), int(c["offset"]))
+        except FileNotFoundError:
+            cursor = (segments[0], 0) if segments else (0, 0)
+        except Exception as e:
+            logging.error(f"[Spool] Unreadable cursor in {self.dir}, replaying from the oldest segment: {e}")
+            cursor = (segments[0], 0) if segments else (0, 0)
+        return cursor
+
+    def _save_cursor(self):
+        tmp = self.dir / "cursor.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"segment": self._cursor[0], "offset": self._cursor[1]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.dir / "cursor.json")
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            self.dir = self._claim_slot()
+            segments = self._segments()
+            self._cursor = self._load_cursor(segments)
+            # never append to a segment a previous process may have left half-written
+            self._active = (segments[-1] + 1) if segments else max(1, self._cursor[0])
+            self._fh = open(self._segment_path(self._active), "ab")
+            self._durable = (self._active, 0)
+            self._needs_rewind = False
+            backlog = [s for s in segments if s >= self._cursor[0]]
+            if backlog:
+                logging.info(f"[Spool] Replaying {len(backlog)} segment(s) from {self.dir}")
+            self._stop_event.clear()
+            for target, name in ((self._write_loop, "event-spool-writer"), (self._forward_loop, "event-spool-forwarder")):
+                t = threading.Thread(target=target, daemon=True, name=name)
+                t.start()
+                self._threads.append(t)
+            if not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
+
+    # ------------------------- producer side -------------------------
+    def put(self, kind, event):
+        if not self._threads:
+            self.start()
+        with self._incoming_lock:
+            if len(self._incoming) >= self.max_queued:
+                # the disk can't keep up; shed the oldest rather than stall the caller
+                self._incoming.popleft()
+                self.counters["dropped_queued"] += 1
+                metrics.inc("events_dropped_total", kind=kind)
+            self._incoming.append((kind, time.time(), event))
+            self.counters["queued"] += 1
+
+    # ------------------------- writer -------------------------
+    def _requeue(self, batch):
+        """Put a batch that failed to write back in front of what arrived meanwhile."""
+        with self._incoming_lock:
+            batch.extend(self._incoming)
+            while len(batch) > self.max_queued:
+                kind = batch.popleft()[0]
+                self.counters["dropped_queued"] += 1
+                metrics.inc("events_dropped_total", kind=kind)
+            self._incoming = batch
+
+    def _rewind(self):
+        """Cut the active segment back to its last fsynced record boundary after a failed write."""
+        seg, durable = self._durable
+        try:
+            self._fh.close()
+        except Exception:
+            pass   # buffered bytes that can't be flushed are cut below anyway
+        path = self._segment_path(seg)
+        with open(path, "r+b") as f:
+            f.truncate(durable)
+            f.flush()
+            os.fsync(f.fileno())
+        self._fh = open(path, "ab")
+        self._needs_rewind = False
+
+    def _write_pending(self):
+        if self._needs_rewind:
+            self._rewind()   # raises (and is retried) until the segment can be cut back
+        with self._incoming_lock:
+            batch, self._incoming = self._incoming, collections.deque()
+        if not batch:
+            return
+        lines = []
+        kept = collections.deque()   # the events behind `lines`, requeued if the write fails
+        for item in batch:
+            kind, ts, event = item
+            try:
+                lines.append(json.dumps({"k": kind, "t": ts, "e": event}, default=str).encode() + b"\n")
+            except Exception as e:
+                self.counters["corrupt"] += 1
+                logging.error(f"[Spool] Dropping unserialisable {kind} event: {e}")
+                continue
+            kept.append(item)
+        data = b"".join(lines)
+        try:
+            self._fh.write(data)
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+        except Exception:
+            # e.g. ENOSPC: keep the events and drop any partial write before trying again
+            self._needs_rewind = True
+            self._requeue(kept)
+            raise
+        self._durable = (self._active, self._durable[1] + len(data))
+        self.counters["written"] += len(lines)
+        if self._durable[1] >= self.segment_bytes:
+            self._roll()
+
+    def _roll(self):
+        self._fh.close()
+        self._active += 1
+        self._fh = open(self._segment_path(self._active), "ab")
+        self._durable = (self._active, 0)
+        self._enforce_limit()
+
+    def _enforce_limit(self):
+        segments = self._segments()
+        sizes = {}
+        for s in segments:
+            try:
+                sizes[s] = self._segment_path(s).stat().st_size
+            except OSError:
+                sizes[s] = 0
+        total = sum(sizes.values())
+        for s in segments:
+            if total <= self.max_bytes or s >= self._active:
+                break
+            try:
+                self._segment_path(s).unlink()
+            except OSError:
+                continue
+            total -= sizes[s]
+            self.counters["dropped_segments"] += 1
+            metrics.inc("event_spool_segments_dropped_total")
+            logging.error(f"[Spool] Spool over {self.max_bytes} bytes, dropped segment {s} before it was forwarded")
+
+    def _write_loop(self):
+        while not self._stop_event.is_set():
+            self._wake_writer.wait(self.fsync_interval)
+            self._wake_writer.clear()
+            try:
+                self._write_pending()
+            except Exception as e:
+                logging.error(f"[Spool] Writing to {self.dir} failed: {e}")
+                time.sleep(self.retry)
+        try:
+            self._write_pending()
+            self._fh.close()
+        except Exception:
+            pass
+
+    # ------------------------- forwarder -------------------------
+    def _read(self, limit):
+        """Up to `limit` fsynced records of one kind after the cursor, the position
+        just past them, and whether the batch ended because the kind changed.
+
+        A batch ends where the kind changes, so every successful send moves the
+        cursor and a kind that keeps failing never makes another one resend."""
+        records = []
+        boundary = False
+        seg, off = self._cursor
+        while len(records) < limit and not boundary:
+            active, durable = self._durable
+            if seg > active:
+                break
+            end = durable if seg == active else None
+            try:
+                f = open(self._segment_path(seg), "rb")
+            except FileNotFoundError:
+                if seg < active:
+                    seg, off = seg + 1, 0
+                    continue
+                break
+            with f:
+                f.seek(off)
+                buf, pos = b"", off
+                while len(records) < limit and not boundary:
+                    want = READ_CHUNK if end is None else min(READ_CHUNK, end - pos - len(buf))
+                    chunk = f.read(want) if want > 0 else b""
+                    if not chunk:
+                        break
+                    buf += chunk
+                    while len(records) < limit:
+                        nl = buf.find(b"\n")
+                        if nl < 0:
+                            break
+                        try:
+                            rec = json.loads(buf[:nl])
+                            record = (rec["k"], rec["t"], rec["e"])
+                        except Exception:
+                            record = None
+                        if record is not None and records and record[0] != records[0][0]:
+                            boundary = True
+                            break
+                        buf = buf[nl + 1:]
+                        pos += nl + 1
+                        if record is None:
+                            self.counters["corrupt"] += 1
+                        else:
+                            records.append(record)
+            off = pos
+            if boundary or len(records) >= limit or seg == active:
+                break
+            if buf:
+                self.counters["corrupt"] += 1
+                logging.warning(f"[Spool] Skipping a partial record at the end of segment {seg}")
+            seg, off = seg + 1, 0
+        return records, (seg, off), boundary
+
+    def _forward_once(self):
+        """Forward one due batch; the number of records sent, or None when sending failed."""
+        records, position, boundary = self._read(self.max_batch)
+        # a batch cut short by the next kind can't grow, so it is due right away
+        if records and not boundary and len(records) < self.max_batch and time.time() - records[0][1] < self.max_delay:
+            return 0
+        if records:
+            kind = records[0][0]
+            events = [event for _, _, event in records]
+            t0 = time.perf_counter()
+            try:
+                self.send(kind, events)
+            except Exception as e:
+                self.counters["failures"] += 1
+                metrics.inc("event_batch_failures_total", kind=kind)
+                logging.warning(f"[Spool] Forwarding {len(events)} {kind} events failed, will retry: {e}")
+                return None
+            metrics.observe("event_flush", time.perf_counter() - t0, kind=kind)
+            metrics.inc("events_sent_total", kind=kind, value=len(events))
+        if position != self._cursor:
+            old_seg = self._cursor[0]
+            self._cursor = position
+            self._save_cursor()
+            for s in range(old_seg, position[0]):
+                try:
+                    self._segment_path(s).unlink()
+                except OSError:
+                    pass
+        if records:
+            self.counters["forwarded"] += len(records)
+            self.counters["batches"] += 1
+        return len(records)
+
+    def _forward_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                sent = self._forward_once()
+            except Exception as e:
+                logging.error(f"[Spool] Forwarder error: {e}")
+                sent = None
+            if sent is None:
+                self._stop_event.wait(self.retry)
+            elif sent == 0:
+                # caught up, or the next batch isn't due yet
+                self._stop_event.wait(min(self.max_delay, 0.25))
+
+    def close(self, timeout=5.0):
+        """Stop both threads after writing (not forwarding) what is queued and release the slot;
+        the backlog is replayed by whoever claims it next. A later `put()` starts the spool again."""
+        with self._start_lock:
+            if not self._threads:
+                return
+            self._stop_event.set()
+            self._wake_writer.set()
+            for t in self._threads:
+                t.join(timeout)
+            if any(t.is_alive() for t in self._threads):
+                # a stuck send or write still uses the slot; don't hand it to anyone else
+                logging.error(f"[Spool] Threads did not stop within {timeout}s, keeping {self.dir} locked")
+                return
+            self._threads = []
+            if self._lock_fh is not None:
+                self._lock_fh.close()   # releases the slot lock
+                self._lock_fh = None
+
+    # ------------------------- stats -------------------------
+    def stats(self):
+        backlog = 0
+        seg, off = self._cursor
+        if self.dir is not None:
+            for s in self._segments():
+                if s < seg:
+                    continue
+                try:
+                    size = self._segment_path(s).stat().st_size
+                except OSError:
+                    continue
+                backlog += size - off if s == seg else size
+        return dict(self.counters, dir=str(self.dir) if self.dir else None,
+                    queued_in_memory=len(self._incoming), backlog_bytes=max(0, backlog),
+                    segment=self._active, cursor={"segment": seg, "offset": off})
@@ -0,0 +1,127 @@
+# scripts/face_index.py
+import logging
+import numpy as np
+
+
+def _normalize_rows(x):
+    x = np.asarray(x, dtype=np.float32)
+    if x.ndim == 1:
+        x = x[None, :]
+    n = np.linalg.norm(x, axis=1, keepdims=True)
+    return np.where(n < 1e-10, x, x / np.maximum(n, 1e-10))
+
+
+def _top_k(sims, k):
+    """Return (values, indices) of the k largest entries per row, best first."""
+    k = min(k, sims.shape[1])
+    if k == sims.shape[1]:
+        idx = np.argsort(-sims, axis=1)
+    else:
+        idx = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(sims, idx, axis=1), axis=1)
+        idx = np.take_along_axis(idx, order, axis=1)
+    return np.take_along_axis(sims, idx, axis=1), idx
+
+
+class ExactIndex:
+    """Brute-force cosine search over unit-length vectors."""
+
+    kind = "exact"
+
+    def __init__(self, vectors):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def search(self, queries, k=1):
+        """Return (similarities, ids), both shaped (n_queries, k), best first."""
+        q = _normalize_rows(queries)
+        if len(self) == 0:
+            return np.zeros((q.shape[0], 0), np.float32), np.zeros((q.shape[0], 0), np.int64)
+        return _top_k(q @ self.vectors.T, k)
+
+
+class IVFIndex:
+    """Inverted-file index: spherical k-means partitions the vectors into
+    `n_lists` cells and a query only scans the `n_probe` closest cells.
+
+    Raising `n_probe` trades speed for recall; n_probe == n_lists is exact.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, vectors, n_lists=None, n_probe=8, n_iter=8, seed=0):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        n = self.vectors.shape[0]
+        if n_lists is None:
+            n_lists = int(round(4 * np.sqrt(n)))
+        self.n_lists = max(1, min(int(n_lists), n))
+        self.n_probe = max(1, int(n_probe))
+        self.list_centroids = self._train(n_iter, seed)
+
+        assign = np.argmax(self.vectors @ self.list_centroids.T, axis=1)
+        # ids grouped by cell: cell c owns self.list_ids[self.list_offsets[c]:self.list_offsets[c+1]]
+        self.list_ids = np.argsort(assign, kind="stable").astype(np.int64)
+        counts = np.bincount(assign, minlength=self.n_lists)
+        self.list_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def _train(self, n_iter, seed):
+        rng = np.random.default_rng(seed)
+        x = self.vectors
+        cents = x[rng.choice(x.shape[0], self.n_lists, replace=False)].copy()
+        for _ in range(max(1, n_iter)):
+            assign = np.argmax(x @ cents.T, axis=1)
+            sums = np.zeros_like(cents)
+            np.add.at(sums, assign, x)
+            counts = np.bincount(assign, minlength=self.n_lists)
+            empty = counts == 0
+            if empty.any():
+                # re-seed empty cells with random points so no list stays unused
+                sums[empty] = x[rng.choice(x.shape[0], int(empty.sum()), replace=False)]
+            cents = _normalize_rows(sums)
+        return cents
+
+    def search(self, queries, k=1, n_probe=None):
+        q = _normalize_rows(queries)
+        n_probe = min(self.n_probe if n_probe is None else max(1, int(n_probe)), self.n_lists)
+        out_sims = np.full((q.shape[0], k), -np.inf, dtype=np.float32)
+        out_ids = np.full((q.shape[0], k), -1, dtype=np.int64)
+        if len(self) == 0:
+            return out_sims, out_ids
+
+        _, cells = _top_k(q @ self.list_centroids.T, n_probe)
+        for i in range(q.shape[0]):
+            cand = np.concatenate([
+                self.list_ids[self.list_offsets[c]:self.list_offsets[c + 1]] for c in cells[i]
+            ])
+            if cand.size == 0:
+                continue
+            sims = self.vectors[cand] @ q[i]
+            vals, pos = _top_k(sims[None, :], k)
+            out_sims[i, :vals.shape[1]] = vals[0]
+            out_ids[i, :pos.shape[1]] = cand[pos[0]]
+        return out_sims, out_ids
+
+
+def build_face_index(vectors, backend="auto", ivf_min_size=2000, **params):
+    """Build the index used for identity lookup.
+
+    backend: "exact", "ivf", or "auto" (IVF once there are at least
+    `ivf_min_size` vectors, exact below that). Returns None for no vectors.
+    """
+    if vectors is None or len(vectors) == 0:
+        return None
+    if backend == "auto":
+        backend = "ivf" if len(vectors) >= ivf_min_size else "exact"
+    if backend == "ivf":
+        try:
+            return IVFIndex(vectors, **params)
+        except Exception as e:
+            logging.warning(f"[FaceIndex] IVF build failed, falling back to exact search: {e}")
+    elif backend != "exact":
+        logging.warning(f"[FaceIndex] Unknown backend {backend!r}, using exact search")
+    return ExactIndex(vectors)
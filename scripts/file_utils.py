@@ -0,0 +1,11 @@
+# scripts/file_utils.py
+import os
+
+
+def file_signature(path):
+    """(mtime_ns, size) of a file, or None when it doesn't exist; compares unequal after any rewrite."""
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
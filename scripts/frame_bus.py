@@ -0,0 +1,204 @@
+# scripts/frame_bus.py
+"""Shared-memory frame ring for one camera stream.
+
+A FrameRing is a fixed number of fixed-size uint8 frame slots in one
+multiprocessing.shared_memory block. The writer (capture) copies each frame
+in once and hands out a frame number; any thread or process that attached
+by name can read that frame back while its slot has not been reused.
+
+Block layout:
+
+    header   int64[8]          magic, slots, height, width, channels, head
+    seq      int64[slots]      per-slot seqlock: odd while a write is in progress
+    number   int64[slots]      frame number held by the slot (0 = empty)
+    stamp    float64[slots]    capture time
+    data     uint8[slots, h, w, c]
+
+Frame numbers start at 1 and never repeat; slot = number % slots. Readers
+check the slot's sequence before and after copying and drop the frame if
+the writer touched it in between, so there are no locks and no torn frames.
+There must be a single writer per ring.
+"""
+import os
+import time
+import uuid
+from multiprocessing import shared_memory
+
+import numpy as np
+
+_MAGIC = 0x51544446524D4531  # "QTDFRME1"
+_HEADER = 8
+_H_MAGIC, _H_SLOTS, _H_HEIGHT, _H_WIDTH, _H_CHANNELS, _H_HEAD = range(6)
+
+
+# Ring names are derived from a per-process token, so whoever started the
+# process (the camera supervisor sets FRAME_RING_TOKEN per worker) can
+# unlink the rings of a process that died without cleaning up.
+_PROCESS_TOKEN = uuid.uuid4().hex[:8]
+
+
+def ring_name(camera_id, kind="raw", token=None):
+    token = token or os.getenv("FRAME_RING_TOKEN") or _PROCESS_TOKEN
+    return f"qtd-{kind}-{camera_id}-{token}"
+
+
+def unlink_ring(name):
+    """Remove a ring's shared memory left behind by a dead writer; True if it existed."""
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+class FrameRing:
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.name = shm.name
+        self.owner = owner
+        buf = shm.buf
+        self._header = np.ndarray((_HEADER,), dtype=np.int64, buffer=buf)
+        if int(self._header[_H_MAGIC]) != _MAGIC:
+            raise ValueError(f"{shm.name} is not a frame ring")
+        self.slots = int(self._header[_H_SLOTS])
+        self.shape = (int(self._header[_H_HEIGHT]), int(self._header[_H_WIDTH]), int(self._header[_H_CHANNELS]))
+        off = _HEADER * 8
+        self._seq = np.ndarray((self.slots,), dtype=np.int64, buffer=buf, offset=off)
+        off += self.slots * 8
+        self._number = np.ndarray((self.slots,), dtype=np.int64, buffer=buf, offset=off)
+        off += self.slots * 8
+        self._stamp = np.ndarray((self.slots,), dtype=np.float64, buffer=buf, offset=off)
+        off += self.slots * 8
+        self._data = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=buf, offset=off)
+
+    @staticmethod
+    def _size(slots, shape):
+        return _HEADER * 8 + slots * 24 + slots * int(np.prod(shape))
+
+    @classmethod
+    def create(cls, name, slots, shape):
+        """Allocate a new ring of `slots` frames of `shape` (h, w, c) uint8."""
+        shape = tuple(int(x) for x in shape)
+        if len(shape) == 2:
+            shape = shape + (1,)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls._size(slots, shape))
+        header = np.ndarray((_HEADER,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_H_SLOTS], header[_H_HEIGHT], header[_H_WIDTH], header[_H_CHANNELS] = slots, *shape
+        header[_H_MAGIC] = _MAGIC
+        ring = cls(shm, owner=True)
+        ring._seq[:] = 0
+        ring._number[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name):
+        """Open an existing ring created by another thread or process."""
+        try:
+            # only the creator may unlink; 3.13+ can opt out of resource tracking
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # older Pythons: processes started from the creator share its
+            # resource tracker, which only cleans up once all of them exit
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, owner=False)
+
+    # ---------------- writer ----------------
+    def write(self, frame, stamp=None):
+        """Copy `frame` into the next slot and return its frame number."""
+        number = int(self._header[_H_HEAD]) + 1
+        slot = number % self.slots
+        self._seq[slot] += 1            # odd: slot is being written
+        self._number[slot] = number
+        self._stamp[slot] = time.time() if stamp is None else stamp
+        self._data[slot] = frame.reshape(self.shape)
+        self._seq[slot] += 1            # even: slot is stable
+        self._header[_H_HEAD] = number
+        return number
+
+    # ---------------- readers ----------------
+    @property
+    def head(self):
+        """Number of the newest complete frame (0 before the first write)."""
+        return int(self._header[_H_HEAD])
+
+    def valid(self, number):
+        slot = number % self.slots
+        return number > 0 and int(self._number[slot]) == number and not int(self._seq[slot]) & 1
+
+    def read(self, number, out=None):
+        """Copy frame `number` out of the ring; None if it was already overwritten."""
+        if number <= 0:
+            return None
+        slot = number % self.slots
+        for _ in range(3):
+            before = int(self._seq[slot])
+            if before & 1:
+                time.sleep(0)
+                continue
+            if int(self._number[slot]) != number:
+                return None
+            if out is None:
+                out = self._data[slot].copy()
+            else:
+                np.copyto(out, self._data[slot])
+            if int(self._seq[slot]) == before:
+                return out.reshape(self.shape[:2]) if self.shape[2] == 1 else out
+        return None
+
+    def view(self, number):
+        """Zero-copy read-only view of frame `number`. Only safe while valid(number)
+        is still true afterwards; use read() unless the caller re-checks."""
+        if not self.valid(number):
+            return None
+        v = self._data[number % self.slots]
+        v = v.view()
+        v.flags.writeable = False
+        return v
+
+    def stamp(self, number):
+        return float(self._stamp[number % self.slots]) if self.valid(number) else None
+
+    def latest(self):
+        """(number, copy) of the newest frame, or (0, None)."""
+        number = self.head
+        return number, self.read(number)
+
+    def recent(self, count):
+        """Copies of up to `count` newest frames, oldest first."""
+        head = self.head
+        frames = []
+        for number in range(max(1, head - min(count, self.slots - 1) + 1), head + 1):
+            f = self.read(number)
+            if f is not None:
+                frames.append(f)
+        return frames
+
+    def wait_next(self, after, timeout=None, poll=0.001):
+        """Block until a frame newer than `after` exists; returns the newest number or 0 on timeout."""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            head = self.head
+            if head > after:
+                return head
+            if deadline is not None and time.time() >= deadline:
+                return 0
+            time.sleep(poll)
+
+    def close(self):
+        # drop numpy views first, otherwise SharedMemory.close() refuses to unmap
+        self._header = self._seq = self._number = self._stamp = self._data = None
+        try:
+            self.shm.close()
+        except Exception:
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
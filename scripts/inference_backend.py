@@ -0,0 +1,394 @@
+# scripts/inference_backend.py
+"""Model loading behind one switch: the original Ultralytics/Keras stack
+("torch") or ONNX Runtime ("onnx").
+
+The ONNX detectors return objects shaped like Ultralytics results
+(`res.boxes` items with `.cls`, `.conf`, `.xyxy`, plus `res.names`), so the
+monitoring code does not care which backend is active. With "onnx",
+neither PyTorch nor TensorFlow is imported.
+
+    python scripts/inference_backend.py export            # .pt/.keras -> .onnx
+    python scripts/inference_backend.py parity --images face_data
+
+MODEL_PRECISION=int8 loads the `*.int8.onnx` files written by
+quantize_models.py (this implies ONNX Runtime whatever the backend).
+"""
+import ast
+import json
+import logging
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+MODEL_DIR = Path(__file__).resolve().parents[1] / "model"
+FACENET_ONNX_PATH = MODEL_DIR / "facenet.onnx"
+DETECTOR_WEIGHTS = [str(MODEL_DIR / n) for n in ("yolov11n-face.pt", "yolo11n.pt", "inappropriate_behaviour.pt")]
+
+# Thread counts for ONNX Runtime sessions (0 = let ONNX Runtime decide)
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+ONNX_INTER_OP_THREADS = int(os.getenv("ONNX_INTER_OP_THREADS", "0"))
+ONNX_PROVIDERS = os.getenv("ONNX_PROVIDERS", "CPUExecutionProvider").split(",")
+
+# "fp32" or "int8"; int8 models come from scripts/quantize_models.py
+MODEL_PRECISION = os.getenv("MODEL_PRECISION", "fp32")
+
+# Ultralytics predict() defaults, kept identical for parity
+DEFAULT_CONF = 0.25
+DEFAULT_IOU = 0.7
+MAX_DET = 300
+
+
+def onnx_path_for(pt_path):
+    return str(Path(pt_path).with_suffix(".onnx"))
+
+
+def int8_path_for(onnx_path):
+    return str(Path(onnx_path).with_suffix(".int8.onnx"))
+
+
+def _onnx_candidates(onnx_path, precision):
+    if precision == "int8":
+        return [int8_path_for(onnx_path), str(onnx_path)]
+    return [str(onnx_path)]
+
+
+def _session(onnx_path, intra_op_threads=None, inter_op_threads=None):
+    import onnxruntime as ort
+    opts = ort.SessionOptions()
+    intra = ONNX_INTRA_OP_THREADS if intra_op_threads is None else intra_op_threads
+    inter = ONNX_INTER_OP_THREADS if inter_op_threads is None else inter_op_threads
+    if intra:
+        opts.intra_op_num_threads = intra
+    if inter:
+        opts.inter_op_num_threads = inter
+    opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    available = ort.get_available_providers()
+    providers = [p for p in ONNX_PROVIDERS if p in available] or ["CPUExecutionProvider"]
+    return ort.InferenceSession(str(onnx_path), sess_options=opts, providers=providers)
+
+
+# ------------------------- Ultralytics-shaped results -------------------------
+class DetectionBox:
+    __slots__ = ("cls", "conf", "xyxy")
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(1, 4)
+        self.conf = np.float32(conf)
+        self.cls = np.float32(cls)
+
+
+class DetectionResult:
+    def __init__(self, boxes, names, orig_shape):
+        self.boxes = boxes
+        self.names = names
+        self.orig_shape = orig_shape
+
+
+def letterbox(image, size, color=(114, 114, 114)):
+    """Resize keeping aspect ratio and pad to size x size.
+    Returns (padded image, scale, (pad_x, pad_y))."""
+    h, w = image.shape[:2]
+    r = min(size / h, size / w)
+    nw, nh = int(round(w * r)), int(round(h * r))
+    if (nw, nh) != (w, h):
+        image = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    px, py = (size - nw) / 2, (size - nh) / 2
+    top, bottom = int(round(py - 0.1)), int(round(py + 0.1))
+    left, right = int(round(px - 0.1)), int(round(px + 0.1))
+    out = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return out, r, (left, top)
+
+
+def nms(boxes, scores, iou_threshold):
+    """Plain NumPy NMS over xyxy boxes; returns kept indices by descending score."""
+    order = np.argsort(-scores)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        if order.size == 1:
+            break
+        rest = order[1:]
+        xx1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+class OnnxYoloDetector:
+    """Runs an Ultralytics YOLO detection model exported to ONNX."""
+
+    def __init__(self, onnx_path, imgsz=640, conf=DEFAULT_CONF, iou=DEFAULT_IOU,
+                 intra_op_threads=None, inter_op_threads=None):
+        self.onnx_path = str(onnx_path)
+        self.session = _session(onnx_path, intra_op_threads, inter_op_threads)
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        shape = inp.shape
+        self.imgsz = shape[2] if isinstance(shape[2], int) else imgsz
+        self.dynamic_batch = not isinstance(shape[0], int)
+        self.conf = conf
+        self.iou = iou
+        meta = self.session.get_modelmeta().custom_metadata_map
+        try:
+            self.names = ast.literal_eval(meta.get("names", "{}"))
+        except Exception:
+            self.names = {}
+
+    def _prepare(self, image):
+        padded, r, pad = letterbox(image, self.imgsz)
+        x = cv2.cvtColor(padded, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)
+        return np.ascontiguousarray(x, dtype=np.float32) / 255.0, r, pad
+
+    def _postprocess(self, pred, r, pad, orig_shape):
+        # pred: (4 + nc, N) with cx, cy, w, h in letterboxed pixels
+        pred = pred.T
+        scores = pred[:, 4:]
+        cls = np.argmax(scores, axis=1)
+        conf = scores[np.arange(scores.shape[0]), cls]
+        m = conf >= self.conf
+        if not m.any():
+            return DetectionResult([], self.names, orig_shape)
+        xywh, conf, cls = pred[m, :4], conf[m], cls[m]
+        xyxy = np.empty_like(xywh)
+        xyxy[:, 0] = xywh[:, 0] - xywh[:, 2] / 2
+        xyxy[:, 1] = xywh[:, 1] - xywh[:, 3] / 2
+        xyxy[:, 2] = xywh[:, 0] + xywh[:, 2] / 2
+        xyxy[:, 3] = xywh[:, 1] + xywh[:, 3] / 2
+        # class-aware NMS: shift each class into its own coordinate range
+        keep = nms(xyxy + cls[:, None] * 7680.0, conf, self.iou)[:MAX_DET]
+        xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+        xyxy[:, [0, 2]] = (xyxy[:, [0, 2]] - pad[0]) / r
+        xyxy[:, [1, 3]] = (xyxy[:, [1, 3]] - pad[1]) / r
+        h, w = orig_shape[:2]
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h)
+        boxes = [DetectionBox(b, c, k) for b, c, k in zip(xyxy, conf, cls)]
+        return DetectionResult(boxes, self.names, orig_shape)
+
+    def __call__(self, images, **_):
+        if isinstance(images, np.ndarray):
+            images = [images]
+        prepared = [self._prepare(img) for img in images]
+        if self.dynamic_batch and len(prepared) > 1:
+            outs = self.session.run(None, {self.input_name: np.stack([p[0] for p in prepared])})[0]
+        else:
+            outs = [self.session.run(None, {self.input_name: p[0][None]})[0][0] for p in prepared]
+        return [self._postprocess(o, r, pad, img.shape) for o, (_, r, pad), img in zip(outs, prepared, images)]
+
+
+class OnnxFaceNet:
+    """Drop-in for keras_facenet.FaceNet().embeddings() on ONNX Runtime."""
+
+    def __init__(self, onnx_path=FACENET_ONNX_PATH, intra_op_threads=None, inter_op_threads=None):
+        self.onnx_path = str(onnx_path)
+        self.session = _session(onnx_path, intra_op_threads, inter_op_threads)
+        self.input_name = self.session.get_inputs()[0].name
+        # the quantized model shares the FP32 model's sidecar
+        meta_path = Path(str(onnx_path).replace(".int8.onnx", ".onnx") + ".json")
+        meta = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        self.preprocess = meta.get("preprocess", "none")
+
+    def _prepare(self, images):
+        x = np.float32(images)
+        if self.preprocess == "standardize":
+            mean = x.mean(axis=(1, 2, 3), keepdims=True)
+            std = np.maximum(x.std(axis=(1, 2, 3), keepdims=True), 1.0 / np.sqrt(x[0].size))
+            x = (x - mean) / std
+        return x
+
+    def embeddings(self, images):
+        if len(images) == 0:
+            return np.zeros((0, 512), dtype=np.float32)
+        return self.session.run(None, {self.input_name: self._prepare(images)})[0]
+
+
+# ------------------------- loaders -------------------------
+_torch_patched = False
+
+def _torch_device():
+    global _torch_patched
+    import torch
+    import torchvision.ops as tv_ops
+    if not _torch_patched:
+        # Force torchvision.ops.nms to run on CPU (keeps compatibility)
+        _orig_nms = tv_ops.nms
+
+        def nms_cpu_fallback(boxes, scores, iou_threshold):
+            return _orig_nms(boxes.cpu(), scores.cpu(), iou_threshold)
+
+        tv_ops.nms = nms_cpu_fallback
+        _torch_patched = True
+    return torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+
+def load_detector(pt_path, backend="torch", precision=None):
+    """Load a YOLO detector. With backend="onnx" the sibling .onnx file is used
+    when it exists; otherwise this falls back to Ultralytics with a warning.
+    precision="int8" prefers the sibling .int8.onnx file."""
+    precision = precision or MODEL_PRECISION
+    if backend == "onnx" or precision == "int8":
+        for path in _onnx_candidates(onnx_path_for(pt_path), precision):
+            if os.path.exists(path):
+                return OnnxYoloDetector(path)
+            logging.warning(f"[Backend] {path} not found (run inference_backend.py export / quantize_models.py)")
+        logging.warning(f"[Backend] Using PyTorch for {Path(pt_path).name}")
+    from ultralytics import YOLO
+    return YOLO(pt_path).to(_torch_device())
+
+
+def load_embedder(backend="torch", onnx_path=FACENET_ONNX_PATH, precision=None):
+    precision = precision or MODEL_PRECISION
+    if backend == "onnx" or precision == "int8":
+        for path in _onnx_candidates(onnx_path, precision):
+            if os.path.exists(path):
+                return OnnxFaceNet(path)
+            logging.warning(f"[Backend] {path} not found (run inference_backend.py export / quantize_models.py)")
+        logging.warning("[Backend] Using Keras FaceNet")
+    from keras_facenet import FaceNet
+    return FaceNet()
+
+
+# ------------------------- export & parity -------------------------
+def export_detector(pt_path, imgsz=640):
+    from ultralytics import YOLO
+    out = YOLO(pt_path).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    logging.info(f"[Backend] Exported {pt_path} -> {out}")
+    return out
+
+
+def export_facenet(onnx_path=FACENET_ONNX_PATH):
+    import tensorflow as tf
+    import tf2onnx
+    from keras_facenet import FaceNet
+
+    facenet = FaceNet()
+    spec = (tf.TensorSpec((None, 160, 160, 3), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(facenet.model, input_signature=spec, opset=13, output_path=str(onnx_path))
+
+    # Record whether FaceNet.embeddings() standardizes before the graph so the ONNX runner matches it
+    probe = np.random.default_rng(0).integers(0, 256, (2, 160, 160, 3)).astype(np.uint8)
+    ref = np.asarray(facenet.embeddings(probe))
+    raw = np.asarray(facenet.model.predict(np.float32(probe), verbose=0))
+    preprocess = "none" if np.allclose(ref, raw, atol=1e-4) else "standardize"
+    Path(str(onnx_path) + ".json").write_text(json.dumps({"preprocess": preprocess}))
+    logging.info(f"[Backend] Exported FaceNet -> {onnx_path} (preprocess={preprocess})")
+    return str(onnx_path)
+
+
+def _match_boxes(ref, test, min_iou=0.9):
+    """Greedy IoU matching; returns (matched pairs, unmatched count)."""
+    pairs, used = [], set()
+    for a in ref:
+        best, best_iou = None, 0.0
+        for j, b in enumerate(test):
+            if j in used:
+                continue
+            ax, bx = a.xyxy[0], b.xyxy[0]
+            iw = max(0.0, min(ax[2], bx[2]) - max(ax[0], bx[0]))
+            ih = max(0.0, min(ax[3], bx[3]) - max(ax[1], bx[1]))
+            inter = iw * ih
+            union = (ax[2] - ax[0]) * (ax[3] - ax[1]) + (bx[2] - bx[0]) * (bx[3] - bx[1]) - inter
+            iou = inter / union if union > 0 else 0.0
+            if iou > best_iou:
+                best, best_iou = j, iou
+        if best is not None and best_iou >= min_iou and int(a.cls) == int(test[best].cls):
+            used.add(best)
+            pairs.append((a, test[best], best_iou))
+    return pairs, (len(ref) - len(pairs)) + (len(test) - len(used))
+
+
+def _sample_images(paths, limit):
+    exts = ('.jpg', '.jpeg', '.png')
+    vids = ('.mp4', '.avi', '.mkv')
+    out = []
+    for p in map(Path, paths):
+        files = sorted(p.rglob("*")) if p.is_dir() else [p]
+        for f in files:
+            if f.suffix.lower() in exts:
+                img = cv2.imread(str(f))
+                if img is not None:
+                    out.append(img)
+            elif f.suffix.lower() in vids:
+                cap = cv2.VideoCapture(str(f))
+                ok, img = cap.read()
+                cap.release()
+                if ok:
+                    out.append(img)
+            if len(out) >= limit:
+                return out
+    return out
+
+
+def parity(image_paths, limit=20, conf_tol=0.02, cos_tol=0.999):
+    """Compare torch and ONNX outputs on sample images; returns True when they agree."""
+    images = _sample_images(image_paths, limit)
+    if not images:
+        raise SystemExit("no sample images found")
+    ok = True
+    for pt in DETECTOR_WEIGHTS:
+        ref_model, onnx_model = load_detector(pt, "torch"), load_detector(pt, "onnx")
+        if not isinstance(onnx_model, OnnxYoloDetector):
+            print(f"[parity] {Path(pt).name}: no ONNX export, skipped")
+            continue
+        unmatched, worst_conf = 0, 0.0
+        for img in images:
+            ref, test = ref_model(img, verbose=False)[0], onnx_model(img)[0]
+            ref_boxes = [b for b in ref.boxes if float(b.conf) >= 0.5]
+            test_boxes = [b for b in test.boxes if float(b.conf) >= 0.5]
+            pairs, miss = _match_boxes(ref_boxes, test_boxes)
+            unmatched += miss
+            for a, b, _ in pairs:
+                worst_conf = max(worst_conf, abs(float(a.conf) - float(b.conf)))
+        good = unmatched == 0 and worst_conf <= conf_tol
+        ok &= good
+        print(f"[parity] {Path(pt).name}: unmatched boxes={unmatched} max |dconf|={worst_conf:.4f} "
+              f"-> {'OK' if good else 'FAIL'}")
+
+    if os.path.exists(FACENET_ONNX_PATH):
+        faces = [cv2.resize(cv2.cvtColor(img, cv2.COLOR_BGR2RGB), (160, 160)) for img in images]
+        ref = np.asarray(load_embedder("torch").embeddings(faces))
+        test = np.asarray(load_embedder("onnx").embeddings(faces))
+        ref /= np.linalg.norm(ref, axis=1, keepdims=True)
+        test /= np.linalg.norm(test, axis=1, keepdims=True)
+        worst = float(np.min(np.sum(ref * test, axis=1)))
+        good = worst >= cos_tol
+        ok &= good
+        print(f"[parity] facenet: min cosine={worst:.5f} -> {'OK' if good else 'FAIL'}")
+    return ok
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    ROOT = Path(__file__).resolve().parents[1]
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Export models to ONNX and check backend parity.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    exp = sub.add_parser("export", help="export YOLO weights and FaceNet to ONNX")
+    exp.add_argument("--imgsz", type=int, default=640)
+    exp.add_argument("--skip-facenet", action="store_true")
+    par = sub.add_parser("parity", help="compare torch and ONNX outputs on sample images")
+    par.add_argument("--images", nargs="+", default=[str(ROOT / "face_data"), str(ROOT / "Anomalies_video")])
+    par.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.cmd == "export":
+        for pt in DETECTOR_WEIGHTS:
+            export_detector(pt, imgsz=args.imgsz)
+        if not args.skip_facenet:
+            export_facenet()
+    else:
+        sys.exit(0 if parity(args.images, limit=args.limit) else 1)
@@ -0,0 +1,138 @@
+# scripts/inference_scheduler.py
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class InferenceScheduler:
+    """Collects single-image requests from all camera loops and runs each
+    shared model once per tick on a batch.
+
+    `models` maps a name ("person", "face", "object", ...) to a callable that
+    accepts a list of images and returns one result per image, which is how
+    Ultralytics YOLO models behave. Each model gets its own worker thread so a
+    slow behaviour batch never holds up face detection.
+    """
+
+    def __init__(self, models, max_batch_size=8, max_wait=0.01, result_timeout=30.0):
+        self.models = dict(models)
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait))
+        self.result_timeout = result_timeout
+
+        self._queues = {name: queue.Queue() for name in self.models}
+        self._threads = {}
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {name: {"batches": 0, "images": 0, "max_batch": 0} for name in self.models}
+
+    # ------------------------- lifecycle -------------------------
+    def start(self):
+        with self._lock:
+            self._stop_event.clear()
+            for name in self.models:
+                t = self._threads.get(name)
+                if t and t.is_alive():
+                    continue
+                t = threading.Thread(target=self._worker, args=(name,), daemon=True,
+                                     name=f"infer-{name}")
+                self._threads[name] = t
+                t.start()
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        for t in list(self._threads.values()):
+            if t.is_alive():
+                t.join(timeout)
+        self._threads.clear()
+
+    @property
+    def running(self):
+        return any(t.is_alive() for t in self._threads.values())
+
+    # ------------------------- submission -------------------------
+    def submit(self, name, image):
+        """Queue one image for `name` and return a Future for its result."""
+        if name not in self._queues:
+            raise KeyError(f"Unknown model {name}")
+        if not self.running:
+            self.start()
+        fut = Future()
+        self._queues[name].put((image, fut))
+        return fut
+
+    def infer(self, name, image):
+        return self.submit(name, image).result(timeout=self.result_timeout)
+
+    def infer_many(self, name, images):
+        futs = [self.submit(name, img) for img in images]
+        return [f.result(timeout=self.result_timeout) for f in futs]
+
+    def stats(self):
+        with self._lock:
+            out = {}
+            for name, s in self._stats.items():
+                avg = s["images"] / s["batches"] if s["batches"] else 0.0
+                out[name] = dict(s, avg_batch=round(avg, 2), queued=self._queues[name].qsize())
+            return out
+
+    # ------------------------- worker -------------------------
+    def _collect(self, q):
+        try:
+            first = q.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # take whatever is already waiting, but don't wait for more
+                    batch.append(q.get_nowait())
+                else:
+                    batch.append(q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self, name):
+        q = self._queues[name]
+        model = self.models[name]
+        while not self._stop_event.is_set():
+            batch = self._collect(q)
+            if not batch:
+                continue
+            batch = [(img, fut) for img, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            images = [img for img, _ in batch]
+            try:
+                results = list(model(images))
+                if len(results) != len(images):
+                    raise RuntimeError(f"{name} returned {len(results)} results for {len(images)} images")
+            except Exception as e:
+                logging.error(f"[Scheduler] {name} batch of {len(images)} failed: {e}")
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+
+            for (_, fut), res in zip(batch, results):
+                fut.set_result(res)
+
+            with self._lock:
+                s = self._stats[name]
+                s["batches"] += 1
+                s["images"] += len(images)
+                s["max_batch"] = max(s["max_batch"], len(images))
+
+        # fail anything left behind so callers don't hang on shutdown
+        while True:
+            try:
+                _, fut = q.get_nowait()
+            except queue.Empty:
+                break
+            if fut.set_running_or_notify_cancel():
+                fut.set_exception(RuntimeError("inference scheduler stopped"))
@@ -0,0 +1,134 @@
+# scripts/model_registry.py
+import logging
+import threading
+import time
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+MODEL_RETRY_INTERVAL = 30.0   # seconds before a failed load is attempted again
+
+
+class _Entry:
+    __slots__ = ("name", "loader", "warm", "state", "value", "error", "load_seconds", "retry_at", "lock")
+
+    def __init__(self, name, loader, warm):
+        self.name = name
+        self.loader = loader
+        self.warm = warm
+        self.state = PENDING
+        self.value = None
+        self.error = None
+        self.load_seconds = None
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+
+
+class LazyModel:
+    """Stands in for a registered model until it is needed.
+
+    Calling it or touching any attribute loads the real object through the
+    registry (once, shared by every thread) and forwards to it, so code
+    written against `face_model(...)` or `embedder.embeddings(...)` keeps
+    working unchanged.
+    """
+
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry, name):
+        object.__setattr__(self, "_registry", registry)
+        object.__setattr__(self, "_name", name)
+
+    def __call__(self, *args, **kwargs):
+        return self._registry.get(self._name)(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __repr__(self):
+        return f"<LazyModel {self._name} ({self._registry.state(self._name)})>"
+
+
+class ModelRegistry:
+    """Named, lazily-loaded heavy objects (models, embeddings, ...).
+
+    `register()` only records a loader. The object is built on the first
+    `get()` or by `warm_up()` in a background thread; concurrent callers
+    wait for the same load. A failed load is reported by `status()`; until
+    `retry_interval` seconds have passed, `get()` raises straight away
+    instead of loading (and logging) again on every frame.
+    """
+
+    def __init__(self, retry_interval=MODEL_RETRY_INTERVAL):
+        self.retry_interval = retry_interval
+        self._entries = {}
+        self._warm_thread = None
+
+    def register(self, name, loader, warm=True):
+        self._entries[name] = _Entry(name, loader, warm)
+        return LazyModel(self, name)
+
+    def proxy(self, name):
+        return LazyModel(self, name)
+
+    def get(self, name):
+        entry = self._entries[name]
+        if entry.state == READY:
+            return entry.value
+        if entry.state == FAILED and time.time() < entry.retry_at:
+            raise RuntimeError(f"model {name} unavailable: {entry.error}")
+        with entry.lock:
+            if entry.state == READY:
+                return entry.value
+            if entry.state == FAILED and time.time() < entry.retry_at:
+                raise RuntimeError(f"model {name} unavailable: {entry.error}")
+            entry.state = LOADING
+            t0 = time.perf_counter()
+            try:
+                value = entry.loader()
+            except Exception as e:
+                entry.state, entry.error = FAILED, str(e)
+                entry.retry_at = time.time() + self.retry_interval
+                logging.error(f"[Models] Loading {name} failed (next attempt in {self.retry_interval:.0f}s): {e}")
+                raise
+            entry.value, entry.error = value, None
+            entry.load_seconds = time.perf_counter() - t0
+            entry.state = READY
+            logging.info(f"[Models] {name} ready in {entry.load_seconds:.2f}s")
+            return value
+
+    def state(self, name):
+        return self._entries[name].state
+
+    def is_loaded(self, name):
+        return self._entries[name].state == READY
+
+    def warm_up(self, names=None, background=True):
+        """Load every warm entry (or `names`). Returns the thread when run in the background."""
+        names = list(names) if names is not None else [n for n, e in self._entries.items() if e.warm]
+
+        def _run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    pass  # already logged; status() shows the failure
+
+        if not background:
+            _run()
+            return None
+        if self._warm_thread and self._warm_thread.is_alive():
+            return self._warm_thread
+        self._warm_thread = threading.Thread(target=_run, daemon=True, name="model-warmup")
+        self._warm_thread.start()
+        return self._warm_thread
+
+    def ready(self, names=None):
+        entries = [self._entries[n] for n in names] if names is not None else \
+            [e for e in self._entries.values() if e.warm]
+        return all(e.state == READY for e in entries)
+
+    def status(self):
+        return {
+            name: {"state": e.state, "load_seconds": e.load_seconds, "error": e.error}
+            for name, e in self._entries.items()
+        }
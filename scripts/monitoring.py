@@ -11,45 +11,55 @@ import csv
 import argparse
 import warnings
 import os
+import sys
 from pathlib import Path
-import torch
-import torchvision.ops as tv_ops
-from scipy.spatial.distance import cdist
 import collections
 import json
 import uuid
 
-import mediapipe as mp
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
-from mediapipe.tasks.python.core import base_options
-
-from ultralytics import YOLO
-from keras_facenet import FaceNet
-from deep_sort_realtime.deepsort_tracker import DeepSort
 import mysql.connector
 
+# Make the project root importable so sibling helpers resolve as scripts.*
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.inference_scheduler import InferenceScheduler
+from scripts.face_index import build_face_index
+from scripts.embedding_store import STORE_DIR as EMBEDDING_STORE_DIR, open_store
+from scripts.embedding_generation import EmbeddingGeneration, GenerationWatcher
+from scripts.inference_backend import load_detector, load_embedder
+from scripts.model_registry import ModelRegistry
+from scripts.frame_bus import FrameRing, ring_name
+from scripts.motion_gate import MotionGate
+from scripts.preprocess import DetectorInput
+from scripts.recognition_cache import RecognitionCache
+from scripts.pipeline_metrics import metrics
+from scripts.directory_cache import AuthorizationSnapshot, WorkerDirectory
+from scripts.db_pool import ConnectionPool
+from scripts.event_sink import BatchingEventSink
+from scripts.event_spool import EventSpool
 
 #def init_face_model():
 #    import mediapipe as mp
 #    #return mp.solutions.face_mesh
 #    return mp.tasks.face_mesh
-options = vision.FaceLandmarkerOptions(
-    base_options=base_options.BaseOptions(
-        model_asset_path=r"C:\Users\dus_m\OneDrive\Desktop\Quantum_threat_detection\model\face_landmarker.task"
-    ),
-    running_mode=vision.RunningMode.IMAGE,
-    num_faces=1
-)
-
+FACE_LANDMARKER_PATH = r"C:\Users\dus_m\OneDrive\Desktop\Quantum_threat_detection\model\face_landmarker.task"
 
-# ----------------- Patch: Force torchvision.ops.nms to run on CPU (keeps compatibility) -----------------
-_orig_nms = tv_ops.nms
+def create_face_landmarker():
+    """Returns (mediapipe module, FaceLandmarker); mediapipe is only imported here."""
+    import mediapipe as mp
+    from mediapipe.tasks.python import vision
+    from mediapipe.tasks.python.core import base_options
+    options = vision.FaceLandmarkerOptions(
+        base_options=base_options.BaseOptions(model_asset_path=FACE_LANDMARKER_PATH),
+        running_mode=vision.RunningMode.IMAGE,
+        num_faces=1
+    )
+    return mp, vision.FaceLandmarker.create_from_options(options)
 
-def nms_cpu_fallback(boxes, scores, iou_threshold):
-    return _orig_nms(boxes.cpu(), scores.cpu(), iou_threshold)
 
-tv_ops.nms = nms_cpu_fallback
+# (the torchvision CPU NMS patch now lives in inference_backend and only applies to the torch backend)
 
 # ----------------- Configuration -----------------
 FRAME_DOWNSCALE = 1
@@ -58,9 +68,16 @@ SIMILARITY_THRESHOLD = 0.55
 FALLBACK_VERIFY = True
 FALLBACK_MARGIN = 0.02
 
-AUTH_CACHE_TTL = 10
-TRACK_MEMORY_TTL = 10
-IDENTITY_PERSISTENCE_TTL = 5
+# Identity index: "exact", "ivf" (approximate), or "auto" (ivf once enrolment is large)
+FACE_INDEX_BACKEND = "auto"
+FACE_INDEX_IVF_MIN_SIZE = 2000     # identities before "auto" switches to ivf
+FACE_INDEX_NPROBE = 8              # ivf cells scanned per query; higher = better recall, slower
+
+AUTH_CACHE_TTL = 60                # seconds between full reloads of the authorization snapshot
+TRACK_MEMORY_TTL = 10              # seconds a track's identity is kept after the track was last seen
+IDENTITY_PERSISTENCE_TTL = 5       # shortest re-verification interval (unknown / weak matches)
+RECOGNITION_RECHECK_MAX = 60       # re-verification interval for confident matches
+RECOGNITION_HIGH_SIMILARITY = 0.8  # similarity that earns the longest interval
 TARGET_FPS = 10
 FRAME_INTERVAL = 1 / TARGET_FPS
 
@@ -71,6 +88,81 @@ EVENT_CLIP_SECONDS = PRE_EVENT_SECONDS + POST_EVENT_SECONDS
 
 ANOMALY_BUFFER_SIZE = int(TARGET_FPS * EVENT_CLIP_SECONDS)
 
+# --- Detector input ---
+# Each frame is letterboxed once to this size and shared by the person, face and
+# (frame-mode) object detectors; boxes are mapped back to full resolution and
+# face/object crops are still cut from the full-resolution frame. 0 = full frames.
+DETECTOR_INPUT_SIZE = 640
+
+# --- Motion gating ---
+# Idle cameras skip the detectors: frames only go through person/behaviour/face
+# models while there is motion or a live track (plus MOTION_HOLD_SECONDS after),
+# and otherwise once every IDLE_INFER_INTERVAL seconds.
+MOTION_GATING = True
+MOTION_THRESHOLD = 0.01            # share of changed pixels that counts as motion
+MOTION_HOLD_SECONDS = 2.0
+IDLE_INFER_INTERVAL = 1.0
+
+# --- Frame bus ---
+# Capture writes each frame once into a per-camera shared-memory ring and passes
+# frame numbers on; processing and streaming read from the ring (any process can
+# attach by name, see frame_bus_names()). The raw ring doubles as the pre-event buffer.
+FRAME_BUS = True
+FRAME_RING_SLOTS = ANOMALY_BUFFER_SIZE + 4
+OUTPUT_RING_SLOTS = 4
+
+# --- Inference backend ---
+# "torch": Ultralytics + Keras FaceNet; "onnx": ONNX Runtime for all four models
+# (export first with `python scripts/inference_backend.py export`)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+# "int8" loads the quantized *.int8.onnx models (scripts/quantize_models.py) for CPU-only boxes
+MODEL_PRECISION   = os.getenv("MODEL_PRECISION", "fp32")
+
+# --- Model loading ---
+# Nothing heavy is loaded at import. "background" starts loading every model
+# (and the embeddings) in a thread when the API starts; "off" loads each on first use.
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "background")
+
+# --- Batched inference settings ---
+INFERENCE_BATCHING = True          # share one batched call per model across all cameras
+INFERENCE_MAX_BATCH_SIZE = 8       # frames per model call
+INFERENCE_MAX_WAIT = 0.01          # seconds a partial batch waits for more frames
+
+# --- Recognition batching ---
+RECOGNITION_BATCH_SIZE = 16        # faces embedded per FaceNet call
+RECOGNITION_BATCH_DEADLINE = 0.05  # seconds to wait for more queued faces
+
+# --- Behaviour detection settings ---
+# "crops": one batched object_model call over all person crops (default)
+# "frame": one object_model call on the full frame, objects matched to persons by overlap
+# "roi":   legacy per-person object_model calls, kept for accuracy comparison
+BEHAVIOR_MODE = "crops"
+BEHAVIOR_MATCH_OVERLAP = 0.5       # share of an object box that must lie inside a person box
+
+# --- Worker directory ---
+# WorkerIdentity is held in memory and reloaded in bulk; API writes touch
+# directory_stamp so the reload happens right away (see directory_cache.py)
+WORKER_DIRECTORY_TTL = 300         # seconds between full reloads
+
+# --- Event batching ---
+EVENT_BATCH_SIZE = 200             # events per Celery batch task / multi-row insert
+EVENT_BATCH_DELAY = 1.0            # seconds an event may wait for its batch to fill
+EVENT_MAX_PENDING = 20000          # per kind; oldest dropped beyond this while the broker is down
+
+# --- Event spool ---
+# Events are appended to a local segment log (see event_spool.py) and a
+# forwarder drains it, so a slow or dead broker never stalls the cameras and
+# unsent events survive a restart. EVENT_SPOOL=0 keeps them in memory only.
+EVENT_SPOOL = os.getenv("EVENT_SPOOL", "1") != "0"
+EVENT_SPOOL_DIR = Path(os.getenv("EVENT_SPOOL_DIR", str(PROJECT_ROOT / "event_spool")))
+EVENT_SPOOL_MAX_BYTES = int(os.getenv("EVENT_SPOOL_MAX_BYTES", str(1 << 30)))  # oldest segments dropped beyond this
+EVENT_SPOOL_FSYNC_INTERVAL = 0.2   # seconds; at most this much is lost on a crash
+# "celery": batch tasks on the broker; "mysql": insert directly, as the worker would;
+# "auto": the broker, falling back to a direct insert while it is unreachable
+EVENT_FORWARD = os.getenv("EVENT_FORWARD", "auto")
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://127.0.0.1:6379/0")
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://127.0.0.1:6379/1")
+
 # --- Cooldown settings ---
 ANOMALY_COOLDOWN_SECONDS = 10      # per camera
 UNAUTHORIZED_COOLDOWN_SECONDS = 10 # per camera
@@ -117,15 +209,48 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 cv2.setNumThreads(0)
 
-device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
-# Load Models (heavy objects reused across cameras)
-face_model   = YOLO(YOLO_FACE_PATH).to(device)
-embedder     = FaceNet()
-person_model = YOLO(YOLO_PERSON_PATH).to(device)
-object_model = YOLO(YOLO_OBJECT_PATH).to(device)
+# Models (heavy objects reused across cameras), loaded on first use or by warm_up()
+models = ModelRegistry()
+face_model   = models.register("face", lambda: load_detector(YOLO_FACE_PATH, INFERENCE_BACKEND, MODEL_PRECISION))
+embedder     = models.register("embedder", lambda: load_embedder(INFERENCE_BACKEND, precision=MODEL_PRECISION))
+person_model = models.register("person", lambda: load_detector(YOLO_PERSON_PATH, INFERENCE_BACKEND, MODEL_PRECISION))
+object_model = models.register("object", lambda: load_detector(YOLO_OBJECT_PATH, INFERENCE_BACKEND, MODEL_PRECISION))
+# imported ahead of time so adding a camera doesn't stall on it
+models.register("mediapipe", lambda: __import__("mediapipe"))
 OBJECT_CONFIDENCE_THRESHOLD = 0.75
 
+# One scheduler for every camera; worker threads start on first use
+inference_scheduler = InferenceScheduler(
+    {"person": person_model, "face": face_model, "object": object_model},
+    max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+    max_wait=INFERENCE_MAX_WAIT,
+)
+
+def run_model(name, image):
+    """Run one image through a shared model and return its Results object."""
+    if INFERENCE_BATCHING:
+        return inference_scheduler.infer(name, image)
+    return inference_scheduler.models[name](image)[0]
+
+def prepare_detector_input(frame):
+    return DetectorInput(frame, DETECTOR_INPUT_SIZE) if DETECTOR_INPUT_SIZE else None
+
+def run_detector(name, frame, det_input=None):
+    """Like run_model, but on the shared letterboxed input when there is one;
+    boxes always come back in `frame` coordinates."""
+    if det_input is None:
+        return run_model(name, frame)
+    return det_input.restore(run_model(name, det_input.image))
+
+def run_model_many(name, images):
+    """Run several images through a shared model in as few calls as possible."""
+    if not images:
+        return []
+    if INFERENCE_BATCHING:
+        return inference_scheduler.infer_many(name, images)
+    return list(inference_scheduler.models[name](images))
+
 # Ensure base dir exists
 try:
     ANOMALY_BASE_DIR.mkdir(parents=True, exist_ok=True)
@@ -142,21 +267,46 @@ def normalize_source(source):
     return source
 
 # ---------------------------- Embeddings loader ----------------------------
-embeddings_dict = {}
-centroid_names = []
-centroid_matrix = None
+# The live EmbeddingGeneration. Readers take this reference once per call;
+# load_embeddings() replaces it in a single assignment.
+_generation = EmbeddingGeneration.empty()
+
+def current_generation():
+    models.get("embeddings")  # first caller loads them and starts the watcher
+    return _generation
+
+def build_person_embedding_table(emb_map, names):
+    """Stack every identity's per-image embeddings in centroid order; rows
+    offsets[i]:offsets[i+1] belong to names[i]."""
+    blocks = []
+    offsets = [0]
+    for name in names:
+        embs = emb_map.get(name, {}).get('embeddings')
+        if embs is not None and getattr(embs, 'size', 0) > 0:
+            blocks.append(np.asarray(embs, dtype=np.float32).reshape(-1, embs.shape[-1]))
+            offsets.append(offsets[-1] + blocks[-1].shape[0])
+        else:
+            offsets.append(offsets[-1])
+    if not blocks:
+        return None, np.asarray(offsets, dtype=np.int64)
+    return np.vstack(blocks), np.asarray(offsets, dtype=np.int64)
+
+def _load_from_store():
+    """Map the columnar store (see embedding_store.py); vectors are already unit length."""
+    store = open_store(EMBEDDING_STORE_DIR)
+    if store is None:
+        return None
+    names = list(store.names)
+    cmat = store.centroids if len(names) else None
+    return store.to_dict(), names, cmat, store.embeddings, store.offsets, f"store:{store.generation}"
 
-def load_embeddings():
-    global embeddings_dict, centroid_names, centroid_matrix
+def _load_from_pickle():
     try:
         with open(EMBEDDINGS_FILE, 'rb') as f:
             raw = pickle.load(f)
     except Exception as e:
         logging.error(f"[Monitor] Failed to open embeddings file {EMBEDDINGS_FILE}: {e}")
-        embeddings_dict = {}
-        centroid_names = []
-        centroid_matrix = None
-        return
+        return None
     new_map = {}
     for name, v in raw.items():
         try:
@@ -169,17 +319,16 @@ def load_embeddings():
                     embs = np.expand_dims(embs, axis=0)
                 cent = np.mean(embs, axis=0) if embs.size else None
             if embs.size:
-                embs = np.array([e / (np.linalg.norm(e) + 1e-10) for e in embs], dtype=np.float32)
+                embs = (embs / (np.linalg.norm(embs, axis=1, keepdims=True) + 1e-10)).astype(np.float32)
             if cent is not None:
                 cent = cent / (np.linalg.norm(cent) + 1e-10)
             new_map[name] = {"embeddings": embs, "centroid": cent}
         except Exception as e:
             logging.warning(f"[Monitor] Skipping corrupted entry for {name}: {e}")
             continue
-    embeddings_dict = new_map
-    centroid_names = []
+    names = []
     centroids = []
-    for name, info in embeddings_dict.items():
+    for name, info in new_map.items():
         c = info.get('centroid')
         if c is None:
             embs = info.get('embeddings')
@@ -188,44 +337,44 @@ def load_embeddings():
                 c = c / (np.linalg.norm(c) + 1e-10)
             else:
                 continue
-        centroid_names.append(name)
+        names.append(name)
         centroids.append(c)
-    if centroids:
-        centroid_matrix = np.vstack(centroids).astype(np.float32)
-    else:
-        centroid_matrix = None
-    logging.info(f"[Monitor] Reloaded embeddings for {len(embeddings_dict)} identities (centroids: {len(centroid_names)})")
+    cmat = np.vstack(centroids).astype(np.float32) if centroids else None
+    pmat, offsets = build_person_embedding_table(new_map, names)
+    return new_map, names, cmat, pmat, offsets, "pickle"
+
+def build_generation():
+    """Load embeddings and build the search index into a new, unpublished generation."""
+    loaded = _load_from_store() or _load_from_pickle()
+    if loaded is None:
+        return None
+    emb_map, names, cmat, pmat, offsets, source = loaded
+    index = build_face_index(cmat, backend=FACE_INDEX_BACKEND,
+                             ivf_min_size=FACE_INDEX_IVF_MIN_SIZE, n_probe=FACE_INDEX_NPROBE)
+    return EmbeddingGeneration(emb_map, names, cmat, pmat, offsets, index, source=source)
 
-load_embeddings()
+def load_embeddings():
+    global _generation
+    gen = build_generation()
+    if gen is None:
+        logging.error(f"[Monitor] Keeping embedding generation {_generation.version}; new embeddings could not be loaded")
+        return
+    _generation = gen
+    logging.info(f"[Monitor] Published embedding generation {gen.version} ({gen.source}) "
+                 f"for {len(gen.embeddings_dict)} identities (centroids: {len(gen)})")
 
-# watch pkltimestamp updates
-last_ts = 0
-if os.path.exists(TIMESTAMP_FILE):
-    try:
-        last_ts = float(open(TIMESTAMP_FILE).read())
-    except:
-        last_ts = 0
+# Rebuild when pkltimestamp is bumped. Publishers write it last (after the store's
+# CURRENT and the manifest), so watching only it gives one reload per publish.
+embedding_watcher = GenerationWatcher([TIMESTAMP_FILE], load_embeddings)
 
-def watch_for_updates(interval=5):
-    global last_ts
-    while True:
-        try:
-            ts = float(open(TIMESTAMP_FILE).read())
-            if ts > last_ts:
-                logging.info("[Monitor] Detected updated pkltimestamp, reloading embeddings...")
-                load_embeddings()
-                last_ts = ts
-        except FileNotFoundError:
-            pass
-        except Exception as e:
-            logging.error(f"[Monitor] Error watching pkltimestamp: {e}")
-        time.sleep(interval)
+def _init_embeddings():
+    load_embeddings()
+    embedding_watcher.start()
+    return embedding_watcher
 
-threading.Thread(target=watch_for_updates, daemon=True).start()
+models.register("embeddings", _init_embeddings)
 
-# Load icons
-verified_icon = cv2.imread(ICON_VERIFIED_PATH, cv2.IMREAD_UNCHANGED)
-unverified_icon = cv2.imread(ICON_UNVERIFIED_PATH, cv2.IMREAD_UNCHANGED)
+# Icons
 def ensure_alpha(icon):
     if icon is None:
         return None
@@ -233,8 +382,25 @@ def ensure_alpha(icon):
         alpha = np.ones((icon.shape[0], icon.shape[1]), dtype=icon.dtype) * 255
         return np.dstack((icon, alpha))
     return icon
-verified_icon = ensure_alpha(verified_icon)
-unverified_icon = ensure_alpha(unverified_icon)
+
+def _load_icons():
+    return {
+        "verified": ensure_alpha(cv2.imread(ICON_VERIFIED_PATH, cv2.IMREAD_UNCHANGED)),
+        "unverified": ensure_alpha(cv2.imread(ICON_UNVERIFIED_PATH, cv2.IMREAD_UNCHANGED)),
+    }
+
+models.register("icons", _load_icons, warm=False)
+
+def warm_up(background=True):
+    """Start loading models and embeddings unless MODEL_WARMUP is "off"."""
+    worker_directory.start()
+    authorization.start()
+    if MODEL_WARMUP == "off":
+        return None
+    return models.warm_up(background=background)
+
+def model_status():
+    return {"ready": models.ready(), "models": models.status()}
 
 # ------------------------- Multi-camera state -------------------------
 camera_registry = {}
@@ -253,28 +419,70 @@ frame_queue       = queue.Queue(maxsize=10)
 recognition_queue = queue.Queue()
 results_queue     = queue.Queue()
 stop_threads      = False
-authorization_cache = {}
-cache_last_refresh  = 0
 track_info          = {}
 last_identity = {}
 
-# ------------------------- Celery dispatch (lazy) -------------------------
+# ------------------------- Event forwarding -------------------------
+BATCH_TASKS = {
+    "face": "celery_tasks.process_face_events_batch",
+    "anomaly": "celery_tasks.process_anomaly_events_batch",
+}
+_celery_client = None
+
+def _celery():
+    # a client only: tasks are sent by name, so the worker module (and its DB setup) is never imported here
+    global _celery_client
+    if _celery_client is None:
+        from celery import Celery
+        _celery_client = Celery("monitoring_tasks", broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
+        _celery_client.conf.broker_connection_timeout = 3
+    return _celery_client
+
+def _insert_events_directly(kind, events):
+    from app.routes import celery_tasks
+    if kind == "face":
+        celery_tasks.insert_events(celery_tasks.FACE_INSERT, celery_tasks.face_event_row, events)
+    else:
+        celery_tasks.insert_events(celery_tasks.ANOMALY_INSERT, celery_tasks.anomaly_event_row, events)
+
+def _send_event_batch(kind, events):
+    if EVENT_FORWARD != "mysql":
+        try:
+            # retry=False: fail fast and let the spool back off instead of blocking on a dead broker
+            _celery().send_task(BATCH_TASKS[kind], args=[events], retry=False)
+            return
+        except Exception as e:
+            if EVENT_FORWARD == "celery":
+                raise
+            logging.warning(f"[Events] Broker unavailable ({e}); inserting {len(events)} {kind} events directly")
+    _insert_events_directly(kind, events)
+
+_event_sink_lock = threading.Lock()
+event_sink = None
+
+def _get_event_sink():
+    # created on the first event so importing monitoring never claims a spool slot
+    global event_sink
+    with _event_sink_lock:
+        if event_sink is None:
+            if EVENT_SPOOL:
+                try:
+                    spool = EventSpool(EVENT_SPOOL_DIR, _send_event_batch, max_bytes=EVENT_SPOOL_MAX_BYTES,
+                                       fsync_interval=EVENT_SPOOL_FSYNC_INTERVAL, max_batch=EVENT_BATCH_SIZE,
+                                       max_delay=EVENT_BATCH_DELAY, max_queued=EVENT_MAX_PENDING)
+                    spool.start()
+                    event_sink = spool
+                except Exception as e:
+                    logging.error(f"[Events] Event spool unavailable at {EVENT_SPOOL_DIR}, buffering in memory: {e}")
+            if event_sink is None:
+                event_sink = BatchingEventSink(_send_event_batch, max_batch=EVENT_BATCH_SIZE,
+                                               max_delay=EVENT_BATCH_DELAY, max_pending=EVENT_MAX_PENDING)
+        return event_sink
+
 def _dispatch_to_celery(event_type, camera_id, data):
-    try:
-        from celery_tasks import process_face_event, process_anomaly_event
-        payload = {"camera_id": camera_id, "data": data}
-        if event_type == "face":
-            try:
-                process_face_event.delay(payload)
-            except Exception as e:
-                logging.debug(f"[Monitor] Failed to dispatch face task to Celery: {e}")
-        elif event_type == "anomaly":
-            try:
-                process_anomaly_event.delay(payload)
-            except Exception as e:
-                logging.debug(f"[Monitor] Failed to dispatch anomaly task to Celery: {e}")
-    except Exception:
+    if event_type not in ("face", "anomaly"):
         return
+    (event_sink or _get_event_sink()).put(event_type, {"camera_id": camera_id, "data": data})
 
 def on_face_recognized(camera_id, data):
     try:
@@ -291,42 +499,25 @@ def on_anomaly(camera_id, data):
     return
 
 # ------------------------- DB & helpers -------------------------
+# bounded pool shared by every camera thread; size/timeout/recycle come from DB_POOL_* env
+db_pool = ConnectionPool(lambda: mysql.connector.connect(**DB_CONFIG), name="monitoring")
+
 def connect_to_db():
-    return mysql.connector.connect(**DB_CONFIG)
+    """Pooled connection; close() hands it back instead of disconnecting."""
+    return db_pool.get()
+
+# load in the background on first lookup; until then names are unknown (unauthorised)
+worker_directory = WorkerDirectory(connect_to_db, ttl=WORKER_DIRECTORY_TTL)
+authorization = AuthorizationSnapshot(connect_to_db, ttl=AUTH_CACHE_TTL)
 
 def check_authorization(name):
-    global cache_last_refresh
-    now = time.time()
-    if now - cache_last_refresh > AUTH_CACHE_TTL:
-        authorization_cache.clear()
-        cache_last_refresh = now
-    if name in authorization_cache:
-        return authorization_cache[name]
-    try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT Certificate1, Certificate2, Certificate3, Certificate4 FROM IdentityManagement WHERE PersonName=%s",
-            (name,)
-        )
-        row = cur.fetchone()
-        conn.close()
-    except Exception as e:
-        logging.error(f"DB error: {e}")
-        return False
-    if not row:
-        authorization_cache[name] = False
-        return False
-    cert1, flag2, cert3, flag4 = row
-    try:
-        cert1 = (datetime.datetime.strptime(cert1, '%Y-%m-%d').date() if isinstance(cert1, str) else cert1)
-        cert3 = (datetime.datetime.strptime(cert3, '%Y-%m-%d').date() if isinstance(cert3, str) else cert3)
-    except Exception:
-        authorization_cache[name] = False
-        return False
-    valid = (cert1 >= datetime.date.today()) and bool(flag2) and (cert3 >= datetime.date.today()) and bool(flag4)
-    authorization_cache[name] = valid
-    return valid
+    """Certificates valid today; a lookup in the in-memory snapshot, never a DB call."""
+    return authorization.is_authorized(name)
+
+def track_authorized(name):
+    # evaluated each time a result is used, never cached with the identity, so
+    # certificate expiry and snapshot reloads reach tracks that are already shown
+    return check_authorization(name) if name and name != "Unknown" else False
 
 def log_unauthorized(name, timestamp, track_id):
     try:
@@ -367,39 +558,60 @@ def l2_normalize_vec(v):
         return v
     return v / n
 
-def recognize(emb):
-    global centroid_matrix, centroid_names, embeddings_dict
-    if centroid_matrix is None or len(centroid_names) == 0:
-        return (None, 0.0)
-    embn = l2_normalize_vec(emb)
-    try:
-        dists = cdist([embn], centroid_matrix, metric='cosine')[0]
-    except Exception as e:
-        logging.error(f"[Monitor] cdist failed: {e}")
-        return (None, 0.0)
-    idx = int(np.argmin(dists))
-    centroid_sim = 1.0 - float(dists[idx])
-    candidate_name = centroid_names[idx]
-    if centroid_sim >= SIMILARITY_THRESHOLD:
-        if FALLBACK_VERIFY:
-            p_embs = embeddings_dict.get(candidate_name, {}).get('embeddings')
-            if p_embs is not None and getattr(p_embs, 'size', 0) > 0:
-                try:
-                    d2 = cdist([embn], p_embs, metric='cosine')[0]
-                    best_sim = 1.0 - float(np.min(d2))
-                except Exception as e:
-                    logging.warning(f"[Monitor] per-image verify failed for {candidate_name}: {e}")
-                    best_sim = centroid_sim
-                if best_sim >= max(SIMILARITY_THRESHOLD, centroid_sim - FALLBACK_MARGIN):
-                    return (candidate_name, float(best_sim))
-                else:
-                    return (None, float(best_sim))
-            else:
-                return (candidate_name, float(centroid_sim))
-        else:
-            return (candidate_name, float(centroid_sim))
-    else:
-        return (None, float(centroid_sim))
+def recognize(emb, generation=None):
+    return recognize_many([emb], generation)[0]
+
+def recognize_many(embs, generation=None):
+    """Match a batch of embeddings against the enrolled identities.
+
+    Same decisions as the original single-query matcher: best centroid by
+    cosine similarity, then (with FALLBACK_VERIFY) the best per-image
+    similarity of that candidate must clear the threshold and stay within
+    FALLBACK_MARGIN of the centroid score. Returns [(name or None, similarity)].
+    Pass `generation` to pin the match to a specific EmbeddingGeneration.
+    """
+    embs = np.asarray(embs, dtype=np.float32)
+    if embs.ndim == 1:
+        embs = embs[None, :]
+    n = embs.shape[0]
+    if n == 0:
+        return []
+    gen = generation or current_generation()
+    names, index = gen.centroid_names, gen.centroid_index
+    pmat, offsets = gen.person_emb_matrix, gen.person_emb_offsets
+    if index is None or len(names) == 0:
+        return [(None, 0.0)] * n
+
+    norms = np.linalg.norm(embs, axis=1, keepdims=True)
+    q = np.where(norms < 1e-10, embs, embs / np.maximum(norms, 1e-10))
+
+    # stage 1: cosine search over centroids (exact or approximate index)
+    top_sims, top_ids = index.search(q, k=1)
+    found = top_ids[:, 0] >= 0
+    idx = np.where(found, top_ids[:, 0], 0)
+    centroid_sim = np.where(found, top_sims[:, 0], 0.0).astype(np.float32)
+    accepted = found & (centroid_sim >= SIMILARITY_THRESHOLD)
+    best_sim = centroid_sim.copy()
+
+    # stage 2: verify every accepted candidate against its own per-image embeddings
+    if FALLBACK_VERIFY and pmat is not None and accepted.any():
+        starts = offsets[idx]
+        counts = offsets[idx + 1] - starts
+        rows = np.nonzero(accepted & (counts > 0))[0]
+        if rows.size:
+            counts_r = counts[rows]
+            seg_starts = np.cumsum(counts_r) - counts_r
+            row_of = np.repeat(np.arange(rows.size), counts_r)
+            emb_ids = np.arange(counts_r.sum()) - np.repeat(seg_starts, counts_r) + np.repeat(starts[rows], counts_r)
+            dots = np.einsum('ij,ij->i', q[rows][row_of], pmat[emb_ids])
+            per_image = np.maximum.reduceat(dots, seg_starts)
+            best_sim[rows] = per_image
+            accepted[rows] = per_image >= np.maximum(SIMILARITY_THRESHOLD, centroid_sim[rows] - FALLBACK_MARGIN)
+
+    return [
+        (names[int(idx[i])] if accepted[i] else None, float(best_sim[i]))
+        for i in range(n)
+    ]
 
 def overlay_text(frame, vcnt, ucnt, fps):
     cv2.putText(frame, f"Authorized: {vcnt}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,255,0), 2)
@@ -408,10 +620,8 @@ def overlay_text(frame, vcnt, ucnt, fps):
     ts = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     cv2.putText(frame, ts, (10,120), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,255,0), 1)
 
-def detect_objects_within_box(img, box):
-    x1,y1,x2,y2 = box
-    roi = img[y1:y2, x1:x2]
-    res = object_model(roi)[0]
+def _object_hits(res, offset=(0, 0)):
+    ox, oy = offset
     found = []
     for b in res.boxes:
         try:
@@ -419,32 +629,104 @@ def detect_objects_within_box(img, box):
                 ox1,oy1,ox2,oy2 = map(int, b.xyxy[0])
                 lbl = res.names[int(b.cls)]
                 conf = float(b.conf.item())
-                found.append({"label": lbl, "conf": conf, "xyxy": (x1+ox1, y1+oy1, x1+ox2, y1+oy2)})
+                found.append({"label": lbl, "conf": conf, "xyxy": (ox+ox1, oy+oy1, ox+ox2, oy+oy2)})
         except Exception:
             continue
     return found
 
-def run_behavior(frame):
-    res = person_model(frame)[0]
+def _draw_objects(frame, found):
+    # draw simple markers for found objects (non-blocking)
+    for f in found:
+        xy = f.get("xyxy")
+        if xy:
+            try:
+                xA,yA,xB,yB = xy
+                cv2.rectangle(frame, (xA,yA), (xB,yB), (0,0,255), 2)
+                cv2.putText(frame, f"{f['label']} {f['conf']:.2f}", (xA, max(yA-6,0)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,255), 1)
+            except Exception:
+                pass
+
+def detect_objects_within_box(img, box):
+    x1,y1,x2,y2 = box
+    roi = img[y1:y2, x1:x2]
+    res = run_model("object", roi)
+    return _object_hits(res, (x1, y1))
+
+def overlap_ratio(obj_box, person_box):
+    """Fraction of obj_box's area that lies inside person_box."""
+    ax1, ay1, ax2, ay2 = obj_box
+    bx1, by1, bx2, by2 = person_box
+    iw = min(ax2, bx2) - max(ax1, bx1)
+    ih = min(ay2, by2) - max(ay1, by1)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    area = max(1, (ax2 - ax1) * (ay2 - ay1))
+    return (iw * ih) / area
+
+def match_objects_to_persons(objects, person_boxes, min_overlap=None):
+    """Keep objects that sit on a person and tag each with its best-matching person box."""
+    if min_overlap is None:
+        min_overlap = BEHAVIOR_MATCH_OVERLAP
+    matched = []
+    for obj in objects:
+        best_idx, best = -1, 0.0
+        for i, pbox in enumerate(person_boxes):
+            r = overlap_ratio(obj["xyxy"], pbox)
+            if r > best:
+                best_idx, best = i, r
+        if best_idx >= 0 and best >= min_overlap:
+            matched.append(dict(obj, person_box=tuple(person_boxes[best_idx]), overlap=round(best, 3)))
+    return matched
+
+def detect_objects_full_frame(frame, person_boxes, det_input=None):
+    """One object_model pass over the whole frame, objects assigned to persons by overlap."""
+    if not person_boxes:
+        return []
+    res = run_detector("object", frame, det_input)
+    return match_objects_to_persons(_object_hits(res), person_boxes)
+
+def detect_objects_in_crops(frame, person_boxes):
+    """One batched object_model pass over every person crop in the frame."""
+    crops, boxes = [], []
+    for (x1,y1,x2,y2) in person_boxes:
+        roi = frame[y1:y2, x1:x2]
+        if roi.size == 0:
+            continue
+        crops.append(roi)
+        boxes.append((x1,y1,x2,y2))
+    if not crops:
+        return []
+    found = []
+    for box, res in zip(boxes, run_model_many("object", crops)):
+        for obj in _object_hits(res, box[:2]):
+            found.append(dict(obj, person_box=box))
+    return found
+
+def run_behavior(frame, mode=None, det_input=None):
+    mode = mode or BEHAVIOR_MODE
+    res = run_detector("person", frame, det_input)
+    person_boxes = [tuple(map(int, box.xyxy[0])) for box in res.boxes if int(box.cls)==0]
     anomalies_found = []
-    for box in res.boxes:
-        if int(box.cls)==0:
-            x1,y1,x2,y2 = map(int, box.xyxy[0])
+
+    if mode == "roi":
+        # legacy path: one object_model call per person ROI
+        for (x1,y1,x2,y2) in person_boxes:
             cv2.rectangle(frame,(x1,y1),(x2,y2),(0,255,0),2)
             found = detect_objects_within_box(frame,(x1,y1,x2,y2))
             if found:
-                # draw simple markers for found objects (non-blocking)
-                for f in found:
-                    xy = f.get("xyxy")
-                    if xy:
-                        try:
-                            xA,yA,xB,yB = xy
-                            cv2.rectangle(frame, (xA,yA), (xB,yB), (0,0,255), 2)
-                            cv2.putText(frame, f"{f['label']} {f['conf']:.2f}", (xA, max(yA-6,0)),
-                                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,255), 1)
-                        except Exception:
-                            pass
+                _draw_objects(frame, found)
                 anomalies_found.extend(found)
+        return frame, anomalies_found
+
+    # detect on the clean frame first, then draw
+    if mode == "frame":
+        anomalies_found = detect_objects_full_frame(frame, person_boxes, det_input)
+    else:
+        anomalies_found = detect_objects_in_crops(frame, person_boxes)
+    for (x1,y1,x2,y2) in person_boxes:
+        cv2.rectangle(frame,(x1,y1),(x2,y2),(0,255,0),2)
+    _draw_objects(frame, anomalies_found)
     return frame, anomalies_found
 
 # ------------------------- Save anomaly clip + JSON (async helper) -------------------------
@@ -565,17 +847,30 @@ class Camera:
         self.results_queue = queue.Queue()
         self.stop_event = threading.Event()
 
-        self.track_info = {}
-        self.last_identity = {}
+        self.recognition_cache = RecognitionCache(
+            min_interval=IDENTITY_PERSISTENCE_TTL, max_interval=RECOGNITION_RECHECK_MAX,
+            low_similarity=SIMILARITY_THRESHOLD, high_similarity=RECOGNITION_HIGH_SIMILARITY,
+            forget_after=TRACK_MEMORY_TTL)
+        self.track_info = self.recognition_cache.entries
 
         latest_frames[self.camera_id] = None
         latest_faces[self.camera_id] = None
         latest_anomalies[self.camera_id] = None
 
+        self.motion_gate = MotionGate(threshold=MOTION_THRESHOLD, hold=MOTION_HOLD_SECONDS,
+                                      idle_interval=IDLE_INFER_INTERVAL)
+        self.active_tracks = 0
+
+        # shared-memory rings, created once the first frame tells us the size
+        self.raw_ring = None
+        self.output_ring = None
+
+        from deep_sort_realtime.deepsort_tracker import DeepSort
         self.deep_sort = DeepSort(max_age=10)
-        self.mp_face_mesh = vision.FaceLandmarker.create_from_options(options)
-        # frame buffer (deque); holds latest N frames for anomaly clip
-        frame_buffers[self.camera_id] = collections.deque(maxlen=ANOMALY_BUFFER_SIZE)
+        self.mp, self.mp_face_mesh = create_face_landmarker()
+        # frame buffer (deque); holds latest N frames for anomaly clip when the frame bus is off
+        if not FRAME_BUS:
+            frame_buffers[self.camera_id] = collections.deque(maxlen=ANOMALY_BUFFER_SIZE)
 
         self._t_capture = None
         self._t_recog = None
@@ -584,6 +879,8 @@ class Camera:
     def start(self):
         logging.info(f"[Camera {self.camera_id}] Starting camera with source: {self.source}")
         self.stop_event.clear()
+        if INFERENCE_BATCHING:
+            inference_scheduler.start()
         self._t_recog = threading.Thread(target=self._recognition_worker, daemon=True)
         self._t_recog.start()
         self._t_capture = threading.Thread(target=self._capture_thread, daemon=True)
@@ -605,6 +902,101 @@ class Camera:
         latest_faces.pop(self.camera_id, None)
         latest_anomalies.pop(self.camera_id, None)
         frame_buffers.pop(self.camera_id, None)
+        self._close_rings()
+
+    def _open_rings(self, shape):
+        try:
+            self.raw_ring = FrameRing.create(ring_name(self.camera_id, "raw"), FRAME_RING_SLOTS, shape)
+            self.output_ring = FrameRing.create(ring_name(self.camera_id, "out"), OUTPUT_RING_SLOTS, shape)
+            logging.info(f"[Camera {self.camera_id}] Frame bus {self.raw_ring.name} "
+                         f"({FRAME_RING_SLOTS} x {shape[1]}x{shape[0]})")
+        except Exception as e:
+            logging.error(f"[Camera {self.camera_id}] Shared-memory frame bus unavailable, using in-process buffers: {e}")
+            self._close_rings()
+            frame_buffers[self.camera_id] = collections.deque(maxlen=ANOMALY_BUFFER_SIZE)
+
+    def _close_rings(self):
+        for ring in (self.raw_ring, self.output_ring):
+            if ring is not None:
+                ring.close()
+        self.raw_ring = self.output_ring = None
+
+    def _publish(self, frame):
+        # `frame` is the process loop's own buffer, so it can be published without another copy
+        latest_frames[self.camera_id] = frame
+        if self.output_ring is not None:
+            try:
+                self.output_ring.write(frame)
+            except Exception:
+                pass
+
+    def _clean_crop(self, item, processed, l, t, w, h):
+        """Face crop from the full-resolution frame as captured, without the
+        boxes run_behavior drew on `processed`. The ring still holds that frame
+        unless capture has lapped it, in which case the annotated crop is used."""
+        if isinstance(item, np.ndarray):
+            return item[t:t+h, l:l+w]
+        ring = self.raw_ring
+        view = ring.view(item) if ring is not None else None
+        if view is not None:
+            roi = view[t:t+h, l:l+w].copy()
+            if ring.valid(item):
+                return roi
+        return processed[t:t+h, l:l+w]
+
+    def _submit_recognition(self, tid, roi, w, h, now):
+        """Landmark and align a face crop and queue it for FaceNet; True when queued."""
+        try:
+            rgb = cv2.cvtColor(roi, cv2.COLOR_BGR2RGB)
+            mp_img = self.mp.Image(image_format=self.mp.ImageFormat.SRGB, data=rgb)
+            with metrics.span("landmarks", self.camera_id):
+                lm_res = self.mp_face_mesh.detect(mp_img)
+            if not lm_res.face_landmarks:
+                return False
+            pts = lm_res.face_landmarks[0]
+
+            # Safer eye landmarks (Tasks spec)
+            LEFT_EYE  = 33
+            RIGHT_EYE = 263
+            left = (int(pts[LEFT_EYE].x * w), int(pts[LEFT_EYE].y * h))
+            right = (int(pts[RIGHT_EYE].x * w), int(pts[RIGHT_EYE].y * h))
+
+            # Guard against bad geometry
+            if abs(left[0] - right[0]) < 5:
+                return False
+
+            aligned = align_face(roi, [left, right])
+            self.recognition_queue.put((tid, aligned), timeout=0.1)
+        except Exception:
+            return False
+        self.recognition_cache.mark_inflight(tid, now)
+        return True
+
+    def _recent_frames(self):
+        """Frames for the pre-event part of an anomaly clip, oldest first."""
+        if self.raw_ring is not None:
+            return self.raw_ring.recent(ANOMALY_BUFFER_SIZE)
+        buf = frame_buffers.get(self.camera_id)
+        return list(buf) if buf else []
+
+    def _ingest(self, fr):
+        """Store a captured frame for the pipeline; returns what goes on frame_queue."""
+        metrics.inc("frames_captured_total", self.camera_id)
+        if FRAME_BUS and self.raw_ring is None and self.camera_id not in frame_buffers:
+            self._open_rings(fr.shape)
+        ring = self.raw_ring
+        if ring is not None:
+            if fr.shape != ring.shape:
+                fr = cv2.resize(fr, (ring.shape[1], ring.shape[0]))
+            # one copy into shared memory; everything downstream passes the frame number
+            return ring.write(fr)
+        try:
+            buf = frame_buffers.get(self.camera_id)
+            if buf is not None:
+                buf.append(fr.copy())
+        except Exception:
+            pass
+        return fr
 
     def _capture_thread(self):
         last = 0
@@ -625,17 +1017,15 @@ class Camera:
         while not self.stop_event.is_set():
             now = time.time()
             if now - last >= FRAME_INTERVAL:
-                ret, fr = cap.read()
+                with metrics.span("capture_read", self.camera_id):
+                    ret, fr = cap.read()
                 if ret:
+                    item = self._ingest(fr)
                     try:
                         if not self.frame_queue.full():
-                            self.frame_queue.put(fr, timeout=0.1)
-                    except Exception:
-                        pass
-                    try:
-                        buf = frame_buffers.get(self.camera_id)
-                        if buf is not None:
-                            buf.append(fr.copy())
+                            self.frame_queue.put(item, timeout=0.1)
+                        else:
+                            metrics.inc("frames_dropped_total", self.camera_id, reason="queue_full")
                     except Exception:
                         pass
                     last = now
@@ -646,28 +1036,52 @@ class Camera:
         except Exception:
             pass
 
+    def _next_recognition_batch(self):
+        """Block for one queued face, then drain more until the batch is full or the deadline passes."""
+        batch = [self.recognition_queue.get()]
+        deadline = time.time() + RECOGNITION_BATCH_DEADLINE
+        while len(batch) < RECOGNITION_BATCH_SIZE and batch[-1][1] is not None:
+            remaining = deadline - time.time()
+            try:
+                if remaining <= 0:
+                    batch.append(self.recognition_queue.get_nowait())
+                else:
+                    batch.append(self.recognition_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _recognize_batch(self, faces):
+        tids = [tid for tid, _ in faces]
+        try:
+            with metrics.span("extract_embeddings", self.camera_id):
+                embs = extract_embeddings([img for _, img in faces])
+        except Exception as e:
+            logging.error(f"[Camera {self.camera_id}] embedding error in recognition_worker: {e}")
+            embs = np.zeros((0, 512), dtype=np.float32)
+        gen = current_generation()
+        if embs.shape[0] != len(faces):
+            now = time.time()
+            for tid in tids:
+                self.results_queue.put((tid, "Unknown", 0.0, now, gen.version))
+            return
+
+        with metrics.span("recognize", self.camera_id):
+            matches = recognize_many(embs, gen)
+        for tid, (name, sim) in zip(tids, matches):
+            self.results_queue.put((tid, name or "Unknown", sim, time.time(), gen.version))
+
     def _recognition_worker(self):
         while True:
             try:
-                tid, face_img = self.recognition_queue.get()
+                batch = self._next_recognition_batch()
             except Exception:
-                tid, face_img = (None, None)
-            if face_img is None:
+                batch = [(None, None)]
+            faces = [(tid, img) for tid, img in batch if img is not None]
+            if faces:
+                self._recognize_batch(faces)
+            if len(faces) < len(batch):
                 break
-            try:
-                emb_arr = extract_embeddings([face_img])
-                if emb_arr.shape[0] == 0:
-                    self.results_queue.put((tid, "Unknown", False, 0.0, time.time()))
-                    continue
-                emb = emb_arr[0]
-            except Exception as e:
-                logging.error(f"[Camera {self.camera_id}] embedding error in recognition_worker: {e}")
-                self.results_queue.put((tid, "Unknown", False, 0.0, time.time()))
-                continue
-
-            name, sim = recognize(emb)
-            auth = check_authorization(name) if name else False
-            self.results_queue.put((tid, name or "Unknown", auth, sim, time.time()))
 
     def _process_loop(self):
         prev = time.time()
@@ -676,17 +1090,35 @@ class Camera:
                 if self.frame_queue.empty():
                     time.sleep(0.001)
                     continue
-                frame = self.frame_queue.get()
+                item = self.frame_queue.get()
             except Exception:
                 continue
+            if isinstance(item, np.ndarray):
+                frame = item.copy()
+            else:
+                # private copy out of the ring; None means capture already lapped this slot
+                frame = self.raw_ring.read(item) if self.raw_ring is not None else None
+                if frame is None:
+                    metrics.inc("frames_dropped_total", self.camera_id, reason="ring_lapped")
+                    continue
 
             #try:
             #    latest_frames[self.camera_id] = frame.copy()
             #except Exception:
             #    latest_frames[self.camera_id] = None
 
+            if MOTION_GATING and not self.motion_gate.admit(frame, self.active_tracks > 0):
+                # nothing moving and nobody tracked: keep the stream live, skip the models
+                metrics.inc("frames_gated_total", self.camera_id)
+                self._publish(frame)
+                continue
+            t_frame = time.perf_counter()
+
+            # letterbox once, before anything is drawn on the frame
+            det_input = prepare_detector_input(frame)
             try:
-                processed, anomalies_in_frame = run_behavior(frame.copy())
+                with metrics.span("run_behavior", self.camera_id):
+                    processed, anomalies_in_frame = run_behavior(frame, det_input=det_input)
             except Exception as e:
                 logging.exception(f"[Camera {self.camera_id}] run_behavior failed: {e}")
                 processed = frame
@@ -694,7 +1126,9 @@ class Camera:
 
             dets = []
             try:
-                for b in face_model(processed)[0].boxes:
+                with metrics.span("face_model", self.camera_id):
+                    face_res = run_detector("face", processed, det_input)
+                for b in face_res.boxes:
                     if int(b.cls) == 0:
                         x1, y1, x2, y2 = map(int, b.xyxy[0])
                         dets.append(([x1, y1, x2 - x1, y2 - y1], 1.0, 'face'))
@@ -702,39 +1136,32 @@ class Camera:
                 logging.warning(f"[Camera {self.camera_id}] face_model call failed: {e}")
 
             try:
-                tracks = self.deep_sort.update_tracks(dets, frame=processed)
+                with metrics.span("deep_sort", self.camera_id):
+                    tracks = self.deep_sort.update_tracks(dets, frame=processed)
             except Exception as e:
                 logging.warning(f"[Camera {self.camera_id}] deep_sort update failed: {e}")
                 tracks = []
+            self.active_tracks = sum(1 for tr in tracks if tr.is_confirmed() and tr.time_since_update == 0)
 
             now = time.time()
-
-            self.track_info = {
-                tid: info
-                for tid, info in self.track_info.items()
-                if now - info['last_seen'] < TRACK_MEMORY_TTL
-            }
-            self.last_identity = {
-                tid: info
-                for tid, info in self.last_identity.items()
-                if now - info['last_seen'] < IDENTITY_PERSISTENCE_TTL
-            }
+            cache = self.recognition_cache
+            cache.prune(now)
+            gen_version = current_generation().version
 
             while not self.results_queue.empty():
                 try:
-                    tid, name, auth, sim, tstamp = self.results_queue.get_nowait()
+                    tid, name, sim, tstamp, result_gen = self.results_queue.get_nowait()
                 except Exception:
                     break
-                entry = {'name': name, 'auth': auth, 'similarity': sim, 'last_seen': tstamp}
-                self.track_info[tid] = entry
-                self.last_identity[tid] = entry.copy()
+                cache.update(tid, name, sim, tstamp, result_gen)
                 try:
                     #ev = {'name': name, 'auth': auth, 'similarity': sim, 'timestamp': tstamp}
                     ev = {
                         "name": name,
-                        "auth": auth,
+                        "auth": track_authorized(name),
                         "similarity": sim,
                         "timestamp": tstamp,
+                        "generation": result_gen,
 
                         
                     }
@@ -755,12 +1182,14 @@ class Camera:
 
                 frame_h, frame_w = processed.shape[:2]
 
-                info = self.track_info.get(tid)
+                info = cache.lookup(tid, now)
+                auth = track_authorized(info["name"]) if info else False
                 if info:
                     ev = {
                         "name": info["name"],
-                        "auth": info["auth"],
+                        "auth": auth,
                         "similarity": round(info["similarity"], 3),
+                        "generation": info.get("generation"),
                         "timestamp": time.time(),
                         "bbox": [l, t, w, h],
                         "frame_width": frame_w,
@@ -779,63 +1208,19 @@ class Camera:
 
                 }
 
-                roi = processed[t:t+h, l:l+w]
-                if isinstance(roi, np.ndarray) and roi.size == 0:
+                if w <= 0 or h <= 0:
                     continue
 
-                info = self.track_info.get(tid)
+                # cached identity stays on screen while a due re-check runs in the background;
+                # the crop (a copy out of the frame ring) is only taken when it will be used
+                if cache.needs_recognition(tid, now, gen_version):
+                    roi = self._clean_crop(item, processed, l, t, w, h)
+                    if roi.size:
+                        self._submit_recognition(tid, roi, w, h, now)
                 if not info:
-                    last_info = self.last_identity.get(tid)
-                    if last_info and (now - last_info['last_seen'] < IDENTITY_PERSISTENCE_TTL):
-                        info = last_info
-                        self.track_info[tid] = info
-                    else:
-                        try:
-                            rgb = cv2.cvtColor(roi, cv2.COLOR_BGR2RGB)
-                            #lm_res = self.mp_face_mesh.process(rgb)
-                            #lm_res = self.mp_face_mesh.detect(mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb))
-
-                            #if not lm_res.multi_face_landmarks:
-                            #    continue
-                            #pts = lm_res.multi_face_landmarks[0].landmark
-                            #left = (int(pts[33].x * w), int(pts[33].y * h))
-                            #right = (int(pts[263].x * w), int(pts[263].y * h))
-
-                            mp_img = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
-                            lm_res = self.mp_face_mesh.detect(mp_img)
-
-                            if not lm_res.face_landmarks:
-                                continue
-
-                            pts = lm_res.face_landmarks[0]
-
-                            # Safer eye landmarks (Tasks spec)
-
-                            LEFT_EYE  = 33
-                            RIGHT_EYE = 263
-
-                            left = (int(pts[LEFT_EYE].x * w), int(pts[LEFT_EYE].y * h))
-
-                            right = (int(pts[RIGHT_EYE].x * w), int(pts[RIGHT_EYE].y * h))
-
-                            # Guard against bad geometry
-
-                            if abs(left[0] - right[0]) < 5:
-                                continue
-
-
+                    continue
 
-                        
-                            aligned = align_face(roi, [left, right])
-                            try:
-                                self.recognition_queue.put((tid, aligned), timeout=0.1)
-                            except Exception:
-                                pass
-                        except Exception:
-                            continue
-                        continue
-
-                name, auth, sim = info['name'], info['auth'], info['similarity']
+                name, sim = info['name'], info['similarity']
                 col = (0, 255, 0) if auth else (0, 0, 255)
                 if auth:
                     vcnt += 1
@@ -874,10 +1259,9 @@ class Camera:
             except Exception:
                 pass
 
-            try:
-                latest_frames[self.camera_id] = processed.copy()
-            except Exception:
-                latest_frames[self.camera_id] = None
+            self._publish(processed)
+            metrics.observe("frame_total", time.perf_counter() - t_frame, self.camera_id)
+            metrics.inc("frames_processed_total", self.camera_id)
 
             # If anomalies detected by run_behavior (object_model inside boxes), save clip and dispatch event
 #            try:
@@ -953,8 +1337,7 @@ class Camera:
                         last_anomaly_save[self.camera_id] = now_ts
                         
                         # Grab the PRE-EVENT frames immediately (before they are overwritten)
-                        buf = frame_buffers.get(self.camera_id)
-                        pre_frames = list(buf) if buf and len(buf) > 0 else [processed.copy()]
+                        pre_frames = self._recent_frames() or [processed.copy()]
 
                         #pre_frames = list(frame_buffers.get(self.camera_id, []))
 
@@ -971,7 +1354,7 @@ class Camera:
                             "pre_seconds": PRE_EVENT_SECONDS,
                             "post_seconds": POST_EVENT_SECONDS,
                             "involved_identities": [
-                                {"track_id": tid, "name": self.track_info[tid]['name'], "auth": self.track_info[tid]['auth']}
+                                {"track_id": tid, "name": self.track_info[tid]['name'], "auth": track_authorized(self.track_info[tid]['name'])}
                                 for tid in relevant_tids]
                         }
                         
@@ -1045,27 +1428,67 @@ def get_latest_anomalies(camera_id):
 def list_cameras():
     return list(camera_registry.keys())
 
+def frame_bus_names(camera_id):
+    """Shared-memory ring names for a camera, for readers in other processes (FrameRing.attach)."""
+    cam = camera_registry.get(camera_id)
+    if cam is None or cam.raw_ring is None:
+        return None
+    return {"raw": cam.raw_ring.name, "output": cam.output_ring.name}
+
+def get_inference_stats():
+    return inference_scheduler.stats()
+
+def _pipeline_gauges():
+    for cid, cam in list(camera_registry.items()):
+        yield "pipeline_queue_depth", {"camera": cid, "queue": "frame"}, cam.frame_queue.qsize()
+        yield "pipeline_queue_depth", {"camera": cid, "queue": "recognition"}, cam.recognition_queue.qsize()
+        yield "pipeline_queue_depth", {"camera": cid, "queue": "results"}, cam.results_queue.qsize()
+        yield "pipeline_active_tracks", {"camera": cid}, cam.active_tracks
+        for key, value in cam.recognition_cache.counters.items():
+            yield f"recognition_cache_{key}", {"camera": cid}, value
+    for name, st in inference_scheduler.stats().items():
+        yield "inference_queue_depth", {"model": name}, st["queued"]
+        yield "inference_avg_batch", {"model": name}, st["avg_batch"]
+    yield "embedding_reloads", {}, embedding_watcher.reload_count
+    for cache in (worker_directory, authorization):
+        yield "directory_entries", {"cache": cache.kind}, len(cache)
+    if event_sink is not None:
+        st = event_sink.stats()
+        for kind, n in st.get("pending", {}).items():
+            yield "events_pending", {"kind": kind}, n
+        if "backlog_bytes" in st:
+            yield "event_spool_backlog_bytes", {}, st["backlog_bytes"]
+            yield "event_spool_queued", {}, st["queued_in_memory"]
+    if models.is_loaded("embeddings"):
+        yield "embedding_generation", {}, current_generation().version
+
+metrics.add_collector(_pipeline_gauges)
+
+def get_metrics_snapshot(extra_labels=None):
+    return metrics.snapshot(**(extra_labels or {}))
+
+def get_recognition_stats():
+    return {cid: cam.recognition_cache.stats() for cid, cam in list(camera_registry.items())}
+
+def get_motion_stats():
+    return {cid: cam.motion_gate.stats() for cid, cam in list(camera_registry.items())}
+
+def get_embedding_generation():
+    if not models.is_loaded("embeddings"):
+        return {"version": None, "state": models.state("embeddings"), "identities": 0, "reloads": 0}
+    return dict(current_generation().describe(), reloads=embedding_watcher.reload_count)
+
 def fetch_worker_details(name):
-    try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT BadgeID, Position, Company, AccessLevel
-              FROM WorkerIdentity
-             WHERE PersonName = %s
-        """, (name,))
-        row = cur.fetchone()
-        conn.close()
-        if row:
-            return {
-                "BadgeID":   row[0],
-                "Position":  row[1],
-                "Company":   row[2],
-                "AccessLevel": row[3]
-            }
-    except Exception as e:
-        logging.error(f"DB lookup error for {name}: {e}")
-    return None
+    """Badge details for the overlay and event stream; a memory lookup, never a DB call."""
+    return worker_directory.get(name)
+
+def get_directory_stats():
+    return {"workers": worker_directory.stats(), "authorization": authorization.stats()}
+
+def get_event_stats():
+    if event_sink is None:
+        return {"mode": EVENT_FORWARD, "spool": EVENT_SPOOL, "started": False}
+    return dict(event_sink.stats(), mode=EVENT_FORWARD, spool=isinstance(event_sink, EventSpool), started=True)
 
 
 # ------------------------- Backward compatible main (for local testing) -------------------------
@@ -1073,10 +1496,13 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--video', default='0', help="camera index or video file")
     parser.add_argument('--identity-persistence-ttl', type=float, default=IDENTITY_PERSISTENCE_TTL,
-                        help="Seconds to keep last-known identity per track (0 to disable)")
+                        help="Shortest re-verification interval for a tracked identity (0 = re-check as soon as a result arrives)")
+    parser.add_argument('--behavior-mode', choices=('crops', 'frame', 'roi'), default=BEHAVIOR_MODE,
+                        help="Behaviour detection strategy (roi = legacy per-person calls)")
     args = parser.parse_args()
 
     IDENTITY_PERSISTENCE_TTL = float(args.identity_persistence_ttl)
+    BEHAVIOR_MODE = args.behavior_mode
     src = int(args.video) if args.video.isdigit() else args.video
 
     tmp_id = f"local-{uuid.uuid4().hex[:8]}"
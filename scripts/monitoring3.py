@@ -10,24 +10,21 @@ import csv
 import argparse
 import warnings
 import os
+import sys
 from pathlib import Path
-import torch
-import torchvision.ops as tv_ops
 from scipy.spatial.distance import cdist
 
 import mediapipe as mp
-from ultralytics import YOLO
-from keras_facenet import FaceNet
 from deep_sort_realtime.deepsort_tracker import DeepSort
 import mysql.connector
 
-# ----------------- Patch: Force torchvision.ops.nms to run on CPU -----------------
-_orig_nms = tv_ops.nms
+# Make the project root importable so sibling helpers resolve as scripts.*
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
 
-def nms_cpu_fallback(boxes, scores, iou_threshold):
-    return _orig_nms(boxes.cpu(), scores.cpu(), iou_threshold)
-
-tv_ops.nms = nms_cpu_fallback
+# torch/ultralytics/keras are imported (and torchvision NMS patched to CPU) only for the "torch" backend
+from scripts.inference_backend import load_detector, load_embedder
 
 # ----------------- Configuration -----------------
 FRAME_DOWNSCALE = 1
@@ -43,6 +40,10 @@ IDENTITY_PERSISTENCE_TTL = 5
 TARGET_FPS = 10
 FRAME_INTERVAL = 1 / TARGET_FPS
 
+# "torch": Ultralytics + Keras FaceNet; "onnx": ONNX Runtime (see inference_backend.py)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+MODEL_PRECISION   = os.getenv("MODEL_PRECISION", "fp32")
+
 DB_CONFIG = {
     'host': 'localhost',
     'user': 'admin123',
@@ -74,14 +75,12 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 cv2.setNumThreads(0)
 
-device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-
 # Load Models
-face_model   = YOLO(YOLO_FACE_PATH).to(device)
-embedder     = FaceNet()
+face_model   = load_detector(YOLO_FACE_PATH, INFERENCE_BACKEND, MODEL_PRECISION)
+embedder     = load_embedder(INFERENCE_BACKEND, precision=MODEL_PRECISION)
 deep_sort     = DeepSort(max_age=10)
-person_model = YOLO(YOLO_PERSON_PATH).to(device)
-object_model = YOLO(YOLO_OBJECT_PATH).to(device)
+person_model = load_detector(YOLO_PERSON_PATH, INFERENCE_BACKEND, MODEL_PRECISION)
+object_model = load_detector(YOLO_OBJECT_PATH, INFERENCE_BACKEND, MODEL_PRECISION)
 mp_face_mesh = mp.solutions.face_mesh.FaceMesh(static_image_mode=False)
 OBJECT_CONFIDENCE_THRESHOLD = 0.75
 
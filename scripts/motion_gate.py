@@ -0,0 +1,73 @@
+# scripts/motion_gate.py
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Decides per frame whether a camera needs the detectors at all.
+
+    Motion is scored on a small grayscale copy of the frame against a
+    running-average background: the share of pixels that differ by more
+    than `pixel_delta`. A camera is "active" while that share is above
+    `threshold` or it still has live tracks, and stays active for `hold`
+    seconds afterwards so detection ramps back to full rate immediately
+    and doesn't flap. An idle camera still runs the detectors every
+    `idle_interval` seconds to catch slow changes the gate misses.
+    """
+
+    def __init__(self, width=160, threshold=0.01, pixel_delta=25, hold=2.0,
+                 idle_interval=1.0, learning_rate=0.05):
+        self.width = width
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.hold = hold
+        self.idle_interval = idle_interval
+        self.learning_rate = learning_rate
+        self._background = None
+        self.last_motion = 0.0
+        self.last_run = 0.0
+        self.last_score = 0.0
+        self.frames = 0
+        self.inferred = 0
+
+    def score(self, frame):
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, int(h * self.width / w))), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = cv2.GaussianBlur(small, (5, 5), 0).astype(np.float32)
+        if self._background is None or self._background.shape != small.shape:
+            self._background = small
+            return 1.0
+        moving = np.abs(small - self._background) > self.pixel_delta
+        cv2.accumulateWeighted(small, self._background, self.learning_rate)
+        return float(moving.mean())
+
+    def admit(self, frame, active_tracks=False, now=None):
+        """True when this frame should go through the detectors."""
+        now = time.time() if now is None else now
+        self.frames += 1
+        self.last_score = self.score(frame)
+        if self.last_score >= self.threshold or active_tracks:
+            self.last_motion = now
+        if now - self.last_motion <= self.hold or now - self.last_run >= self.idle_interval:
+            self.last_run = now
+            self.inferred += 1
+            return True
+        return False
+
+    @property
+    def active(self):
+        return time.time() - self.last_motion <= self.hold
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "motion_score": round(self.last_score, 4),
+            "frames": self.frames,
+            "inferred": self.inferred,
+            "skipped": self.frames - self.inferred,
+            "skip_ratio": round(1.0 - self.inferred / self.frames, 3) if self.frames else 0.0,
+        }
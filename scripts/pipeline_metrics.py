@@ -0,0 +1,168 @@
+# scripts/pipeline_metrics.py
+"""Per-stage timings, counters and gauges for the monitoring pipeline.
+
+    from scripts.pipeline_metrics import metrics
+
+    with metrics.span("run_behavior", camera_id):
+        ...
+    metrics.inc("frames_dropped_total", camera_id, reason="queue_full")
+
+Stage timings go into one histogram family, `pipeline_stage_seconds`,
+labelled by stage and camera. Gauges that are cheaper to read on demand
+(queue depths, reload counts) come from collector callbacks run at scrape
+time. `snapshot()` is plain data so snapshots from several worker
+processes can be merged and rendered together by `render_prometheus()`.
+"""
+import bisect
+import collections
+import threading
+import time
+from contextlib import contextmanager
+
+# seconds; dense below 100 ms where most stages live
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0, 2.5, 5.0)
+STAGE_METRIC = "pipeline_stage_seconds"
+PREFIX = "qtd_"
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "samples")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, keep_samples=0):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.samples = collections.deque(maxlen=keep_samples) if keep_samples else None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if self.samples is not None:
+            self.samples.append(value)
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=DEFAULT_BUCKETS, keep_samples=0):
+        self.buckets = buckets
+        self.keep_samples = keep_samples
+        self._lock = threading.Lock()
+        self._histograms = {}    # (name, labels) -> Histogram
+        self._counters = {}      # (name, labels) -> float
+        self._collectors = []
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+    def observe(self, stage, seconds, camera=None, **labels):
+        key = self._key(STAGE_METRIC, dict(labels, stage=stage, camera=camera))
+        with self._lock:
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = Histogram(self.buckets, self.keep_samples)
+            h.observe(seconds)
+
+    @contextmanager
+    def span(self, stage, camera=None, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0, camera, **labels)
+
+    def inc(self, name, camera=None, value=1, **labels):
+        key = self._key(name, dict(labels, camera=camera))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def add_collector(self, fn):
+        """`fn()` returns an iterable of (name, labels dict, value) gauges, read at scrape time."""
+        self._collectors.append(fn)
+
+    def samples(self, stage, camera=None):
+        """Raw recent durations for one stage (needs keep_samples); all cameras when camera is None."""
+        out = []
+        with self._lock:
+            for (name, labels), h in self._histograms.items():
+                d = dict(labels)
+                if d.get("stage") == stage and (camera is None or d.get("camera") == str(camera)) \
+                        and h.samples is not None:
+                    out.extend(h.samples)
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self, **extra_labels):
+        gauges = []
+        for fn in list(self._collectors):
+            try:
+                for name, labels, value in fn():
+                    gauges.append({"name": name, "labels": dict(labels, **extra_labels), "value": value})
+            except Exception:
+                continue
+        with self._lock:
+            hists = [{"name": name, "labels": dict(dict(labels), **extra_labels), "buckets": list(h.buckets),
+                      "counts": list(h.counts), "sum": h.sum, "count": h.count}
+                     for (name, labels), h in self._histograms.items()]
+            counters = [{"name": name, "labels": dict(dict(labels), **extra_labels), "value": v}
+                        for (name, labels), v in self._counters.items()]
+        return {"histograms": hists, "counters": counters, "gauges": gauges}
+
+
+def merge_snapshots(snapshots):
+    merged = {"histograms": [], "counters": [], "gauges": []}
+    for snap in snapshots:
+        if not snap:
+            continue
+        for kind in merged:
+            merged[kind].extend(snap.get(kind, []))
+    return merged
+
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, extra=None):
+    items = dict(labels, **(extra or {}))
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(items.items()))
+    return "{" + body + "}"
+
+
+def render_prometheus(snapshot):
+    """Prometheus text exposition format (0.0.4) for a snapshot."""
+    lines = []
+    by_name = collections.defaultdict(list)
+    for h in snapshot.get("histograms", []):
+        by_name[("histogram", h["name"])].append(h)
+    for c in snapshot.get("counters", []):
+        by_name[("counter", c["name"])].append(c)
+    for g in snapshot.get("gauges", []):
+        by_name[("gauge", g["name"])].append(g)
+
+    for (kind, name), series in sorted(by_name.items(), key=lambda kv: kv[0][1]):
+        full = PREFIX + name
+        lines.append(f"# TYPE {full} {kind}")
+        for s in series:
+            if kind != "histogram":
+                lines.append(f"{full}{_labels(s['labels'])} {float(s['value'])}")
+                continue
+            cumulative = 0
+            for bound, n in zip(s["buckets"], s["counts"]):
+                cumulative += n
+                lines.append(f"{full}_bucket{_labels(s['labels'], {'le': bound})} {cumulative}")
+            lines.append(f"{full}_bucket{_labels(s['labels'], {'le': '+Inf'})} {s['count']}")
+            lines.append(f"{full}_sum{_labels(s['labels'])} {s['sum']}")
+            lines.append(f"{full}_count{_labels(s['labels'])} {s['count']}")
+    return "\n".join(lines) + "\n"
+
+
+# process-wide registry used by monitoring and the API
+metrics = MetricsRegistry()
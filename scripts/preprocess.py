@@ -0,0 +1,41 @@
+# scripts/preprocess.py
+import numpy as np
+
+from scripts.inference_backend import DetectionBox, DetectionResult, letterbox
+
+
+class DetectorInput:
+    """A camera frame letterboxed once to a detector's square input size.
+
+    Every full-frame detector (person, face, object) is fed `image`, so a 4K
+    frame is resized once per frame instead of once per model, and the
+    models' own letterboxing becomes a no-op. `restore()` maps a result's
+    boxes back to full-resolution frame coordinates.
+    """
+
+    __slots__ = ("image", "scale", "pad", "orig_shape", "size")
+
+    def __init__(self, frame, size):
+        self.size = size
+        self.orig_shape = frame.shape
+        self.image, self.scale, self.pad = letterbox(frame, size)
+
+    def to_frame(self, xyxy):
+        """Letterboxed (x1, y1, x2, y2) -> clipped full-resolution coordinates."""
+        b = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4).copy()
+        b[:, [0, 2]] = (b[:, [0, 2]] - self.pad[0]) / self.scale
+        b[:, [1, 3]] = (b[:, [1, 3]] - self.pad[1]) / self.scale
+        h, w = self.orig_shape[:2]
+        b[:, [0, 2]] = b[:, [0, 2]].clip(0, w)
+        b[:, [1, 3]] = b[:, [1, 3]].clip(0, h)
+        return b
+
+    def restore(self, res):
+        """Copy of a detection result with boxes in full-resolution coordinates."""
+        boxes = list(res.boxes)
+        if not boxes:
+            return DetectionResult([], res.names, self.orig_shape)
+        xyxy = self.to_frame([[float(v) for v in b.xyxy[0]] for b in boxes])
+        return DetectionResult(
+            [DetectionBox(xy, float(b.conf), int(b.cls)) for xy, b in zip(xyxy, boxes)],
+            res.names, self.orig_shape)
@@ -0,0 +1,301 @@
+# scripts/quantize_models.py
+"""INT8 post-training quantization for CPU-only deployments.
+
+Static quantization needs representative inputs to pick activation ranges:
+
+  * detectors are calibrated on frames sampled from the saved anomaly clips
+    (Anomalies_video/) plus the enrolment photos in face_data/
+  * FaceNet is calibrated on face crops cut from face_data/ with the FP32
+    face detector, preprocessed exactly as at runtime
+
+Each `model/<name>.onnx` (from `inference_backend.py export`) gets a
+`model/<name>.int8.onnx` next to it; MODEL_PRECISION=int8 loads those.
+
+    python scripts/quantize_models.py quantize
+    python scripts/quantize_models.py report --out int8_report.json
+"""
+import argparse
+import json
+import logging
+import re
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.inference_backend import (
+    DETECTOR_WEIGHTS, FACENET_ONNX_PATH, OnnxFaceNet, OnnxYoloDetector,
+    _match_boxes, int8_path_for, onnx_path_for,
+)
+
+FACE_DATA_DIR = PROJECT_ROOT / "face_data"
+CLIPS_DIR = PROJECT_ROOT / "Anomalies_video"
+FACE_ONNX_PATH = onnx_path_for(DETECTOR_WEIGHTS[0])
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png')
+CLIP_EXTS = ('.mp4', '.avi', '.mkv')
+CALIBRATION_FRAMES = 200
+CALIBRATION_FACES = 300
+REPORT_FRAMES = 100
+REPORT_CONF = 0.5
+REPORT_IOU = 0.5
+
+
+# ------------------------- calibration inputs -------------------------
+def sample_clip_frames(clips_dir=CLIPS_DIR, limit=CALIBRATION_FRAMES, per_clip=10):
+    """Evenly spaced frames from every clip, in sorted order so the set is reproducible."""
+    clips = sorted(p for p in Path(clips_dir).rglob("*")
+                   if p.suffix.lower() in CLIP_EXTS and not p.stem.endswith("_web"))
+    frames = []
+    for clip in clips:
+        cap = cv2.VideoCapture(str(clip))
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or per_clip
+        for idx in np.linspace(0, max(total - 1, 0), per_clip).astype(int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+            ok, frame = cap.read()
+            if ok:
+                frames.append(frame)
+        cap.release()
+        if len(frames) >= limit:
+            break
+    return frames[:limit]
+
+
+def sample_face_images(face_dir=FACE_DATA_DIR, limit=CALIBRATION_FACES):
+    images = []
+    for f in sorted(Path(face_dir).rglob("*")):
+        if f.suffix.lower() in IMAGE_EXTS:
+            img = cv2.imread(str(f))
+            if img is not None:
+                images.append(img)
+        if len(images) >= limit:
+            break
+    return images
+
+
+def face_crops(images, detector, size=160):
+    """RGB size x size crops of every detected face; falls back to the whole image."""
+    crops = []
+    for img in images:
+        boxes = detector(img)[0].boxes if detector is not None else []
+        found = False
+        for b in boxes:
+            if float(b.conf) < REPORT_CONF:
+                continue
+            x1, y1, x2, y2 = map(int, b.xyxy[0])
+            face = img[max(0, y1):y2, max(0, x1):x2]
+            if face.size:
+                crops.append(cv2.resize(cv2.cvtColor(face, cv2.COLOR_BGR2RGB), (size, size)))
+                found = True
+        if not found:
+            crops.append(cv2.resize(cv2.cvtColor(img, cv2.COLOR_BGR2RGB), (size, size)))
+    return crops
+
+
+class _ListReader:
+    """onnxruntime CalibrationDataReader over a list of prepared inputs."""
+
+    def __init__(self, input_name, tensors):
+        self.input_name = input_name
+        self._it = iter(tensors)
+
+    def get_next(self):
+        x = next(self._it, None)
+        return None if x is None else {self.input_name: x}
+
+
+def _detector_tensors(detector, images):
+    return [detector._prepare(img)[0][None] for img in images]
+
+
+def _facenet_tensors(facenet, crops):
+    return [facenet._prepare(np.asarray([c])) for c in crops]
+
+
+def _head_nodes(onnx_path):
+    """Nodes of the final YOLO Detect module (box decoding/DFL); kept in FP32
+    because quantizing the box regression costs more accuracy than it saves."""
+    import onnx
+    model = onnx.load(str(onnx_path))
+    idx = [int(m.group(1)) for n in model.graph.node for m in [re.match(r"/model\.(\d+)/", n.name)] if m]
+    if not idx:
+        return []
+    head = f"/model.{max(idx)}/"
+    return [n.name for n in model.graph.node if n.name.startswith(head)]
+
+
+def quantize_model(onnx_path, reader, exclude=(), per_channel=True, method="minmax"):
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    onnx_path = Path(onnx_path)
+    out_path = Path(int8_path_for(onnx_path))
+    prepped = onnx_path.with_suffix(".prep.onnx")
+    quant_pre_process(str(onnx_path), str(prepped))
+    try:
+        quantize_static(
+            str(prepped), str(out_path), reader,
+            quant_format=QuantFormat.QDQ,
+            per_channel=per_channel,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            nodes_to_exclude=list(exclude),
+            calibrate_method=CalibrationMethod.Percentile if method == "percentile" else CalibrationMethod.MinMax,
+        )
+    finally:
+        prepped.unlink(missing_ok=True)
+    print(f"[quant] {onnx_path.name} -> {out_path.name} "
+          f"({onnx_path.stat().st_size / 1e6:.1f} MB -> {out_path.stat().st_size / 1e6:.1f} MB)")
+    return out_path
+
+
+def quantize_all(frames_limit=CALIBRATION_FRAMES, faces_limit=CALIBRATION_FACES,
+                 keep_head_fp32=True, method="minmax"):
+    frames = sample_clip_frames(limit=frames_limit)
+    photos = sample_face_images(limit=faces_limit)
+    print(f"[quant] calibration set: {len(frames)} clip frames, {len(photos)} face_data images")
+    if not frames and not photos:
+        raise SystemExit("no calibration data in Anomalies_video/ or face_data/")
+
+    for pt in DETECTOR_WEIGHTS:
+        onnx_path = onnx_path_for(pt)
+        if not Path(onnx_path).exists():
+            print(f"[quant] {Path(onnx_path).name} missing, run inference_backend.py export first")
+            continue
+        det = OnnxYoloDetector(onnx_path)
+        # face model sees mostly enrolment photos, the others mostly camera frames
+        images = photos + frames if onnx_path == FACE_ONNX_PATH else frames + photos
+        reader = _ListReader(det.input_name, _detector_tensors(det, images[:frames_limit]))
+        quantize_model(onnx_path, reader, exclude=_head_nodes(onnx_path) if keep_head_fp32 else (), method=method)
+
+    if Path(FACENET_ONNX_PATH).exists():
+        face_det = OnnxYoloDetector(FACE_ONNX_PATH) if Path(FACE_ONNX_PATH).exists() else None
+        facenet = OnnxFaceNet(FACENET_ONNX_PATH)
+        crops = face_crops(photos, face_det)[:faces_limit]
+        quantize_model(FACENET_ONNX_PATH, _ListReader(facenet.input_name, _facenet_tensors(facenet, crops)),
+                       method=method)
+    else:
+        print(f"[quant] {Path(FACENET_ONNX_PATH).name} missing, run inference_backend.py export first")
+
+
+# ------------------------- accuracy / latency report -------------------------
+def _latency(fn, inputs, warmup=3):
+    for x in inputs[:warmup]:
+        fn(x)
+    lat = []
+    for x in inputs:
+        t0 = time.perf_counter()
+        fn(x)
+        lat.append((time.perf_counter() - t0) * 1000.0)
+    lat = np.asarray(lat)
+    return {"p50_ms": float(np.percentile(lat, 50)), "p95_ms": float(np.percentile(lat, 95)),
+            "mean_ms": float(lat.mean())}
+
+
+def compare_detector(onnx_path, frames):
+    """INT8 boxes scored against the FP32 boxes as ground truth."""
+    fp32, int8 = OnnxYoloDetector(onnx_path), OnnxYoloDetector(int8_path_for(onnx_path))
+    tp = n_ref = n_test = 0
+    conf_err = []
+    for img in frames:
+        ref = [b for b in fp32(img)[0].boxes if float(b.conf) >= REPORT_CONF]
+        test = [b for b in int8(img)[0].boxes if float(b.conf) >= REPORT_CONF]
+        pairs, _ = _match_boxes(ref, test, min_iou=REPORT_IOU)
+        tp += len(pairs)
+        n_ref += len(ref)
+        n_test += len(test)
+        conf_err += [abs(float(a.conf) - float(b.conf)) for a, b, _ in pairs]
+    precision = tp / n_test if n_test else 1.0
+    recall = tp / n_ref if n_ref else 1.0
+    return {
+        "model": Path(onnx_path).stem,
+        "fp32_boxes": n_ref, "int8_boxes": n_test,
+        "precision_vs_fp32": precision, "recall_vs_fp32": recall,
+        "f1_vs_fp32": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "mean_abs_dconf": float(np.mean(conf_err)) if conf_err else 0.0,
+        "fp32": _latency(lambda x: fp32(x), frames),
+        "int8": _latency(lambda x: int8(x), frames),
+    }
+
+
+def compare_facenet(crops):
+    fp32, int8 = OnnxFaceNet(FACENET_ONNX_PATH), OnnxFaceNet(int8_path_for(FACENET_ONNX_PATH))
+    a = np.asarray(fp32.embeddings(crops), dtype=np.float32)
+    b = np.asarray(int8.embeddings(crops), dtype=np.float32)
+    a /= np.linalg.norm(a, axis=1, keepdims=True)
+    b /= np.linalg.norm(b, axis=1, keepdims=True)
+    cos = np.sum(a * b, axis=1)
+    row = {"model": "facenet", "faces": len(crops),
+           "min_cosine": float(cos.min()), "mean_cosine": float(cos.mean())}
+
+    # does the identity decision change against the enrolled centroids?
+    from scripts.embedding_store import open_store
+    store = open_store()
+    if store is not None and len(store):
+        cents = np.asarray(store.centroids)
+        row["identity_agreement"] = float(np.mean(np.argmax(a @ cents.T, 1) == np.argmax(b @ cents.T, 1)))
+    singles = [np.asarray([c]) for c in crops]
+    row["fp32"] = _latency(fp32.embeddings, singles)
+    row["int8"] = _latency(int8.embeddings, singles)
+    return row
+
+
+def report(frames_limit=REPORT_FRAMES, out=None):
+    frames = sample_clip_frames(limit=frames_limit, per_clip=5)
+    if not frames:
+        raise SystemExit("no clips found in Anomalies_video/")
+    rows = []
+    for pt in DETECTOR_WEIGHTS:
+        onnx_path = onnx_path_for(pt)
+        if Path(onnx_path).exists() and Path(int8_path_for(onnx_path)).exists():
+            rows.append(compare_detector(onnx_path, frames))
+    if Path(FACENET_ONNX_PATH).exists() and Path(int8_path_for(FACENET_ONNX_PATH)).exists():
+        face_det = OnnxYoloDetector(FACE_ONNX_PATH) if Path(FACE_ONNX_PATH).exists() else None
+        rows.append(compare_facenet(face_crops(sample_face_images(limit=frames_limit), face_det)))
+    if not rows:
+        raise SystemExit("no FP32/INT8 model pairs found; run export and quantize first")
+
+    print(f"[report] {len(frames)} fixed clip frames")
+    print(f"{'model':<26}{'agreement':>11}{'fp32 p50':>10}{'int8 p50':>10}{'speedup':>9}")
+    fp32_total = int8_total = 0.0
+    for r in rows:
+        agreement = r.get("f1_vs_fp32", r.get("identity_agreement", r.get("mean_cosine")))
+        speedup = r["fp32"]["mean_ms"] / r["int8"]["mean_ms"] if r["int8"]["mean_ms"] else 0.0
+        fp32_total += r["fp32"]["mean_ms"]
+        int8_total += r["int8"]["mean_ms"]
+        print(f"{r['model']:<26}{agreement:>11.4f}{r['fp32']['p50_ms']:>10.2f}{r['int8']['p50_ms']:>10.2f}{speedup:>8.2f}x")
+    # one frame through every model once: a rough cameras-per-box multiplier
+    capacity = fp32_total / int8_total if int8_total else 0.0
+    print(f"[report] per-frame model time {fp32_total:.1f} ms -> {int8_total:.1f} ms "
+          f"(~{capacity:.2f}x cameras per box)")
+
+    if out:
+        with open(out, 'w') as f:
+            json.dump({"frames": len(frames), "capacity_multiplier": capacity, "models": rows}, f, indent=2)
+    return rows
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Quantize the ONNX models to INT8 and compare them with FP32.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    q = sub.add_parser("quantize", help="calibrate and write model/*.int8.onnx")
+    q.add_argument("--frames", type=int, default=CALIBRATION_FRAMES, help="calibration images per detector")
+    q.add_argument("--faces", type=int, default=CALIBRATION_FACES, help="calibration crops for FaceNet")
+    q.add_argument("--method", choices=["minmax", "percentile"], default="minmax")
+    q.add_argument("--quantize-head", action="store_true", help="also quantize the YOLO Detect head")
+    r = sub.add_parser("report", help="accuracy/latency of INT8 against FP32 on a fixed clip set")
+    r.add_argument("--frames", type=int, default=REPORT_FRAMES)
+    r.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args()
+
+    if args.cmd == "quantize":
+        quantize_all(args.frames, args.faces, keep_head_fp32=not args.quantize_head, method=args.method)
+    else:
+        report(args.frames, args.out)
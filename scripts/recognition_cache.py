@@ -0,0 +1,97 @@
+# scripts/recognition_cache.py
+import time
+
+
+class RecognitionCache:
+    """Identity per DeepSort track, with confidence-weighted re-verification.
+
+    A track's identity stays cached while the track is seen. It is
+    re-verified after an interval that grows with the match similarity:
+    `min_interval` at or below `low_similarity` (unknown / weak matches),
+    `max_interval` at or above `high_similarity`, linear in between. The
+    cached identity keeps being shown while a re-check runs. A track with a
+    recognition already in flight is never submitted again until that
+    result arrives (or `inflight_timeout` passes). Identities recognised
+    against an older embedding generation are re-checked right away.
+    Only the identity is cached; authorisation is looked up each time it is
+    used, so it follows certificate changes without a re-check.
+    """
+
+    def __init__(self, min_interval=5.0, max_interval=60.0, low_similarity=0.55, high_similarity=0.8,
+                 forget_after=10.0, inflight_timeout=5.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.low_similarity = low_similarity
+        self.high_similarity = high_similarity
+        self.forget_after = forget_after
+        self.inflight_timeout = inflight_timeout
+        self.entries = {}      # track id -> identity dict (also the Camera's track_info)
+        self._inflight = {}    # track id -> submit time
+        self.counters = {"hits": 0, "misses": 0, "rechecks": 0, "inflight_skips": 0,
+                         "submitted": 0, "results": 0}
+
+    def interval_for(self, name, similarity):
+        if not name or name == "Unknown" or similarity <= self.low_similarity:
+            return self.min_interval
+        if similarity >= self.high_similarity:
+            return self.max_interval
+        w = (similarity - self.low_similarity) / (self.high_similarity - self.low_similarity)
+        return self.min_interval + w * (self.max_interval - self.min_interval)
+
+    def lookup(self, tid, now=None):
+        """Cached identity for a visible track (marks it seen), or None."""
+        now = time.time() if now is None else now
+        entry = self.entries.get(tid)
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        entry["last_seen"] = now
+        self.counters["hits"] += 1
+        return entry
+
+    def needs_recognition(self, tid, now=None, generation=None):
+        now = time.time() if now is None else now
+        submitted = self._inflight.get(tid)
+        if submitted is not None and now - submitted < self.inflight_timeout:
+            self.counters["inflight_skips"] += 1
+            return False
+        entry = self.entries.get(tid)
+        if entry is None:
+            return True
+        return now >= entry["recheck_at"] or (generation is not None and entry.get("generation") != generation)
+
+    def mark_inflight(self, tid, now=None):
+        """Record a submitted recognition; for a track that already has an identity it is a re-check."""
+        self._inflight[tid] = time.time() if now is None else now
+        self.counters["submitted"] += 1
+        if tid in self.entries:
+            self.counters["rechecks"] += 1
+
+    def update(self, tid, name, similarity, tstamp, generation=None):
+        """Store a recognition result; returns the entry."""
+        self._inflight.pop(tid, None)
+        self.counters["results"] += 1
+        prev = self.entries.get(tid)
+        entry = {
+            "name": name,
+            "similarity": similarity,
+            "generation": generation,
+            "recognized_at": tstamp,
+            "last_seen": max(tstamp, prev["last_seen"]) if prev else tstamp,
+            "recheck_at": tstamp + self.interval_for(name, similarity),
+        }
+        self.entries[tid] = entry
+        return entry
+
+    def prune(self, now=None):
+        """Forget tracks unseen for `forget_after` seconds and stale in-flight marks."""
+        now = time.time() if now is None else now
+        for tid in [t for t, e in self.entries.items() if now - e["last_seen"] >= self.forget_after]:
+            del self.entries[tid]
+        for tid in [t for t, s in self._inflight.items() if now - s >= self.inflight_timeout]:
+            del self._inflight[tid]
+
+    def stats(self):
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return dict(self.counters, tracks=len(self.entries), inflight=len(self._inflight),
+                    hit_ratio=round(self.counters["hits"] / lookups, 3) if lookups else 0.0)
@@ -1,10 +1,13 @@
 # train_face2.py
 
 import os
+import sys
+import argparse
+import hashlib
 import cv2
 import numpy as np
 import pickle
-from keras_facenet import FaceNet
+from concurrent.futures import ProcessPoolExecutor
 import mediapipe as mp
 import datetime
 from pathlib import Path
@@ -19,6 +22,11 @@ from mediapipe.tasks.python.core import base_options
 BASE_DIR = Path(__file__).resolve().parent      # scripts/
 ROOT_DIR = BASE_DIR.parent                      # inappropriate_behaviour_v3/
 
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from scripts.embedding_store import write_store
+
 DATA_DIR = ROOT_DIR / "face_data"
 OUTPUT_FILE = BASE_DIR / "face_encodings.pkl"
 TIMESTAMP_FILE = BASE_DIR / "pkltimestamp"
@@ -39,7 +47,14 @@ face_landmarker_options = vision.FaceLandmarkerOptions(
     num_faces=1
 )
 
-face_landmarker = vision.FaceLandmarker.create_from_options(face_landmarker_options)
+# Created on first use so pool workers only build what they need
+_face_landmarker = None
+
+def get_face_landmarker():
+    global _face_landmarker
+    if _face_landmarker is None:
+        _face_landmarker = vision.FaceLandmarker.create_from_options(face_landmarker_options)
+    return _face_landmarker
 
 
 
@@ -60,7 +75,7 @@ def detect_faces_facelandmarker(image):
     mp_image = mp.Image(image_format=mp.ImageFormat.SRGB,
                         data=cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
 
-    result = face_landmarker.detect(mp_image)
+    result = get_face_landmarker().detect(mp_image)
     faces = []
 
     if not result.face_landmarks:
@@ -99,8 +114,15 @@ def preprocess_image(image):
     """Resize and convert image for FaceNet."""
     return cv2.resize(cv2.cvtColor(image, cv2.COLOR_BGR2RGB), INPUT_SIZE)
 
-# Initialize embedder
-embedder = FaceNet()
+# FaceNet (TensorFlow) is only loaded by the process that embeds
+_embedder = None
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        from keras_facenet import FaceNet
+        _embedder = FaceNet()
+    return _embedder
 
 # --- Quality & normalization helpers ---
 MIN_FACE_AREA = 32 * 32      # pixels; adjust for distant cameras
@@ -144,87 +166,330 @@ def extract_embeddings(faces):
         except Exception as e:
             # skip problematic images
             print(f"[train] skipping preprocessing of a face: {e}")
+    return embed_preprocessed(imgs)
+
+def embed_preprocessed(imgs):
+    """Embed already preprocessed 160x160 RGB crops in one FaceNet call."""
     if not imgs:
         return np.zeros((0, 512), dtype=np.float32)  # FaceNet default dim is 512
     try:
-        embs = embedder.embeddings(imgs)
+        embs = get_embedder().embeddings(imgs)
     except Exception as e:
         print(f"[train] FaceNet embeddings call failed: {e}")
         return np.zeros((0, 512), dtype=np.float32)
     # normalize each embedding
     embs = np.asarray(embs, dtype=np.float32)
-    embs = np.array([l2_normalize(e) for e in embs], dtype=np.float32)
-    return embs
+    embs = embs / np.maximum(np.linalg.norm(embs, axis=1, keepdims=True), _EMB_EPS)
+    return embs.astype(np.float32)
 
-# Training function
-def train_model():
-    embeddings_dict = {}
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png')
 
-    persons = [p for p in os.listdir(DATA_DIR) if (DATA_DIR / p).is_dir()]
-    print(f"[train] Found {len(persons)} person folders in {DATA_DIR}")
+def detect_image_crops(img_path):
+    """Read one image, detect faces, drop low-quality ones and return the
+    preprocessed FaceNet inputs. Runs in pool workers in parallel mode.
+    """
+    image = cv2.imread(str(img_path))
+    if image is None:
+        print(f"[train] failed to read {img_path}, skipping")
+        return []
+
+    faces = detect_faces_facelandmarker(image)
+    crops = []
+    for face_crop, _ in faces:
+        if not face_quality_ok(face_crop):
+            continue
+        try:
+            crops.append(preprocess_image(face_crop))
+        except Exception as e:
+            print(f"[train] skipping preprocessing of a face in {img_path}: {e}")
+    return crops
 
-    for person in persons:
-        person_path = DATA_DIR / person
-        person_embeddings = []
+def embed_image_file(img_path):
+    """Detect, quality-filter and embed the faces in one image file.
+    Returns an (N, 512) array; N is 0 when nothing usable was found.
+    """
+    return embed_preprocessed(detect_image_crops(img_path))
 
-        image_files = [f for f in os.listdir(person_path)
-                       if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+# --- Batched / parallel embedding pipeline ---
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+DEFAULT_BATCH_SIZE = 64
+PARALLEL_MIN_IMAGES = 16     # below this a process pool costs more than it saves
 
-        if not image_files:
-            print(f"[train] no image files for {person}, skipping")
-            continue
+def _init_detect_worker():
+    # one OpenCV thread per worker; the pool itself provides the parallelism
+    cv2.setNumThreads(1)
 
-        for img_name in image_files:
-            img_path = person_path / img_name
-            image = cv2.imread(str(img_path))
+def _detect_job(job):
+    key, img_path = job
+    return key, detect_image_crops(img_path)
 
-            if image is None:
-                print(f"[train] failed to read {img_path}, skipping")
-                continue
+def embed_image_files(jobs, workers=1, batch_size=DEFAULT_BATCH_SIZE):
+    """Embed many images: decoding, landmarking and quality filtering run
+    in `workers` processes, while this process embeds the accepted crops in
+    FaceNet batches of `batch_size`.
 
-            faces = detect_faces_facelandmarker(image)
-            if not faces:
-                continue
+    `jobs` is a list of (key, img_path). Returns {key: (N, 512) array}.
+    Keys with a crop in a failed FaceNet batch are left out, so callers
+    don't record them as embedded and the next run retries them.
+    """
+    per_key = {key: [] for key, _ in jobs}
+    failed = set()
+    pending = []
+
+    def flush(items):
+        embs = embed_preprocessed([crop for _, crop in items])
+        if embs.shape[0] != len(items):
+            keys = {key for key, _ in items}
+            print(f"[train] FaceNet returned {embs.shape[0]} embeddings for {len(items)} crops; "
+                  f"{len(keys)} image(s) will be retried on the next run")
+            failed.update(keys)
+            return
+        for (key, _), e in zip(items, embs):
+            per_key[key].append(e)
+
+    use_pool = workers > 1 and len(jobs) >= PARALLEL_MIN_IMAGES
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_detect_worker) if use_pool else None
+    try:
+        if pool is not None:
+            print(f"[train] detecting faces with {workers} worker processes, batch size {batch_size}")
+            chunk = max(1, min(16, len(jobs) // (workers * 4)))
+            detected = pool.map(_detect_job, jobs, chunksize=chunk)
+        else:
+            detected = map(_detect_job, jobs)
+
+        for key, crops in detected:
+            pending.extend((key, crop) for crop in crops)
+            while len(pending) >= batch_size:
+                flush(pending[:batch_size])
+                pending = pending[batch_size:]
+        if pending:
+            flush(pending)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return {
+        key: (np.vstack(embs).astype(np.float32) if embs else np.zeros((0, 512), dtype=np.float32))
+        for key, embs in per_key.items() if key not in failed
+    }
+
+def list_person_images():
+    """Return {person: [image paths]} for every person folder under DATA_DIR."""
+    out = {}
+    for person in sorted(os.listdir(DATA_DIR)):
+        person_path = DATA_DIR / person
+        if not person_path.is_dir():
+            continue
+        out[person] = [person_path / f for f in sorted(os.listdir(person_path))
+                       if f.lower().endswith(IMAGE_EXTS)]
+    return out
+
+def person_entry(embs_list):
+    """Build the {"embeddings", "centroid"} record for one person, or None."""
+    embs_list = [e for e in embs_list if e is not None and len(e)]
+    if not embs_list:
+        return None
+    arr = np.vstack(embs_list).astype(np.float32)
+    arr = np.array([l2_normalize(e) for e in arr], dtype=np.float32)
+    centroid = l2_normalize(np.mean(arr, axis=0))
+    return {"embeddings": arr, "centroid": centroid}
+
+# --- Per-image manifest (drives incremental training) ---
+MANIFEST_FILE = BASE_DIR / "face_manifest.pkl"
+MANIFEST_VERSION = 1
+
+def _rel_key(img_path):
+    return Path(img_path).relative_to(DATA_DIR).as_posix()
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def manifest_record(img_path, person, embs, digest=None):
+    st = os.stat(img_path)
+    return {
+        "person": person,
+        "size": st.st_size,
+        "mtime": st.st_mtime,
+        "sha1": digest or file_digest(img_path),
+        "embeddings": np.asarray(embs, dtype=np.float32),
+    }
+
+def load_manifest():
+    try:
+        with open(MANIFEST_FILE, 'rb') as f:
+            data = pickle.load(f)
+        if data.get("version") == MANIFEST_VERSION:
+            return data["images"]
+        print("[train] manifest version mismatch, starting fresh")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[train] failed to read manifest, starting fresh: {e}")
+    return {}
+
+def save_manifest(images):
+    tmp = MANIFEST_FILE.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump({"version": MANIFEST_VERSION, "images": images}, f)
+    os.replace(tmp, MANIFEST_FILE)
+
+def publish(embeddings_dict, manifest):
+    """Write the pickle, the memory-mapped store, the manifest, then bump pkltimestamp."""
+    # Save pickle (kept for older readers) and the memory-mapped store
+    with open(OUTPUT_FILE, "wb") as f:
+        pickle.dump(embeddings_dict, f)
+    write_store(embeddings_dict)
+    save_manifest(manifest)
 
-            good_faces = []
-            for face_crop, bbox in faces:
-                if face_quality_ok(face_crop):
-                    good_faces.append((face_crop, bbox))
+    with open(TIMESTAMP_FILE, "w") as flag:
+        flag.write(str(datetime.datetime.now().timestamp()))
 
-            if not good_faces:
-                continue
+# Training function
+def train_model(workers=1, batch_size=DEFAULT_BATCH_SIZE):
+    embeddings_dict = {}
+    manifest = {}
 
-            try:
-                embs = extract_embeddings(good_faces)
-                for e in embs:
-                    person_embeddings.append(e)
-            except Exception as e:
-                print(f"[train] embedding error for {img_path}: {e}")
+    person_images = list_person_images()
+    print(f"[train] Found {len(person_images)} person folders in {DATA_DIR}")
 
-        if person_embeddings:
-            arr = np.vstack(person_embeddings).astype(np.float32)
-            arr = np.array([l2_normalize(e) for e in arr], dtype=np.float32)
-            centroid = l2_normalize(np.mean(arr, axis=0))
+    jobs = [(_rel_key(p), p) for paths in person_images.values() for p in paths]
+    embs_by_key = embed_image_files(jobs, workers=workers, batch_size=batch_size)
 
-            embeddings_dict[person] = {
-                "embeddings": arr,
-                "centroid": centroid
-            }
+    for person, image_files in person_images.items():
+        if not image_files:
+            print(f"[train] no image files for {person}, skipping")
+            continue
 
-            print(f"[train] processed {person}: {arr.shape[0]} embeddings")
+        person_embeddings = []
+        for img_path in image_files:
+            embs = embs_by_key.get(_rel_key(img_path))
+            if embs is None:
+                continue  # embedding failed; no manifest record, so --incremental retries it
+            manifest[_rel_key(img_path)] = manifest_record(img_path, person, embs)
+            person_embeddings.append(embs)
+
+        entry = person_entry(person_embeddings)
+        if entry is not None:
+            embeddings_dict[person] = entry
+            print(f"[train] processed {person}: {entry['embeddings'].shape[0]} embeddings")
         else:
             print(f"[train] no valid embeddings for {person}, skipping")
 
-    # Save pickle
-    with open(OUTPUT_FILE, "wb") as f:
-        pickle.dump(embeddings_dict, f)
+    publish(embeddings_dict, manifest)
+    print("[train] Training complete")
 
-    with open(TIMESTAMP_FILE, "w") as flag:
-        flag.write(str(datetime.datetime.now().timestamp()))
 
-    print("[train] Training complete")
+def diff_manifest(manifest, person_images):
+    """Compare the folders on disk with the manifest.
+
+    Returns (changed, deleted): changed maps key -> (img_path, person, sha1)
+    for added or modified images; deleted is the set of keys that are gone.
+    Files whose size and mtime match are trusted without hashing; touched
+    files with identical content only get their stat fields refreshed.
+    """
+    changed = {}
+    seen = set()
+    for person, image_files in person_images.items():
+        for img_path in image_files:
+            key = _rel_key(img_path)
+            seen.add(key)
+            rec = manifest.get(key)
+            st = os.stat(img_path)
+            if rec and rec["person"] == person and rec["size"] == st.st_size and rec["mtime"] == st.st_mtime:
+                continue
+            digest = file_digest(img_path)
+            if rec and rec["person"] == person and rec["sha1"] == digest:
+                rec["size"], rec["mtime"] = st.st_size, st.st_mtime
+                continue
+            changed[key] = (img_path, person, digest)
+    deleted = set(manifest) - seen
+    return changed, deleted
+
+def load_previous_embeddings():
+    """The published pickle, or None when it is missing or unreadable."""
+    try:
+        with open(OUTPUT_FILE, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        print(f"[train] {OUTPUT_FILE} not found, rebuilding every person from the manifest")
+    except Exception as e:
+        print(f"[train] failed to read {OUTPUT_FILE}, rebuilding every person from the manifest: {e}")
+    return None
+
+def train_incremental(workers=1, batch_size=DEFAULT_BATCH_SIZE):
+    """Re-embed only added/changed images, drop deleted ones and patch the affected persons."""
+    manifest = load_manifest()
+    person_images = list_person_images()
+    changed, deleted = diff_manifest(manifest, person_images)
+
+    if not changed and not deleted:
+        save_manifest(manifest)
+        print("[train] No face_data changes, embeddings are up to date")
+        return
+
+    print(f"[train] Incremental update: {len(changed)} new/changed, {len(deleted)} deleted images")
+    affected = {manifest[k]["person"] for k in deleted}
+    for key in deleted:
+        manifest.pop(key, None)
+
+    embs_by_key = embed_image_files([(key, job[0]) for key, job in changed.items()],
+                                    workers=workers, batch_size=batch_size)
+    for key, (img_path, person, digest) in changed.items():
+        old = manifest.get(key)
+        if old:
+            affected.add(old["person"])
+        if key not in embs_by_key:
+            # embedding failed: drop any stale record so the next run picks the image up again
+            manifest.pop(key, None)
+            continue
+        manifest[key] = manifest_record(img_path, person, embs_by_key[key], digest=digest)
+        affected.add(person)
+
+    embeddings_dict = load_previous_embeddings()
+    if embeddings_dict is None:
+        # the manifest holds everyone's embeddings; don't publish only the affected persons
+        embeddings_dict = {}
+        affected.update(rec["person"] for rec in manifest.values())
+    # persons whose folder vanished without a manifest record (e.g. pre-manifest pickle)
+    for person in list(embeddings_dict):
+        if person not in person_images:
+            affected.add(person)
+
+    by_person = {}
+    for key in sorted(manifest):
+        rec = manifest[key]
+        if rec["person"] in affected:
+            by_person.setdefault(rec["person"], []).append(rec["embeddings"])
+
+    for person in sorted(affected):
+        entry = person_entry(by_person.get(person, []))
+        if entry is None:
+            embeddings_dict.pop(person, None)
+            print(f"[train] removed {person} (no valid embeddings)")
+        else:
+            embeddings_dict[person] = entry
+            print(f"[train] updated {person}: {entry['embeddings'].shape[0]} embeddings")
+
+    publish(embeddings_dict, manifest)
+    print("[train] Incremental training complete")
 
 
 # Entry point for training
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Build face embeddings from face_data/.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only re-embed images added/changed/deleted since the last run")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="processes for decoding and face detection (1 = serial)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="face crops per FaceNet call")
+    args = parser.parse_args()
+
+    if args.incremental and MANIFEST_FILE.exists():
+        train_incremental(workers=args.workers, batch_size=args.batch_size)
+    else:
+        train_model(workers=args.workers, batch_size=args.batch_size)